@@ -1,19 +1,23 @@
 # backend/ai_utils.py
 import os
 import json
+import logging
 import time
 import re
 import requests
 from dotenv import load_dotenv
+from metrics import UPSTREAM_ERRORS, UPSTREAM_RETRIES
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 FRIENDLI_API_KEY = os.getenv("FRIENDLI_API_KEY")
 FRIENDLI_ENDPOINT_ID = os.getenv("FRIENDLI_ENDPOINT_ID")
 FRIENDLI_API_URL = "https://api.friendli.ai/dedicated/v1/chat/completions"
 
 if not FRIENDLI_API_KEY or not FRIENDLI_ENDPOINT_ID:
-    print("[AI_UTILS] Missing Friendli API credentials — check your .env configuration!")
+    logger.warning("Missing Friendli API credentials — check your .env configuration!")
 
 
 # ------------------------------------------------------------
@@ -56,14 +60,17 @@ def analyze_assignment_text(prompt: str) -> dict:
 
             parsed = try_parse_json(output_text)
             if parsed:
-                print(f"[AI_UTILS] ✅ Successfully parsed AI JSON response on attempt {attempt+1}")
+                logger.info("Parsed AI JSON response on attempt %d", attempt + 1)
                 return parsed
 
-            print(f"[AI_UTILS] Model returned unstructured text; returning as summary.")
+            logger.info("Model returned unstructured text; returning as summary")
             return {"summary": output_text}
 
         except Exception as e:
-            print(f"[AI_UTILS] Retry {attempt+1}/3 due to Friendli API error: {e}")
+            UPSTREAM_ERRORS.labels("friendli").inc()
+            if attempt + 1 < 3:
+                UPSTREAM_RETRIES.labels("friendli").inc()
+            logger.warning("Friendli API retry %d/3: %s", attempt + 1, e)
             time.sleep(3)
 
     return {"error": "AI analysis failed after 3 retries"}
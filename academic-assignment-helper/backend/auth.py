@@ -1,15 +1,24 @@
 # auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy import select, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
+import hmac
 from dotenv import load_dotenv
 
 #from . import models, schemas, database
 import models, schemas, database   # absolute imports for Docker
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from cache_utils import TTLCache
+from password_hashing import (
+    hash_password_async,
+    verify_password_async,
+    HashingOverloadedError,
+    HASH_RETRY_AFTER_SECONDS,
+)
 
 load_dotenv()
 
@@ -18,21 +27,29 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Shared token for corpus maintenance endpoints (there are no roles); unset = disabled
+CORPUS_ADMIN_TOKEN = os.getenv("CORPUS_ADMIN_TOKEN")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def hash_password(password: str) -> str:
-    if isinstance(password, bytes):
-        password = password.decode("utf-8", errors="ignore")
-    return pwd_context.hash(password[:72])
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated student as seen by route handlers (detached from any session)."""
+    id: int
+    email: str
+    full_name: str | None = None
+    student_id: str | None = None
 
+    @classmethod
+    def from_student(cls, student: models.Student) -> "Principal":
+        return cls(id=student.id, email=student.email, full_name=student.full_name, student_id=student.student_id)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    if isinstance(plain, bytes):
-        plain = plain.decode("utf-8", errors="ignore")
-    return pwd_context.verify(plain[:72], hashed)
+
+# ("sid", id) or ("email", email) -> Principal; bounded, per worker process
+principal_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -42,11 +59,28 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def hashing_overloaded() -> HTTPException:
+    # bcrypt runs on its own bounded pool (password_hashing.py); shed load instead of queueing
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many sign-in attempts right now, please retry shortly",
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
+async def get_student_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.Student).where(models.Student.email == email))
+    return result.scalars().first()
+
+
 @router.post("/register", response_model=schemas.StudentOut)
-def register_student(student: schemas.StudentCreate, db: Session = Depends(database.get_db)):
-    if db.query(models.Student).filter(models.Student.email == student.email).first():
+async def register_student(student: schemas.StudentCreate, db: AsyncSession = Depends(database.get_async_db)):
+    if await get_student_by_email(db, student.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_pw = hash_password(student.password)
+    try:
+        hashed_pw = await hash_password_async(student.password)
+    except HashingOverloadedError:
+        raise hashing_overloaded()
     new_student = models.Student(
         email=student.email,
         password_hash=hashed_pw,
@@ -54,25 +88,39 @@ def register_student(student: schemas.StudentCreate, db: Session = Depends(datab
         student_id=student.student_id,
     )
     db.add(new_student)
-    db.commit()
-    db.refresh(new_student)
+    await db.commit()
+    await db.refresh(new_student)
     return new_student
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.Student).filter(models.Student.email == form.username).first()
-    if not user or not verify_password(form.password, user.password_hash):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = await get_student_by_email(db, form.username)
+    try:
+        valid = bool(user) and await verify_password_async(form.password, user.password_hash)
+    except HashingOverloadedError:
+        raise hashing_overloaded()
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     access_token = create_access_token(
-        {"sub": user.email},
+        {"sub": user.email, "sid": user.id},  # sid lets get_current_user skip the email lookup
         timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    # no AsyncSession dependency: it would hold a pooled connection until the
+    # endpoint returns, next to the sync session of every sync route
+    return await authenticate_token(token)
+
+
+async def authenticate_token(token: str, db: AsyncSession = None) -> Principal:
+    """
+    Resolves a bearer token to its Principal (also used where no header can be sent, e.g. WebSockets).
+    Without `db`, a cache miss is looked up in a short-lived session that is closed before returning.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -86,7 +134,61 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.Student).filter(models.Student.email == email).first()
-    if not user:
+    # Tokens issued before "sid" existed are still accepted (cached by email)
+    sid = payload.get("sid")
+    cache_key = ("sid", sid) if sid is not None else ("email", email)
+
+    principal = principal_cache.get(cache_key)
+    if principal is None:
+        if db is not None:
+            user = await _load_student(db, sid, email)
+        else:
+            async with database.AsyncSessionLocal() as session:
+                user = await _load_student(session, sid, email)
+        if not user:
+            raise credentials_exception
+        principal = Principal.from_student(user)
+        principal_cache.set(cache_key, principal, AUTH_CACHE_TTL)
+
+    # the email in the token must still belong to the account
+    if principal.email != email:
         raise credentials_exception
-    return user
+    return principal
+
+
+def require_corpus_admin(x_admin_token: str = Header(None)):
+    """
+    Gate for endpoints that change the shared source corpus or its indexes:
+    every student may log in, so they also need "X-Admin-Token: <CORPUS_ADMIN_TOKEN>".
+    """
+    if not CORPUS_ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Corpus maintenance over HTTP is disabled; use the CLI")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, CORPUS_ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+async def _load_student(db: AsyncSession, sid, email: str):
+    if sid is not None:
+        return await db.get(models.Student, sid)
+    return await get_student_by_email(db, email)
+
+
+# ------------------------------------------------------------
+# Principal cache invalidation on account changes
+# ------------------------------------------------------------
+def invalidate_principal(student_id: int = None, email: str = None):
+    if student_id is not None:
+        principal_cache.invalidate(("sid", student_id))
+    if email is not None:
+        principal_cache.invalidate(("email", email))
+
+
+@event.listens_for(models.Student, "after_update")
+@event.listens_for(models.Student, "after_delete")
+def _student_changed(mapper, connection, target):
+    # Fires on flush (sync and async sessions); other workers converge within AUTH_CACHE_TTL
+    invalidate_principal(target.id, target.email)
+    old_email = inspect(target).attrs.email.history.deleted
+    for email in old_email or ():
+        invalidate_principal(email=email)
@@ -0,0 +1,2 @@
+# backend/benchmarks/__init__.py
+# Reproducible benchmarks for the analysis core; see benchmarks/run.py
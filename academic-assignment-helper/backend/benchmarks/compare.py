@@ -0,0 +1,65 @@
+# backend/benchmarks/compare.py
+
+# ------------------------------------------------------------
+# Compares two benchmark result files (benchmarks/run.py output)
+#   python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+# Exits with 1 when any benchmark's median got slower by more than threshold %,
+# or when a baseline benchmark is missing from the candidate run.
+# ------------------------------------------------------------
+
+import sys
+import json
+import argparse
+
+
+def load(path: str) -> tuple:
+    """Returns ({(name, params json): result}, meta) for one run.py output file."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        (r["name"], json.dumps(r["params"], sort_keys=True)): r
+        for r in data["results"]
+    }, data["meta"]
+
+
+def _params(result: dict) -> str:
+    return " ".join(f"{k}={v}" for k, v in result["params"].items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    args = parser.parse_args(argv)
+
+    baseline, base_meta = load(args.baseline)
+    candidate, cand_meta = load(args.candidate)
+    print(f"baseline {base_meta['commit']}  ->  candidate {cand_meta['commit']}")
+
+    regressions = 0
+    for key, new in candidate.items():
+        old = baseline.get(key)
+        if old is None:
+            print(f"{new['name']:<32} {_params(new):<36} {'new':>10} -> {new['median_ms']:>10.3f} ms")
+            continue
+        if not old["median_ms"]:
+            continue
+        change = (new["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{new['name']:<32} {_params(new):<36} {old['median_ms']:>10.3f} -> {new['median_ms']:>10.3f} ms"
+              f"  {change:+7.1f}%{flag}")
+
+    # a benchmark that disappeared must not read as "no regression"
+    missing = [old for key, old in baseline.items() if key not in candidate]
+    for old in missing:
+        print(f"{old['name']:<32} {_params(old):<36} {old['median_ms']:>10.3f} -> {'missing':>10}     MISSING")
+
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
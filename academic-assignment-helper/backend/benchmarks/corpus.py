@@ -0,0 +1,177 @@
+# backend/benchmarks/corpus.py
+
+# ------------------------------------------------------------
+# Synthetic, reproducible data for the benchmarks
+# - FakeEmbedder: deterministic bag-of-words embedding (every token maps to a
+#   fixed random vector seeded by its hash), so copied text really is similar
+#   and no Hugging Face call is made
+# - SyntheticCorpus: N sources of pseudo-words; text and embeddings are
+#   regenerated from (seed, batch) on demand, so 1M sources only cost the
+#   float32 embedding matrix (N x dim x 4 bytes, ~1.5 GB at 1M x 384)
+# - make_assignment: mixes copied source abstracts with filler sentences and
+#   returns the ids that were copied (ground truth)
+# ------------------------------------------------------------
+
+import re
+import hashlib
+import functools
+
+import numpy as np
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+VOCAB_SIZE = 20000
+TITLE_WORDS = 8
+ABSTRACT_WORDS = 120
+SENTENCE_WORDS = 15
+BATCH = 10000
+
+CORPUS_SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+TOKEN = re.compile(r"[a-z0-9]+")
+SYLLABLES = [c + v for c in "bcdfghjklmnprstvz" for v in "aeiou"]
+
+
+def parse_size(label: str) -> int:
+    label = label.strip().lower()
+    return CORPUS_SIZES[label] if label in CORPUS_SIZES else int(label)
+
+
+# ------------------------------------------------------------
+# Fake embedder
+# ------------------------------------------------------------
+class FakeEmbedder:
+    """Callable text -> list[float]; same text, same vector, on every machine."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.token_vector = functools.lru_cache(maxsize=None)(self._token_vector)
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in TOKEN.findall(text.lower()):
+            vector += self.token_vector(token)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __call__(self, text: str):
+        # same contract as plagiarism_utils.get_embedding (which truncates to 1000 chars)
+        return self.embed(text[:1000]).tolist()
+
+
+# ------------------------------------------------------------
+# Corpus
+# ------------------------------------------------------------
+class SyntheticCorpus:
+    def __init__(self, size: int, seed: int = 42, dim: int = EMBEDDING_DIM, embedder: FakeEmbedder = None):
+        self.size = size
+        self.seed = seed
+        self.embedder = embedder or FakeEmbedder(dim)
+        self.vocab = self._make_vocab()
+        self._vocab_vectors = None
+        self._cached_batch = (None, None)
+
+    def _make_vocab(self):
+        rng = np.random.default_rng([self.seed, 0])
+        words, seen = [], set()
+        while len(words) < VOCAB_SIZE:
+            word = "".join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), rng.integers(2, 5)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        return words
+
+    def _batch_word_ids(self, batch: int) -> np.ndarray:
+        """(rows, TITLE_WORDS + ABSTRACT_WORDS) vocab ids for one batch of sources."""
+        if self._cached_batch[0] != batch:
+            rows = min(BATCH, self.size - batch * BATCH)
+            rng = np.random.default_rng([self.seed, 1, batch])
+            ids = rng.integers(0, VOCAB_SIZE, (rows, TITLE_WORDS + ABSTRACT_WORDS), dtype=np.int32)
+            self._cached_batch = (batch, ids)
+        return self._cached_batch[1]
+
+    def _word_ids(self, index: int) -> np.ndarray:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return self._batch_word_ids(index // BATCH)[index % BATCH]
+
+    def source_id(self, index: int) -> int:
+        return index + 1
+
+    def title(self, index: int) -> str:
+        return " ".join(self.vocab[i] for i in self._word_ids(index)[:TITLE_WORDS]).capitalize()
+
+    def abstract(self, index: int) -> str:
+        words = [self.vocab[i] for i in self._word_ids(index)[TITLE_WORDS:]]
+        sentences = [" ".join(words[i:i + SENTENCE_WORDS]) for i in range(0, len(words), SENTENCE_WORDS)]
+        return " ".join(s.capitalize() + "." for s in sentences)
+
+    def source_text(self, index: int) -> str:
+        """What vector_utils embeds for a source: "<title>. <abstract>"."""
+        return f"{self.title(index)}. {self.abstract(index)}"
+
+    @property
+    def titles(self):
+        return _LazyTitles(self)
+
+    def embeddings(self) -> np.ndarray:
+        """(size, dim) normalised float32 matrix, equal to embedding source_text(i) row by row."""
+        if self._vocab_vectors is None:
+            self._vocab_vectors = np.vstack([self.embedder.token_vector(w) for w in self.vocab])
+        matrix = np.empty((self.size, self.embedder.dim), dtype=np.float32)
+        for batch in range((self.size + BATCH - 1) // BATCH):
+            ids = self._batch_word_ids(batch)
+            acc = np.zeros((len(ids), self.embedder.dim), dtype=np.float32)
+            for column in range(ids.shape[1]):
+                acc += self._vocab_vectors[ids[:, column]]
+            acc /= np.linalg.norm(acc, axis=1, keepdims=True)
+            matrix[batch * BATCH: batch * BATCH + len(ids)] = acc
+        return matrix
+
+    def ids(self) -> np.ndarray:
+        return np.arange(1, self.size + 1, dtype=np.int64)
+
+
+class _LazyTitles:
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def __getitem__(self, index):
+        return self.corpus.title(int(index))
+
+    def __len__(self):
+        return self.corpus.size
+
+
+# ------------------------------------------------------------
+# Assignments
+# ------------------------------------------------------------
+def make_assignment(corpus: SyntheticCorpus, words: int = 2000, copied_fraction: float = 0.3, seed: int = 0):
+    """
+    Returns (text, copied_source_ids). Roughly `copied_fraction` of the words
+    are whole abstracts copied from random sources; the rest is filler.
+    """
+    rng = np.random.default_rng([corpus.seed, 2, seed])
+    paragraphs, copied = [], []
+    copied_words = 0
+    filler_words = 0
+    target_copied = int(words * copied_fraction)
+
+    while copied_words + filler_words < words:
+        if copied_words < target_copied and rng.random() < copied_fraction * 2:
+            index = int(rng.integers(0, corpus.size))
+            paragraphs.append(corpus.abstract(index))
+            copied.append(corpus.source_id(index))
+            copied_words += ABSTRACT_WORDS
+        else:
+            filler = [corpus.vocab[i] for i in rng.integers(0, VOCAB_SIZE, SENTENCE_WORDS * 4)]
+            paragraphs.append(" ".join(
+                " ".join(filler[i:i + SENTENCE_WORDS]).capitalize() + "."
+                for i in range(0, len(filler), SENTENCE_WORDS)
+            ))
+            filler_words += len(filler)
+
+    return " ".join(paragraphs), copied
@@ -0,0 +1,211 @@
+# backend/benchmarks/run.py
+
+# ------------------------------------------------------------
+# Benchmark runner for the analysis core (no Docker, HF API or database needed)
+#
+#   cd backend
+#   python -m benchmarks.run                       # 1k + 100k sources
+#   python -m benchmarks.run --sizes 1k,100k,1m    # 1m needs ~2 GB RAM
+#   python -m benchmarks.run --pg                  # + pgvector on the live academic_sources
+#   python -m benchmarks.compare old.json new.json
+#
+# Micro: chunk_text, compute_plagiarism_score, the fake embedder (harness cost)
+# Search: InMemoryIndex single / batched queries per corpus size (+ pgvector)
+# Macro: detect_plagiarism end to end with FakeEmbedder + InMemoryIndex
+# Results go to benchmarks/results/<utc time>-<commit>.json
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+from benchmarks.corpus import FakeEmbedder, SyntheticCorpus, make_assignment, parse_size
+from plagiarism_utils import chunk_text, compute_plagiarism_score, detect_plagiarism, pgvector_searcher
+from vector_index import InMemoryIndex
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# ------------------------------------------------------------
+# Timing
+# ------------------------------------------------------------
+def measure(fn, repeat: int = 20, number: int = 1, warmup: int = 1) -> dict:
+    """Runs fn() `repeat` x `number` times; per-call latencies in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    samples = np.array(samples)
+    return {
+        "runs": repeat * number,
+        "mean_ms": round(float(samples.mean()), 4),
+        "median_ms": round(float(np.median(samples)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+        "min_ms": round(float(samples.min()), 4),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def record(results: list, name: str, stats: dict, **params):
+    entry = {"name": name, "params": params, **stats}
+    results.append(entry)
+    label = " ".join(f"{k}={v}" for k, v in params.items())
+    print(f"{name:<32} {label:<36} median {stats['median_ms']:>10.3f} ms  p99 {stats['p99_ms']:>10.3f} ms",
+          flush=True)
+
+
+# ------------------------------------------------------------
+# Benchmarks
+# ------------------------------------------------------------
+def bench_micro(results: list, corpus: SyntheticCorpus, embedder: FakeEmbedder, repeat: int):
+    for words in (2000, 20000):
+        assignment, _ = make_assignment(corpus, words=words)
+        record(results, "chunk_text", measure(lambda: chunk_text(assignment), repeat), words=words)
+
+    rng = random.Random(0)
+    for flagged in (10, 1000):
+        sections = [{"similarity": rng.uniform(0.6, 1.0)} for _ in range(flagged)]
+        record(results, "compute_plagiarism_score",
+               measure(lambda: compute_plagiarism_score(sections), repeat, number=100), flagged=flagged)
+
+    chunk = chunk_text(make_assignment(corpus, words=500)[0])[0]
+    record(results, "fake_embedder", measure(lambda: embedder(chunk), repeat, number=10), words=len(chunk.split()))
+
+
+def bench_search(results: list, size_label: str, corpus: SyntheticCorpus, index: InMemoryIndex,
+                 repeat: int, queries: int, top_k: int):
+    rng = np.random.default_rng(corpus.seed)
+    query_vectors = rng.standard_normal((queries, corpus.embedder.dim)).astype(np.float32)
+    cursor = iter(range(10 ** 9))
+
+    def single():
+        index.search(query_vectors[next(cursor) % queries], top_k)
+
+    record(results, "search.inmemory", measure(single, repeat=queries), size=size_label, k=top_k)
+
+    batch = min(64, queries)
+    stats = measure(lambda: index.top_k(query_vectors[:batch], top_k), repeat)
+    record(results, "search.inmemory_batch", stats, size=size_label, k=top_k, batch=batch)
+
+
+def bench_pgvector(results: list, repeat: int, queries: int, top_k: int):
+    import database
+    import embedding_models
+
+    db = database.SessionLocal()
+    try:
+        model = embedding_models.active_model(db)
+        if model is None:
+            print("No active embedding model; skipping the pgvector benchmark")
+            return
+        rows = db.execute(text("SELECT count(*) FROM source_embeddings WHERE model_id = :model_id"),
+                          {"model_id": model.id}).scalar()
+        search = pgvector_searcher(db, model)
+        rng = np.random.default_rng(0)
+        query_vectors = rng.standard_normal((queries, model.dim)).astype(np.float32)
+        cursor = iter(range(10 ** 9))
+        stats = measure(lambda: search(query_vectors[next(cursor) % queries].tolist(), top_k), repeat=queries)
+        record(results, "search.pgvector", stats, rows=rows, k=top_k)
+    finally:
+        db.close()
+
+
+def bench_detect(results: list, size_label: str, corpus: SyntheticCorpus, index: InMemoryIndex,
+                 embedder: FakeEmbedder, repeat: int, words: int):
+    assignment, copied = make_assignment(corpus, words=words, seed=1)
+
+    def run():
+        return detect_plagiarism(None, assignment, top_k=3, similarity_threshold=0.6,
+                                 embedder=embedder, searcher=index.search)
+
+    stats = measure(run, repeat=max(3, repeat // 4))
+    found = {s["source_id"] for s in run()["flagged_sections"]}
+    stats["copied_sources"] = len(copied)
+    stats["detected_sources"] = len(found & set(copied))
+    record(results, "detect_plagiarism", stats, size=size_label, words=words)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the plagiarism analysis core")
+    parser.add_argument("--sizes", default="1k,100k", help="corpus sizes: 1k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--words", type=int, default=2000, help="assignment length for detect_plagiarism")
+    parser.add_argument("--pg", action="store_true", help="also time pgvector on the configured database")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    # detect_plagiarism logs a summary line per run
+    logging.basicConfig(level=logging.WARNING)
+
+    embedder = FakeEmbedder()
+    results = []
+    meta = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+    }
+
+    bench_micro(results, SyntheticCorpus(1000, seed=args.seed, embedder=embedder), embedder, args.repeat)
+
+    for label in args.sizes.split(","):
+        size = parse_size(label)
+        corpus = SyntheticCorpus(size, seed=args.seed, embedder=embedder)
+        start = time.perf_counter()
+        index = InMemoryIndex(corpus.ids(), corpus.embeddings(), titles=corpus.titles, normalized=True)
+        build_ms = (time.perf_counter() - start) * 1000
+        record(results, "corpus.build", {"runs": 1, "mean_ms": build_ms, "median_ms": build_ms,
+                                         "p99_ms": build_ms, "min_ms": build_ms}, size=label)
+
+        bench_search(results, label, corpus, index, args.repeat, args.queries, args.top_k)
+        bench_detect(results, label, corpus, index, embedder, args.repeat, args.words)
+        del index
+
+    if args.pg:
+        bench_pgvector(results, args.repeat, args.queries, args.top_k)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{meta['commit']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
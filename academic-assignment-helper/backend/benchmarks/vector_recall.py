@@ -0,0 +1,242 @@
+# backend/benchmarks/vector_recall.py
+
+# ------------------------------------------------------------
+# Recall / latency of pgvector index settings on the real academic_sources
+#
+#   cd backend
+#   python -m benchmarks.vector_recall
+#   python -m benchmarks.vector_recall --ivfflat-lists 100,auto --ivfflat-probes 1,10,40 \
+#          --hnsw-m 16,32 --hnsw-ef-search 40,100,200 --queries 500 --k 10
+#
+# 1. copies the active model's source embeddings into an UNLOGGED scratch
+#    table, so the live index is never dropped or rebuilt
+# 2. exact ground truth: numpy cosine top-k over the same vectors
+#    (queries = sampled source embeddings + gaussian noise)
+# 3. for every index config (exact, ivfflat lists, hnsw m) builds the index,
+#    then per query knob (probes / ef_search) runs the app's KNN query and
+#    reports recall@k, QPS and p50/p99 latency
+# 4. prints the fastest config reaching --target-recall as env settings for
+#    vector_utils (VECTOR_INDEX_TYPE, IVFFLAT_LISTS, IVFFLAT_PROBES, ...)
+# Results go to benchmarks/results/vector-recall-<utc time>.json
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+
+import database
+from vector_index import InMemoryIndex, normalize_rows
+from vector_utils import vector_index_ddl
+from benchmarks.run import RESULTS_DIR, git_commit
+
+SCRATCH_TABLE = "vector_eval_sources"
+SCRATCH_INDEX = "vector_eval_sources_embedding_idx"
+
+KNN_SQL = f"SELECT id FROM {SCRATCH_TABLE} ORDER BY embedding <=> %s::vector LIMIT %s"
+
+
+def int_list(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def auto_lists(rows: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    return max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+
+
+# ------------------------------------------------------------
+# Setup
+# ------------------------------------------------------------
+def create_scratch_table(cur):
+    cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+    cur.execute("SELECT id, dim FROM embedding_models WHERE status = 'active'")
+    model = cur.fetchone()
+    if model is None:
+        return 0
+    model_id, dim = model
+    # typed column, so the scratch indexes match the per-model ones (embedding::vector(dim))
+    cur.execute(f"""
+        CREATE UNLOGGED TABLE {SCRATCH_TABLE} AS
+        SELECT source_id AS id, embedding::vector({int(dim)}) AS embedding
+        FROM source_embeddings WHERE model_id = %s
+    """, (model_id,))
+    cur.execute(f"ANALYZE {SCRATCH_TABLE}")
+    cur.execute(f"SELECT count(*) FROM {SCRATCH_TABLE}")
+    return cur.fetchone()[0]
+
+
+def load_ground_truth_index(cur) -> InMemoryIndex:
+    cur.execute(f"SELECT id, embedding::text FROM {SCRATCH_TABLE} ORDER BY id")
+    ids, vectors = [], []
+    for source_id, embedding in cur:
+        ids.append(source_id)
+        vectors.append(np.fromstring(embedding.strip("[]"), sep=",", dtype=np.float32))
+    return InMemoryIndex(ids, np.vstack(vectors))
+
+
+def make_queries(index: InMemoryIndex, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index), count)
+    queries = index.matrix[rows] + rng.standard_normal((count, index.matrix.shape[1])).astype(np.float32) * noise
+    return normalize_rows(queries)
+
+
+# ------------------------------------------------------------
+# Evaluation
+# ------------------------------------------------------------
+def run_queries(cur, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies, hits = [], 0
+    started = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        literal = "[" + ",".join(map(str, query.tolist())) + "]"
+        start = time.perf_counter()
+        cur.execute(KNN_SQL, (literal, k))
+        found = [row[0] for row in cur.fetchall()]
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found) & set(expected.tolist()))
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies)
+    return {
+        "recall": round(hits / (len(queries) * k), 4),
+        "qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def build_index(cur, index_type: str, **params) -> float:
+    cur.execute(f"DROP INDEX IF EXISTS {SCRATCH_INDEX}")
+    start = time.perf_counter()
+    cur.execute(vector_index_ddl(SCRATCH_TABLE, SCRATCH_INDEX, index_type, **params))
+    cur.execute(f"ANALYZE {SCRATCH_TABLE}")
+    return round(time.perf_counter() - start, 2)
+
+
+def report(results: list, entry: dict):
+    results.append(entry)
+    knobs = " ".join(f"{k}={v}" for k, v in entry["params"].items())
+    print(f"{entry['index']:<8} {knobs:<36} recall@k {entry['recall']:.4f}  "
+          f"{entry['qps']:>8.1f} qps  p99 {entry['p99_ms']:>8.2f} ms", flush=True)
+
+
+def suggest(results: list, target: float):
+    """Fastest (by QPS) configuration meeting the recall target, as env settings."""
+    candidates = [r for r in results if r["index"] != "exact" and r["recall"] >= target]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda r: r["qps"])
+    env = {"VECTOR_INDEX_TYPE": best["index"]}
+    names = {"lists": "IVFFLAT_LISTS", "probes": "IVFFLAT_PROBES", "m": "HNSW_M",
+             "ef_construction": "HNSW_EF_CONSTRUCTION", "ef_search": "HNSW_EF_SEARCH"}
+    for key, value in best["params"].items():
+        env[names[key]] = value
+    return {"config": best, "env": env}
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep pgvector index settings for recall and latency")
+    parser.add_argument("--k", type=int, default=10, help="recall@k (the app uses top_k=3..5)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="gaussian noise added to sampled sources")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ivfflat-lists", default="auto", help="comma list; 'auto' = rows/1000 or sqrt(rows)")
+    parser.add_argument("--ivfflat-probes", default="1,5,10,20,40")
+    parser.add_argument("--hnsw-m", default="16,32")
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--hnsw-ef-search", default="20,40,80,160")
+    parser.add_argument("--skip-exact", action="store_true")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--keep-table", action="store_true", help="leave the scratch table in place")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    raw = database.engine.raw_connection()
+    raw.autocommit = True
+    cur = raw.cursor()
+    results = []
+    try:
+        cur.execute("SET statement_timeout = 0")
+        rows = create_scratch_table(cur)
+        if rows == 0:
+            print("The active embedding model has no source embeddings; nothing to evaluate")
+            return 1
+        print(f"{rows} embedded sources copied to {SCRATCH_TABLE}")
+
+        index = load_ground_truth_index(cur)
+        queries = make_queries(index, args.queries, args.noise, args.seed)
+        k = min(args.k, rows)
+        truth_rows, _ = index.top_k(queries, k)
+        truth = index.ids[truth_rows]
+
+        if not args.skip_exact:
+            cur.execute(f"DROP INDEX IF EXISTS {SCRATCH_INDEX}")
+            report(results, {"index": "exact", "params": {}, "build_s": 0.0, **run_queries(cur, queries, truth, k)})
+
+        # the planner must not fall back to a sequential scan on small tables
+        cur.execute("SET enable_seqscan = off")
+
+        for lists in int_list(args.ivfflat_lists):
+            lists = auto_lists(rows) if lists == "auto" else int(lists)
+            build_s = build_index(cur, "ivfflat", lists=lists)
+            for probes in int_list(args.ivfflat_probes):
+                probes = int(probes)
+                if probes > lists:
+                    continue
+                cur.execute(f"SET ivfflat.probes = {probes}")
+                report(results, {"index": "ivfflat", "params": {"lists": lists, "probes": probes},
+                                 "build_s": build_s, **run_queries(cur, queries, truth, k)})
+        cur.execute("RESET ivfflat.probes")
+
+        for m in int_list(args.hnsw_m):
+            try:
+                build_s = build_index(cur, "hnsw", m=int(m), ef_construction=args.hnsw_ef_construction)
+            except Exception as e:
+                print(f"hnsw unavailable (pgvector >= 0.5.0 required): {e}")
+                break
+            for ef_search in int_list(args.hnsw_ef_search):
+                cur.execute(f"SET hnsw.ef_search = {int(ef_search)}")
+                report(results, {"index": "hnsw",
+                                 "params": {"m": int(m), "ef_construction": args.hnsw_ef_construction,
+                                            "ef_search": int(ef_search)},
+                                 "build_s": build_s, **run_queries(cur, queries, truth, k)})
+    finally:
+        if not args.keep_table:
+            cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cur.close()
+        raw.close()
+
+    suggestion = suggest(results, args.target_recall)
+    if suggestion:
+        print(f"\nFastest config with recall@{args.k} >= {args.target_recall}:")
+        for key, value in suggestion["env"].items():
+            print(f"  {key}={value}")
+    else:
+        print(f"\nNo index config reached recall@{args.k} >= {args.target_recall}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"vector-recall-{stamp}.json")
+    meta = {"commit": git_commit(), "created_at": datetime.now(timezone.utc).isoformat(),
+            "rows": rows, "args": vars(args)}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results, "suggestion": suggestion}, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
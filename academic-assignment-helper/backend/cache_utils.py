@@ -0,0 +1,70 @@
+# backend/cache_utils.py
+
+# ------------------------------------------------------------
+# Small in-process caches
+# Per worker process only: every entry expires after its TTL, so other
+# workers converge even when an invalidation happens elsewhere.
+# ------------------------------------------------------------
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "30"))                    # finished results
+ANALYSIS_PENDING_CACHE_TTL = float(os.getenv("ANALYSIS_PENDING_CACHE_TTL", "2"))     # "processing" answers
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_entries: int):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# assignment_id -> {"student_id", "etag", "body"}
+analysis_cache = TTLCache(ANALYSIS_CACHE_MAX_ENTRIES)
+
+
+def invalidate_analysis(assignment_id: int):
+    """Drops the cached GET /analysis view (call after the result is committed)."""
+    analysis_cache.invalidate(assignment_id)
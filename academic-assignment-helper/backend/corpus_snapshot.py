@@ -0,0 +1,412 @@
+# backend/corpus_snapshot.py
+
+# ------------------------------------------------------------
+# Binary snapshot / restore of the embedded academic_sources corpus
+# Bootstraps an environment without the .sql text dumps and without a single
+# embedding call.
+#
+# CMD: python corpus_snapshot.py export data/corpus-2025-10 [--shard-rows 50000]
+#      python corpus_snapshot.py verify data/corpus-2025-10
+#      python corpus_snapshot.py restore data/corpus-2025-10 [--workers 4] [--truncate]
+#
+# Layout (one directory):
+#   manifest.json          format version, model id, dim, row counts,
+#                          sha256 of every file, per shard
+#   shard-0000/
+#     id.npy                              int64
+#     publication_year.npy (+ .null.npy)  int32 + null mask
+#     <text column>.bin + .offsets.npy    utf-8 blob + int64 offsets (+ .null.npy)
+#     embedding.f32 (+ .null.npy)         raw little-endian float32, rows x dim
+# Export writes the active embedding model's vectors. Restore verifies every
+# checksum and the model id first, registers the model (embedding_models.py),
+# drops its vector index, COPYs the shards in parallel (binary COPY into
+# academic_sources and source_embeddings, one connection per worker), then
+# fixes the id sequence and rebuilds the index.
+# ------------------------------------------------------------
+
+import io
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import database
+import embedding_client
+import embedding_models
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "academic-corpus"
+FORMAT_VERSION = 1
+SHARD_ROWS = int(os.getenv("CORPUS_SNAPSHOT_SHARD_ROWS", "50000"))
+RESTORE_WORKERS = int(os.getenv("CORPUS_RESTORE_WORKERS", "4"))
+
+TEXT_COLUMNS = ("title", "authors", "abstract", "full_text", "source_type")
+COPY_COLUMNS = ("id", "title", "authors", "publication_year", "abstract", "full_text", "source_type", "embedding")
+SOURCE_COLUMNS = COPY_COLUMNS[:-1]  # academic_sources; embedding goes to source_embeddings
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+NULL_FIELD = struct.pack(">i", -1)
+
+
+class SnapshotError(Exception):
+    """Raised for a corrupt, incompatible or mismatching snapshot."""
+
+
+def psycopg2_dsn() -> str:
+    return database.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ------------------------------------------------------------
+# Export
+# ------------------------------------------------------------
+def _write_shard(path: str, rows: list, dim: int) -> dict:
+    """Writes one shard (rows in COPY_COLUMNS order); returns {file: sha256}."""
+    os.makedirs(path)
+    count = len(rows)
+
+    np.save(os.path.join(path, "id.npy"), np.array([r[0] for r in rows], dtype=np.int64))
+
+    years = [r[COPY_COLUMNS.index("publication_year")] for r in rows]
+    np.save(os.path.join(path, "publication_year.npy"),
+            np.array([y if y is not None else 0 for y in years], dtype=np.int32))
+    np.save(os.path.join(path, "publication_year.null.npy"), np.array([y is None for y in years]))
+
+    for column in TEXT_COLUMNS:
+        position = COPY_COLUMNS.index(column)
+        values = [r[position] for r in rows]
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        with open(os.path.join(path, f"{column}.bin"), "wb") as f:
+            for i, value in enumerate(values):
+                encoded = value.encode("utf-8") if value is not None else b""
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(os.path.join(path, f"{column}.offsets.npy"), offsets)
+        np.save(os.path.join(path, f"{column}.null.npy"), np.array([v is None for v in values]))
+
+    embeddings = [r[-1] for r in rows]
+    missing = np.array([e is None for e in embeddings])
+    vectors = np.zeros((count, dim), dtype="<f4")
+    present = [e[1:-1] for e in embeddings if e is not None]
+    if present:
+        # one C-level parse for the whole shard instead of one per row
+        parsed = np.fromstring(",".join(present), sep=",", dtype=np.float32)
+        if parsed.size != len(present) * dim:
+            raise SnapshotError("Embeddings with inconsistent dimensions")
+        vectors[~missing] = parsed.reshape(-1, dim)
+    vectors.tofile(os.path.join(path, "embedding.f32"))
+    np.save(os.path.join(path, "embedding.null.npy"), missing)
+
+    return {name: sha256_file(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+
+
+def export_corpus(out_dir: str, shard_rows: int = SHARD_ROWS) -> dict:
+    if os.path.exists(out_dir) and os.listdir(out_dir):
+        raise SnapshotError(f"{out_dir} is not empty")
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    model = embedding_models.active_model()
+    dim = model.dim if model else 0
+
+    raw = database.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("SET LOCAL statement_timeout = 0")
+
+        # server-side cursor: the corpus is streamed, one shard in memory at a time
+        stream = raw.cursor(name="corpus_snapshot_export")
+        stream.itersize = shard_rows
+        stream.execute("""
+            SELECT s.id, s.title, s.authors, s.publication_year, s.abstract, s.full_text, s.source_type,
+                   e.embedding::text
+            FROM academic_sources s
+            LEFT JOIN source_embeddings e ON e.source_id = s.id AND e.model_id = %s
+            ORDER BY s.id
+        """, (model.id if model else None,))
+        shards, total, embedded = [], 0, 0
+        while True:
+            rows = stream.fetchmany(shard_rows)
+            if not rows:
+                break
+            name = f"shard-{len(shards):04d}"
+            files = _write_shard(os.path.join(out_dir, name), rows, dim)
+            shard_embedded = sum(1 for r in rows if r[-1] is not None)
+            shards.append({"name": name, "rows": len(rows), "embedded": shard_embedded, "files": files})
+            total += len(rows)
+            embedded += shard_embedded
+            logger.info("Exported %s (%d rows)", name, len(rows))
+        stream.close()
+        raw.rollback()
+    finally:
+        raw.close()
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created_at": time.time(),
+        "model": model.name if model else embedding_client.EMBED_MODEL,
+        "dim": dim,
+        "rows": total,
+        "embedded_rows": embedded,
+        "text_columns": list(TEXT_COLUMNS),
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Exported %d sources (%d embedded) to %s in %.1fs",
+                total, embedded, out_dir, time.perf_counter() - started)
+    return manifest
+
+
+# ------------------------------------------------------------
+# Verify
+# ------------------------------------------------------------
+def load_manifest(snapshot_dir: str) -> dict:
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"No manifest.json in {snapshot_dir}")
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')} v{manifest.get('version')}")
+    return manifest
+
+
+def _verify_shard(snapshot_dir: str, shard: dict) -> list:
+    """Returns the files of a shard whose sha256 does not match the manifest."""
+    path = os.path.join(snapshot_dir, shard["name"])
+    bad = []
+    for name, expected in shard["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path) or sha256_file(file_path) != expected:
+            bad.append(f"{shard['name']}/{name}")
+    return bad
+
+
+def verify_corpus(snapshot_dir: str, workers: int = RESTORE_WORKERS) -> dict:
+    manifest = load_manifest(snapshot_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_verify_shard, [snapshot_dir] * len(manifest["shards"]), manifest["shards"])
+        bad = [name for shard_bad in results for name in shard_bad]
+    if bad:
+        raise SnapshotError(f"Checksum mismatch: {', '.join(bad[:10])}")
+    return manifest
+
+
+# ------------------------------------------------------------
+# Restore
+# ------------------------------------------------------------
+def _binary_copy_buffers(path: str, dim: int, model_id: int):
+    """
+    Encodes one shard as PostgreSQL binary COPY streams: academic_sources rows
+    and (model_id, source_id, embedding) rows (vector via vector_recv).
+    """
+    ids = np.load(os.path.join(path, "id.npy"))
+    count = len(ids)
+    years = np.load(os.path.join(path, "publication_year.npy"))
+    years_null = np.load(os.path.join(path, "publication_year.null.npy"))
+    vectors = np.fromfile(os.path.join(path, "embedding.f32"), dtype="<f4").reshape(count, dim).astype(">f4")
+    vectors_null = np.load(os.path.join(path, "embedding.null.npy"))
+
+    text = {}
+    for column in TEXT_COLUMNS:
+        with open(os.path.join(path, f"{column}.bin"), "rb") as f:
+            blob = f.read()
+        text[column] = (blob, np.load(os.path.join(path, f"{column}.offsets.npy")).tolist(),
+                        np.load(os.path.join(path, f"{column}.null.npy")))
+
+    def text_field(column, i):
+        blob, offsets, nulls = text[column]
+        if nulls[i]:
+            return NULL_FIELD
+        value = blob[offsets[i]:offsets[i + 1]]
+        return struct.pack(">i", len(value)) + value
+
+    tuple_header = struct.pack(">h", len(SOURCE_COLUMNS))
+    int_field = struct.Struct(">ii")
+    embedding_header = struct.pack(">h", 3) + int_field.pack(4, int(model_id))
+    vector_header = struct.pack(">iHH", 4 + 4 * dim, dim, 0)
+
+    sources, embeddings = io.BytesIO(), io.BytesIO()
+    sources.write(PGCOPY_HEADER)
+    embeddings.write(PGCOPY_HEADER)
+    for i in range(count):
+        sources.write(tuple_header)
+        sources.write(int_field.pack(4, int(ids[i])))
+        sources.write(text_field("title", i))
+        sources.write(text_field("authors", i))
+        sources.write(NULL_FIELD if years_null[i] else int_field.pack(4, int(years[i])))
+        sources.write(text_field("abstract", i))
+        sources.write(text_field("full_text", i))
+        sources.write(text_field("source_type", i))
+        if not vectors_null[i]:
+            embeddings.write(embedding_header)
+            embeddings.write(int_field.pack(4, int(ids[i])))
+            embeddings.write(vector_header)
+            embeddings.write(vectors[i].tobytes())
+    for out in (sources, embeddings):
+        out.write(PGCOPY_TRAILER)
+        out.seek(0)
+    return sources, embeddings
+
+
+def _load_shard(dsn: str, snapshot_dir: str, shard: dict, dim: int, model_id: int) -> int:
+    import psycopg2
+
+    sources, embeddings = _binary_copy_buffers(os.path.join(snapshot_dir, shard["name"]), dim, model_id)
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = 0")
+            cur.copy_expert(
+                f"COPY academic_sources ({', '.join(SOURCE_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+                sources,
+            )
+            cur.copy_expert(
+                "COPY source_embeddings (model_id, source_id, embedding) FROM STDIN WITH (FORMAT binary)",
+                embeddings,
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return shard["rows"]
+
+
+def restore_corpus(snapshot_dir: str, workers: int = RESTORE_WORKERS, truncate: bool = False,
+                   allow_model_mismatch: bool = False) -> dict:
+    """
+    Loads a snapshot into an empty academic_sources (or truncates it first).
+    Source ids are preserved, so stored analysis results keep pointing at the same sources.
+    The vectors are stored under the snapshot's model, which becomes active if none is;
+    with --allow-model-mismatch they sit next to the active model until a cutover.
+    --truncate removes every model's vectors, so the snapshot's model then becomes
+    active and any other active model is retired (it would have nothing to search).
+    """
+    import embedding_snapshot
+    from sqlalchemy import text
+
+    started = time.perf_counter()
+    manifest = verify_corpus(snapshot_dir, workers)
+    active = embedding_models.active_model()
+    serving = active.name if active else embedding_client.EMBED_MODEL
+    if manifest["model"] != serving and not allow_model_mismatch:
+        raise SnapshotError(
+            f"Snapshot embeddings come from {manifest['model']}, this environment uses "
+            f"{serving} (pass --allow-model-mismatch to load anyway)"
+        )
+
+    with database.engine.begin() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        if truncate:
+            # also clears every model's source_embeddings
+            conn.execute(text("TRUNCATE academic_sources CASCADE"))
+        elif conn.execute(text("SELECT EXISTS (SELECT 1 FROM academic_sources)")).scalar():
+            raise SnapshotError("academic_sources is not empty (pass --truncate to replace it)")
+        params = {"name": manifest["model"], "dim": manifest["dim"]}
+        conn.execute(text(
+            "INSERT INTO embedding_models (name, dim) VALUES (:name, :dim) ON CONFLICT (name) DO NOTHING"
+        ), params)
+        if truncate:
+            conn.execute(text(
+                "UPDATE embedding_models SET status = 'retired' WHERE status = 'active' AND name <> :name"
+            ), params)
+        conn.execute(text("""
+            UPDATE embedding_models SET status = 'active', activated_at = now()
+            WHERE name = :name AND NOT EXISTS (SELECT 1 FROM embedding_models WHERE status = 'active')
+        """), params)
+        model = embedding_models.get_model(conn, manifest["model"])
+        if model.dim != manifest["dim"]:
+            raise SnapshotError(f"{model.name} is registered with dim {model.dim}, snapshot has {manifest['dim']}")
+        # one index build at the end beats maintaining it row by row
+        conn.execute(text(f"DROP INDEX IF EXISTS {model.index_name}"))
+
+    dsn = psycopg2_dsn()
+    shards = manifest["shards"]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_load_shard, dsn, snapshot_dir, shard, manifest["dim"], model.id)
+                   for shard in shards]
+        loaded = 0
+        for shard, future in zip(shards, futures):
+            loaded += future.result()
+            logger.info("Restored %s (%d / %d rows)", shard["name"], loaded, manifest["rows"])
+
+    with database.engine.begin() as conn:
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('academic_sources', 'id'), "
+            "COALESCE((SELECT max(id) FROM academic_sources), 1))"
+        ))
+        conn.execute(text("ANALYZE academic_sources"))
+        conn.execute(text("ANALYZE source_embeddings"))
+    embedding_models.clear_active_cache()
+
+    db = database.SessionLocal()
+    try:
+        embedding_models.create_model_index(model)
+        if embedding_snapshot.SNAPSHOT_ENABLED:
+            embedding_snapshot.export_snapshot(db)
+    finally:
+        db.close()
+
+    logger.info("Restored %d sources from %s in %.1fs", loaded, snapshot_dir, time.perf_counter() - started)
+    return {"rows": loaded, "embedded_rows": manifest["embedded_rows"], "model": manifest["model"]}
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    from logging_utils import setup_logging, shutdown_logging
+
+    parser = argparse.ArgumentParser(description="Binary snapshot / restore of academic_sources")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write the corpus to a snapshot directory")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+
+    verify_cmd = commands.add_parser("verify", help="Check checksums and format")
+    verify_cmd.add_argument("path")
+
+    restore_cmd = commands.add_parser("restore", help="Bulk load a snapshot with parallel COPY")
+    restore_cmd.add_argument("path")
+    restore_cmd.add_argument("--workers", type=int, default=RESTORE_WORKERS)
+    restore_cmd.add_argument("--truncate", action="store_true", help="Replace existing sources")
+    restore_cmd.add_argument("--allow-model-mismatch", action="store_true")
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    try:
+        if args.command == "export":
+            export_corpus(args.path, args.shard_rows)
+        elif args.command == "verify":
+            manifest = verify_corpus(args.path)
+            logger.info("Snapshot OK: %d sources, model %s", manifest["rows"], manifest["model"])
+        else:
+            restore_corpus(args.path, args.workers, args.truncate, args.allow_model_mismatch)
+        return 0
+    except SnapshotError as e:
+        logger.error("%s", e)
+        return 1
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
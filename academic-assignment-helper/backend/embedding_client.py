@@ -0,0 +1,68 @@
+# backend/embedding_client.py
+
+# ------------------------------------------------------------
+# Shared Hugging Face embedding client
+# One InferenceClient per process, created on first use (or by the startup
+# warmup) instead of one per module at import time. vector_utils (sources)
+# and plagiarism_utils (assignment chunks) both embed through embed_text().
+# ------------------------------------------------------------
+
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from metrics import stage_timer, UPSTREAM_ERRORS, UPSTREAM_RETRIES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HF_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
+# seeds the first registered model; afterwards embedding_models decides (see embedding_models.py)
+EMBED_MODEL = os.getenv("HUGGINGFACE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_MAX_CHARS = 1000
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from huggingface_hub import InferenceClient
+                _client = InferenceClient(api_key=HF_API_KEY)
+    return _client
+
+
+def embed_text(text: str, retries: int = 3, stage: str = "embedding", model: str = None):
+    """
+    Embeds `text` (first EMBED_MAX_CHARS characters) with `model` (default
+    EMBED_MODEL) and returns a python list (384 floats for all-MiniLM-L6-v2).
+    """
+    client = get_client()
+    model = model or EMBED_MODEL
+    for attempt in range(retries):
+        try:
+            with stage_timer(stage):
+                result = client.feature_extraction(text[:EMBED_MAX_CHARS], model=model)
+
+            if isinstance(result, list) and isinstance(result[0], list):
+                return result[0]
+            elif isinstance(result, np.ndarray):
+                return result.tolist()
+            return result
+
+        except Exception as e:
+            UPSTREAM_ERRORS.labels("huggingface").inc()
+            if attempt + 1 < retries:
+                UPSTREAM_RETRIES.labels("huggingface").inc()
+            logger.warning("Embedding retry %d/%d: %s", attempt + 1, retries, e)
+            time.sleep(2)
+
+    raise RuntimeError("Failed to embed text after retries")
@@ -0,0 +1,408 @@
+# backend/embedding_models.py
+
+# ------------------------------------------------------------
+# Model-versioned source embeddings
+# - embedding_models: one row per embedding model (name, dim, status);
+#   exactly one is 'active' and serves every search
+# - source_embeddings (model_id, source_id, embedding): vectors of any
+#   dimension, with one partial ANN index per model on embedding::vector(dim)
+#
+# Switching models without downtime:
+#   python embedding_models.py register sentence-transformers/all-mpnet-base-v2
+#   python embedding_models.py backfill sentence-transformers/all-mpnet-base-v2 --rate 5
+#   python embedding_models.py status
+#   python embedding_models.py cutover sentence-transformers/all-mpnet-base-v2
+# Searches keep using the active model while the backfill runs; cutover builds
+# the new index (CONCURRENTLY), refuses to continue unless it is valid, checks
+# coverage and flips 'active' in one transaction. Workers see the switch within
+# ACTIVE_MODEL_CHECK_SECONDS; a detection run resolves its model once, so it
+# never mixes the two.
+# With PLAGIARISM_SEARCH_SCOPE=passages, backfill and cutover cover the model's
+# source_passages (and passage index) too.
+# ------------------------------------------------------------
+
+import os
+import sys
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import database
+import embedding_client
+import source_passages
+import vector_utils
+from cache_utils import TTLCache
+from metrics import EMBEDDING_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_MODEL_CHECK_SECONDS = float(os.getenv("ACTIVE_MODEL_CHECK_SECONDS", "10"))
+EMBED_BACKFILL_BATCH_SIZE = int(os.getenv("EMBED_BACKFILL_BATCH_SIZE", "100"))
+EMBED_BACKFILL_RATE = float(os.getenv("EMBED_BACKFILL_RATE", "5"))  # texts per second, 0 = unthrottled
+
+STATUS_BACKFILLING = "backfilling"
+STATUS_ACTIVE = "active"
+STATUS_RETIRED = "retired"
+
+_active_cache = TTLCache(1)
+
+
+@dataclass(frozen=True)
+class EmbeddingModel:
+    id: int
+    name: str
+    dim: int
+    status: str
+
+    @property
+    def vector_expr(self) -> str:
+        # the cast makes the per-model expression index usable (and typmod-checked)
+        return f"embedding::vector({int(self.dim)})"
+
+    @property
+    def index_name(self) -> str:
+        return f"source_embeddings_m{int(self.id)}_idx"
+
+
+class EmbeddingModelError(Exception):
+    """Unknown model, incomplete backfill, or a failed cutover precondition."""
+
+
+# ------------------------------------------------------------
+# Lookup
+# ------------------------------------------------------------
+def _row_to_model(row):
+    return EmbeddingModel(id=row.id, name=row.name, dim=row.dim, status=row.status) if row else None
+
+
+def get_model(db, name: str):
+    row = db.execute(
+        text("SELECT id, name, dim, status FROM embedding_models WHERE name = :name"), {"name": name}
+    ).first()
+    return _row_to_model(row)
+
+
+def active_model(db=None):
+    """The model serving searches (None before anything was embedded); cached briefly per process."""
+    cached = _active_cache.get("active")
+    if cached is not None:
+        return cached
+    query = text("SELECT id, name, dim, status FROM embedding_models WHERE status = 'active'")
+    if db is not None:
+        model = _row_to_model(db.execute(query).first())
+    else:
+        with database.engine.connect() as conn:
+            model = _row_to_model(conn.execute(query).first())
+    if model is not None:
+        _active_cache.set("active", model, ACTIVE_MODEL_CHECK_SECONDS)
+    return model
+
+
+def clear_active_cache():
+    """Forgets the cached active model (this process; others re-read within ACTIVE_MODEL_CHECK_SECONDS)."""
+    _active_cache.clear()
+
+
+def register_model(db, name: str, status: str = STATUS_BACKFILLING) -> EmbeddingModel:
+    """Registers `name` (dimension probed with one embedding call); returns the existing row if any."""
+    existing = get_model(db, name)
+    if existing:
+        return existing
+    dim = len(embedding_client.embed_text("dimension probe", retries=3, model=name))
+    row = db.execute(text("""
+        INSERT INTO embedding_models (name, dim, status, activated_at)
+        VALUES (:name, :dim, :status, CASE WHEN :status = 'active' THEN now() END)
+        ON CONFLICT (name) DO NOTHING
+        RETURNING id, name, dim, status
+    """), {"name": name, "dim": dim, "status": status}).first()
+    db.commit()
+    logger.info("Registered embedding model %s (dim %d, %s)", name, dim, status)
+    return _row_to_model(row) or get_model(db, name)
+
+
+def ensure_active_model(db) -> EmbeddingModel:
+    """Active model, registering HUGGINGFACE_EMBEDDING_MODEL as active on a fresh database."""
+    return active_model(db) or register_model(db, embedding_client.EMBED_MODEL, status=STATUS_ACTIVE)
+
+
+# ------------------------------------------------------------
+# Search SQL
+# ------------------------------------------------------------
+def knn_sql(model: EmbeddingModel):
+    """Top-k sources for :embedding under `model` (params: embedding, top_k)."""
+    dim = int(model.dim)
+    distance = f"{model.vector_expr} <=> CAST(:embedding AS vector({dim}))"
+    # kNN on source_embeddings alone so the model's partial index drives the scan
+    return text(f"""
+        SELECT s.id, s.title, s.abstract, 1 - k.distance AS similarity
+        FROM (
+            SELECT source_id, {distance} AS distance
+            FROM source_embeddings
+            WHERE model_id = {int(model.id)}
+            ORDER BY {distance}
+            LIMIT :top_k
+        ) k
+        JOIN academic_sources s ON s.id = k.source_id
+        ORDER BY k.distance
+    """)
+
+
+def index_state(conn, name: str):
+    """None if index `name` does not exist, else whether it is valid (usable by the planner)."""
+    return conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def create_model_index(model: EmbeddingModel, concurrently: bool = True, table: str = "source_embeddings",
+                       name: str = None, index_type: str = None, build_settings=(), rebuild: bool = False):
+    """
+    Builds the model's partial ANN index on `table` (VECTOR_INDEX_TYPE etc.) without
+    blocking writes. `build_settings` are SET statements for the build session, which
+    runs on its own maintenance connection (closed afterwards, never returned to a pool).
+    Builds of the same index are serialised with an advisory lock, so an INVALID index
+    seen under the lock is a leftover of a failed or cancelled build, never one still
+    running; it is dropped first (IF NOT EXISTS would skip it). `rebuild` drops a valid
+    one too. Raises EmbeddingModelError if the result is not valid.
+    """
+    name = name or model.index_name
+    ddl = vector_utils.vector_index_ddl(
+        table, name, index_type=index_type or vector_utils.VECTOR_INDEX_TYPE,
+        column=model.vector_expr, where=f"model_id = {int(model.id)}",
+    )
+    if not ddl:
+        return
+    if concurrently:
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+    # CONCURRENTLY cannot run inside a transaction block (the maintenance engine autocommits)
+    with database.maintenance_engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": name})
+        try:
+            state = index_state(conn, name)
+            if state is False or (rebuild and state):
+                logger.warning("Dropping %s vector index %s before rebuilding it",
+                               "invalid" if state is False else "existing", name)
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            for setting in build_settings:
+                conn.execute(text(setting))
+            conn.execute(text(ddl))
+            if not index_state(conn, name):
+                raise EmbeddingModelError(f"Vector index {name} is missing or invalid after the build")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+    logger.info("Vector index %s ready for %s", name, model.name)
+
+
+# ------------------------------------------------------------
+# Embedding / backfill
+# ------------------------------------------------------------
+def embed_missing(db: Session, model: EmbeddingModel, source_ids=None, rate: float = 0,
+                  batch_size: int = EMBED_BACKFILL_BATCH_SIZE, stage: str = "source_embedding") -> dict:
+    """
+    Embeds every source without a vector for `model` (optionally only `source_ids`),
+    committing per batch. `rate` caps embedding calls per second (0 = no cap).
+    """
+    ids_filter = "AND s.id = ANY(:ids)" if source_ids is not None else ""
+    select_missing = text(f"""
+        SELECT s.id, s.title, s.abstract
+        FROM academic_sources s
+        WHERE s.id > :after {ids_filter}
+          AND NOT EXISTS (SELECT 1 FROM source_embeddings e
+                          WHERE e.model_id = :model_id AND e.source_id = s.id)
+        ORDER BY s.id
+        LIMIT :limit
+    """)
+    insert = text("""
+        INSERT INTO source_embeddings (model_id, source_id, embedding)
+        VALUES (:model_id, :source_id, CAST(:embedding AS vector))
+        ON CONFLICT (model_id, source_id) DO UPDATE SET embedding = EXCLUDED.embedding
+    """)
+
+    stats = {"embedded": 0, "failed": 0}
+    after = 0
+    interval = 1.0 / rate if rate else 0.0
+    while True:
+        params = {"after": after, "model_id": model.id, "limit": batch_size}
+        if source_ids is not None:
+            params["ids"] = list(source_ids)
+        batch = db.execute(select_missing, params).fetchall()
+        db.commit()  # don't hold a snapshot open while calling the API
+        if not batch:
+            break
+
+        values = []
+        for src in batch:
+            started = time.monotonic()
+            try:
+                EMBEDDING_BATCH_SIZE.labels("sources").observe(1)
+                vector = embedding_client.embed_text(f"{src.title}. {src.abstract or ''}", stage=stage,
+                                                     model=model.name)
+                values.append({"model_id": model.id, "source_id": src.id,
+                               "embedding": "[" + ",".join(map(str, vector)) + "]"})
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning("Embedding failed for source %s (%s): %s", src.id, model.name, e)
+            if interval:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        if values:
+            db.execute(insert, values)
+            db.commit()
+        stats["embedded"] += len(values)
+        after = batch[-1].id
+        logger.debug("Embedded batch up to source %s", after, extra={"sample": True, "model": model.name})
+
+    return stats
+
+
+def coverage(db, model: EmbeddingModel) -> dict:
+    row = db.execute(text("""
+        SELECT (SELECT count(*) FROM academic_sources) AS sources,
+               (SELECT count(*) FROM source_embeddings WHERE model_id = :model_id) AS embedded
+    """), {"model_id": model.id}).one()
+    ratio = row.embedded / row.sources if row.sources else 1.0
+    return {"model": model.name, "status": model.status, "dim": model.dim,
+            "sources": row.sources, "embedded": row.embedded, "coverage": round(ratio, 6)}
+
+
+def backfill(db: Session, name: str, rate: float = EMBED_BACKFILL_RATE,
+             batch_size: int = EMBED_BACKFILL_BATCH_SIZE) -> dict:
+    """Re-embeds the corpus for a (registered) model while the active one keeps serving."""
+    model = get_model(db, name) or register_model(db, name)
+    stats = embed_missing(db, model, rate=rate, batch_size=batch_size, stage="backfill_embedding")
+    result = {**stats, **coverage(db, model)}
+    if source_passages.PASSAGES_ENABLED:
+        passages = source_passages.embed_passages(db, model, rate=rate)
+        result["passages"] = source_passages.coverage(db, model)
+        result["coverage"] = min(result["coverage"], result["passages"]["coverage"])
+        result["passages_embedded"] = passages["passages"]
+    logger.info("Backfill pass for %s: %d embedded, %d failed, coverage %.4f",
+                name, stats["embedded"], stats["failed"], result["coverage"])
+    return result
+
+
+def cutover(db: Session, name: str, min_coverage: float = 1.0) -> EmbeddingModel:
+    """Makes `name` the active model once its index exists and coverage >= min_coverage."""
+    model = get_model(db, name)
+    if model is None:
+        raise EmbeddingModelError(f"Unknown embedding model {name}")
+    if model.status == STATUS_ACTIVE:
+        return model
+
+    create_model_index(model)
+    if source_passages.PASSAGES_ENABLED:
+        source_passages.create_passage_index(model)
+
+    # never serve the new model from sequential scans
+    required = []
+    if vector_utils.VECTOR_INDEX_TYPE != "none":
+        required.append(model.index_name)
+    if source_passages.PASSAGES_ENABLED and source_passages.PASSAGE_INDEX_TYPE != "none":
+        required.append(source_passages.passage_index_name(model))
+    for index_name in required:
+        if not index_state(db, index_name):
+            db.rollback()
+            raise EmbeddingModelError(f"Vector index {index_name} is missing or invalid; not cutting over")
+
+    # the row lock serialises concurrent cutovers; readers keep the old model until commit
+    db.execute(text("SELECT id FROM embedding_models WHERE id = :id FOR UPDATE"), {"id": model.id})
+    current = coverage(db, model)
+    if current["coverage"] < min_coverage:
+        db.rollback()
+        raise EmbeddingModelError(
+            f"{name} covers {current['embedded']}/{current['sources']} sources "
+            f"({current['coverage']:.2%}); run the backfill first"
+        )
+    if source_passages.PASSAGES_ENABLED:
+        passages = source_passages.coverage(db, model)
+        if passages["coverage"] < min_coverage:
+            db.rollback()
+            raise EmbeddingModelError(
+                f"{name} has passages for {passages['embedded_sources']}/{passages['sources']} sources "
+                f"({passages['coverage']:.2%}); run the backfill first"
+            )
+    db.execute(text("UPDATE embedding_models SET status = 'retired' WHERE status = 'active'"))
+    db.execute(text("UPDATE embedding_models SET status = 'active', activated_at = now() WHERE id = :id"),
+               {"id": model.id})
+    db.commit()
+    clear_active_cache()
+    logger.info("Cut over to embedding model %s", name)
+    return get_model(db, name)
+
+
+def drop_model(db: Session, name: str):
+    """Deletes a non-active model with its vectors and index (e.g. the retired one after a cutover)."""
+    model = get_model(db, name)
+    if model is None:
+        raise EmbeddingModelError(f"Unknown embedding model {name}")
+    if model.status == STATUS_ACTIVE:
+        raise EmbeddingModelError("Cannot drop the active model")
+    db.execute(text("SET LOCAL statement_timeout = 0"))
+    db.execute(text(f"DROP INDEX IF EXISTS {model.index_name}"))
+    db.execute(text(f"DROP INDEX IF EXISTS {source_passages.passage_index_name(model)}"))
+    db.execute(text("DELETE FROM embedding_models WHERE id = :id"), {"id": model.id})  # cascades
+    db.commit()
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    import json
+    from logging_utils import setup_logging, shutdown_logging
+    import embedding_snapshot
+
+    parser = argparse.ArgumentParser(description="Versioned embedding models")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    index_cmd = commands.add_parser("index", help="Build the active model's vector index(es)")
+    index_cmd.add_argument("--rebuild", action="store_true", help="drop and rebuild, e.g. after changing parameters")
+    for name in ("register", "backfill", "cutover", "drop"):
+        cmd = commands.add_parser(name)
+        cmd.add_argument("model")
+        if name == "backfill":
+            cmd.add_argument("--rate", type=float, default=EMBED_BACKFILL_RATE, help="embedding calls per second")
+            cmd.add_argument("--batch-size", type=int, default=EMBED_BACKFILL_BATCH_SIZE)
+            cmd.add_argument("--until-complete", action="store_true", help="repeat passes until coverage is 100%%")
+        if name == "cutover":
+            cmd.add_argument("--min-coverage", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    db = database.SessionLocal()
+    try:
+        if args.command == "status":
+            models = db.execute(text("SELECT id, name, dim, status FROM embedding_models ORDER BY id")).fetchall()
+            print(json.dumps([coverage(db, _row_to_model(m)) for m in models], indent=2))
+        elif args.command == "index":
+            return 0 if vector_utils.index_academic_sources(db, rebuild=args.rebuild) else 1
+        elif args.command == "register":
+            print(register_model(db, args.model))
+        elif args.command == "backfill":
+            while True:
+                result = backfill(db, args.model, args.rate, args.batch_size)
+                if not args.until_complete or result["coverage"] >= 1.0 \
+                        or not (result["embedded"] or result.get("passages_embedded")):
+                    break
+            print(json.dumps(result, indent=2))
+        elif args.command == "cutover":
+            cutover(db, args.model, args.min_coverage)
+            if embedding_snapshot.SNAPSHOT_ENABLED:
+                embedding_snapshot.export_snapshot(db)
+        else:
+            drop_model(db, args.model)
+        return 0
+    except EmbeddingModelError as e:
+        logger.error("%s", e)
+        return 1
+    finally:
+        db.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# backend/embedding_snapshot.py
+
+# ------------------------------------------------------------
+# Shared, memory-mapped snapshot of the source embeddings
+# One process (embed_academic_sources, source_importer, or
+# `python embedding_snapshot.py export`) writes the snapshot; every API worker
+# mmaps the same read-only files, so the page cache holds the vectors once no
+# matter how many workers run.
+#
+# data/embeddings/
+#   CURRENT                   -> name of the live version (swapped with os.replace)
+#   v<ns>/vectors.npy         (rows, dim) float32, L2-normalised
+#   v<ns>/ids.npy             (rows,) int64 source ids
+#   v<ns>/titles.bin + titles_offsets.npy   utf-8 titles, sliced on demand
+#   v<ns>/meta.json           rows, dim, model, created_at
+# A snapshot holds one embedding model (the active one at export time) and is
+# only searched while that model is active (see embedding_models.py).
+# Old versions are pruned after a swap; workers still mapping one keep their
+# (unlinked) files until they pick up the new CURRENT.
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import text
+
+import embedding_models
+from vector_index import InMemoryIndex, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# PLAGIARISM_SEARCH_ENGINE=snapshot: detect_plagiarism searches the mapped
+# snapshot instead of pgvector, and embed_academic_sources re-exports it
+SNAPSHOT_ENABLED = os.getenv("PLAGIARISM_SEARCH_ENGINE", "pgvector").lower() == "snapshot"
+SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", "data/embeddings")
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("EMBEDDING_SNAPSHOT_CHECK_SECONDS", "5"))
+SNAPSHOT_KEEP_VERSIONS = 2
+EXPORT_BATCH_SIZE = 10000
+POINTER = "CURRENT"
+
+# "current" = (index, model) swapped as one tuple, so readers never pair mismatched halves
+_loaded = {"version": None, "current": (None, None), "checked_at": float("-inf")}
+_load_lock = threading.Lock()
+
+
+# ------------------------------------------------------------
+# Export (writer side)
+# ------------------------------------------------------------
+def export_snapshot(db) -> str:
+    """Writes a new version from the active model's source embeddings and makes it CURRENT; returns its name."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    # one writer at a time across processes
+    with open(os.path.join(SNAPSHOT_DIR, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        started = time.perf_counter()
+        version = f"v{time.time_ns()}"
+        tmp_dir = os.path.join(SNAPSHOT_DIR, f".{version}.tmp")
+        os.makedirs(tmp_dir)
+        try:
+            rows = _write_version(db, tmp_dir)
+            os.rename(tmp_dir, os.path.join(SNAPSHOT_DIR, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        pointer_tmp = os.path.join(SNAPSHOT_DIR, f".{POINTER}.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(SNAPSHOT_DIR, POINTER))
+
+        _prune(version)
+    logger.info("Exported embedding snapshot %s (%d rows) in %.2fs", version, rows, time.perf_counter() - started)
+    return version
+
+
+def _write_version(db, path: str) -> int:
+    # the snapshot covers rows embedded when the count is taken; later ones land in the next export
+    bind = db.get_bind()
+    model = embedding_models.active_model(db)
+    model_id = model.id if model else None
+    rows = db.execute(text("SELECT count(*) FROM source_embeddings WHERE model_id = :model_id"),
+                      {"model_id": model_id}).scalar()
+    rows, dim = int(rows), model.dim if model else 0
+
+    vectors = np.lib.format.open_memmap(os.path.join(path, "vectors.npy"), mode="w+",
+                                        dtype=np.float32, shape=(rows, dim))
+    ids = np.empty(rows, dtype=np.int64)
+    offsets = np.zeros(rows + 1, dtype=np.int64)
+
+    written = 0
+    with bind.connect() as conn, open(os.path.join(path, "titles.bin"), "wb") as titles:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(text(
+            "SELECT s.id, s.title, e.embedding::text AS embedding "
+            "FROM source_embeddings e JOIN academic_sources s ON s.id = e.source_id "
+            "WHERE e.model_id = :model_id ORDER BY e.source_id"
+        ), {"model_id": model_id})
+        for batch in result.partitions():
+            batch = batch[: rows - written]
+            if not batch:
+                break
+            block = np.vstack([np.fromstring(r.embedding.strip("[]"), sep=",", dtype=np.float32) for r in batch])
+            end = written + len(batch)
+            vectors[written:end] = normalize_rows(block)
+            ids[written:end] = [r.id for r in batch]
+            for i, r in enumerate(batch, start=written):
+                encoded = (r.title or "").encode("utf-8")
+                titles.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+            written = end
+
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(path, "ids.npy"), ids[:written])
+    np.save(os.path.join(path, "titles_offsets.npy"), offsets[: written + 1])
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"rows": written, "dim": dim, "model": model.name if model else None,
+                   "created_at": time.time()}, f)
+    return written
+
+
+def _prune(current: str):
+    versions = sorted(
+        (d for d in os.listdir(SNAPSHOT_DIR) if d.startswith("v") and d != current),
+        reverse=True,
+    )
+    for old in versions[SNAPSHOT_KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, old), ignore_errors=True)
+
+
+# ------------------------------------------------------------
+# Load (reader side, every worker)
+# ------------------------------------------------------------
+class MappedTitles:
+    """Titles decoded on access from the mmapped utf-8 blob."""
+
+    def __init__(self, path: str):
+        self.offsets = np.load(os.path.join(path, "titles_offsets.npy"), mmap_mode="r")
+        size = os.path.getsize(os.path.join(path, "titles.bin"))
+        self.blob = np.memmap(os.path.join(path, "titles.bin"), dtype=np.uint8, mode="r") if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+def current_version():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _open_version(version: str) -> InMemoryIndex:
+    path = os.path.join(SNAPSHOT_DIR, version)
+    ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+    # rows deleted during the export leave unused zero rows at the end
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")[: len(ids)]
+    titles = MappedTitles(path)
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        model = json.load(f).get("model")
+    return InMemoryIndex(ids, vectors, titles=titles, normalized=True), model
+
+
+def current_index(model: str = None):
+    """
+    Index over the CURRENT snapshot (None if none was exported, or if it was
+    exported for another embedding model than `model`). The pointer is
+    re-read at most every EMBEDDING_SNAPSHOT_CHECK_SECONDS; a new version is
+    mapped and swapped in, and searches already running keep the old one.
+    """
+    now = time.monotonic()
+    if now - _loaded["checked_at"] >= SNAPSHOT_CHECK_SECONDS:
+        with _load_lock:
+            if now - _loaded["checked_at"] >= SNAPSHOT_CHECK_SECONDS:
+                _reload()
+                _loaded["checked_at"] = now
+
+    index, loaded_model = _loaded["current"]
+    if model is not None and loaded_model != model:
+        return None
+    return index
+
+
+def _reload():
+    version = current_version()
+    if version and version != _loaded["version"]:
+        try:
+            index, model = _open_version(version)
+            _loaded["current"] = (index, model)
+            _loaded["version"] = version
+            logger.info("Mapped embedding snapshot %s (%d rows, %s)", version, len(index), model)
+        except FileNotFoundError:
+            # pruned between reading CURRENT and opening it; retry on the next check
+            logger.warning("Embedding snapshot %s disappeared while loading", version)
+
+
+# ------------------------------------------------------------
+# CLI: python embedding_snapshot.py export | ensure | status
+#   ensure = export only if no snapshot exists yet (entrypoint.sh)
+# ------------------------------------------------------------
+def main(argv=None):
+    from database import SessionLocal
+    from logging_utils import setup_logging, shutdown_logging
+
+    argv = sys.argv[1:] if argv is None else argv
+    setup_logging()
+    try:
+        if argv[:1] == ["ensure"] and current_version():
+            print(current_version())
+        elif argv[:1] in (["export"], ["ensure"]):
+            db = SessionLocal()
+            try:
+                print(export_snapshot(db))
+            finally:
+                db.close()
+        else:
+            version = current_version()
+            if not version:
+                print("No embedding snapshot exported yet")
+                return 1
+            with open(os.path.join(SNAPSHOT_DIR, version, "meta.json"), encoding="utf-8") as f:
+                print(json.dumps({"version": version, **json.load(f)}, indent=2))
+        return 0
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,29 @@ echo "Postgres is up. Creating tables..."
 # Run database initialization
 python -c "from database import Base, engine; import models; Base.metadata.create_all(bind=engine)"
 
+# Apply schema changes to existing tables
+python migrations.py
+
+# Seed the sample academic sources (idempotent: ON CONFLICT on title)
+if [ "${SEED_SAMPLE_SOURCES:-true}" = "true" ]; then
+    python source_importer.py data/sample_academic_sources.json
+fi
+
+# Shared mmapped embedding snapshot (exported once here, not by every worker)
+if [ "${PLAGIARISM_SEARCH_ENGINE:-pgvector}" = "snapshot" ]; then
+    python embedding_snapshot.py ensure
+fi
+
 echo "Database tables created. Starting FastAPI server..."
 
+if [ "${APP_MODE:-development}" = "production" ]; then
+    # N workers: status events must cross processes, metrics are aggregated on disk
+    export STATUS_BACKEND="${STATUS_BACKEND:-postgres}"
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    # exported so database.py splits DB_CONNECTION_BUDGET across the workers
+    export WEB_CONCURRENCY="${WEB_CONCURRENCY:-$(nproc)}"
+    exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "$WEB_CONCURRENCY"
+fi
+
 exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
@@ -0,0 +1,110 @@
+# backend/extract_utils.py
+
+# ------------------------------------------------------------
+# In-process text extraction for uploaded assignments
+# PDF pages are split into page ranges and extracted in a process pool
+# DOCX paragraphs are read in a worker process and streamed in blocks
+# Pages are yielded in order, so chunking + plagiarism detection can
+# start before the whole document has been extracted
+# ------------------------------------------------------------
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "8"))
+DOCX_PARAGRAPHS_PER_BLOCK = 50
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx"}
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Lazily create the shared extraction pool (spawn is safe inside uvicorn threads)."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ------------------------------------------------------------
+# Worker functions (run inside the process pool)
+# ------------------------------------------------------------
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> list:
+    """Extract text of pages [start, end) of a PDF."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _extract_docx_blocks(path: str) -> list:
+    """Extract DOCX paragraphs + table cells, grouped into page-like blocks."""
+    import docx
+    document = docx.Document(path)
+
+    lines = [p.text for p in document.paragraphs if p.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if cells:
+                lines.append(" | ".join(cells))
+
+    return [
+        "\n".join(lines[i:i + DOCX_PARAGRAPHS_PER_BLOCK])
+        for i in range(0, len(lines), DOCX_PARAGRAPHS_PER_BLOCK)
+    ]
+
+
+# ------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------
+def iter_document_pages(path: str):
+    """
+    Yield the text of a PDF/DOCX document page by page (DOCX: paragraph blocks).
+    PDF page ranges are extracted in parallel; results are yielded in page order
+    as soon as each range is ready.
+    """
+    _, ext = os.path.splitext(path)
+    ext = ext.lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type for extraction: {ext}")
+
+    executor = get_executor()
+
+    if ext == ".docx":
+        yield from executor.submit(_extract_docx_blocks, path).result()
+        return
+
+    page_count = executor.submit(_pdf_page_count, path).result()
+    futures = [
+        executor.submit(_extract_pdf_pages, path, start, min(start + EXTRACT_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, EXTRACT_PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_text(path: str) -> str:
+    """Extract the full text of a PDF/DOCX document."""
+    return "\n".join(iter_document_pages(path))
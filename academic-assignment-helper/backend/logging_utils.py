@@ -0,0 +1,155 @@
+# backend/logging_utils.py
+
+# ------------------------------------------------------------
+# Structured, non-blocking logging
+# - records are handed to a QueueHandler; a QueueListener thread does the
+#   actual (blocking) stdout writes, so request and job threads never wait on I/O
+# - LOG_FORMAT=json (default) or text, LOG_LEVEL=INFO
+# - every record carries a correlation id: the request id for HTTP traffic,
+#   "assignment-<id>" inside analysis jobs (see correlation())
+# - per-chunk / per-row debug lines pass extra={"sample": True} and only
+#   1 in LOG_SAMPLE_EVERY of them is emitted
+# ------------------------------------------------------------
+
+import os
+import sys
+import copy
+import json
+import queue
+import logging
+import itertools
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_EVERY = max(1, int(os.getenv("LOG_SAMPLE_EVERY", "100")))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+correlation_id = contextvars.ContextVar("correlation_id", default="-")
+
+# attributes every LogRecord has; anything else came in through extra={...}
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id", "sample"}
+
+_listener = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def correlation(value: str):
+    """Tags every log record emitted in this context (threads inherit it via contextvars)."""
+    token = correlation_id.set(value)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+def correlated(prefix: str):
+    """Decorator: runs fn(<id>, ...) under correlation("<prefix>-<id>") (first positional arg)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(key, *args, **kwargs):
+            with correlation(f"{prefix}-{key}"):
+                return fn(key, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through 1 in `every` records marked extra={"sample": True}."""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False):
+            return True
+        return next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DropWhenFullQueueHandler(QueueHandler):
+    """Never blocks the caller: if the queue is full the record is dropped."""
+
+    def prepare(self, record):
+        # keep message and traceback apart (the stock prepare() merges them)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging():
+    """Configures the root logger once per process (idempotent)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        stream = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(logging.Formatter(
+                "%(asctime)s %(levelname)s [%(name)s] [%(correlation_id)s] %(message)s"
+            ))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = _DropWhenFullQueueHandler(log_queue)
+        # filters run in the calling thread, before the record is queued
+        handler.addFilter(CorrelationFilter())
+        handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(LOG_LEVEL)
+
+        _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records (called on app shutdown)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -1,16 +1,35 @@
 # main.py
 from contextlib import asynccontextmanager # NEW IMPORT
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import logging
+from logging_utils import setup_logging, shutdown_logging, correlation
+
+# before the app modules are imported, so their import-time logs are structured too
+setup_logging()
+logger = logging.getLogger(__name__)
 #from . import auth
 #from .routes_upload import router as upload_router
 #from .routes_analysis import router as analysis_router
 # Absolute imports (works in Docker with WORKDIR=/app)
 import auth
+import database
 from routes_upload import router as upload_router
 from routes_analysis import router as analysis_router
+from routes_assignments import router as assignments_router
+from routes_profiles import router as profiles_router
 
-from startup_loader import load_sample_sources # auto load sample academic sources
+from extract_utils import shutdown_executor
+import password_hashing
+import metrics
+import profiling
+import warmup
+import time
+import uuid
+from outbox import run_dispatcher
+from status_hub import run_status_hub
+from storage_utils import run_upload_sweeper
 import asyncio 
 
 # -------------------------------------------------------------
@@ -23,23 +42,43 @@ async def lifespan(app: FastAPI):
     The code before 'yield' runs on startup.
     """
     # STARTUP LOGIC 
-    print("="*50)
-    print("[APP STARTUP] Initializing FastAPI Lifespan Handler...")
-     
-    print("[APP STARTUP] Starting database sample data loader...")
+    logger.info("Initializing FastAPI Lifespan Handler...")
+
+    # The source corpus is no longer imported here: see source_importer.py
+    # (entrypoint.sh seeds the sample sources when SEED_SAMPLE_SOURCES=true)
+
+    # n8n webhooks are delivered from the outbox in the background
+    outbox_stop = asyncio.Event()
+    outbox_task = asyncio.create_task(run_dispatcher(outbox_stop))
+
+    # analysis stage events for the long-poll / WebSocket status endpoints
+    status_stop = asyncio.Event()
+    status_task = asyncio.create_task(run_status_hub(status_stop))
+
+    # expired resumable upload sessions are removed from disk
+    uploads_stop = asyncio.Event()
+    uploads_task = asyncio.create_task(run_upload_sweeper(uploads_stop))
+
+    # pre-open DB connections / prime the embedding client; /health/ready flips when done
+    warmup_task = asyncio.create_task(warmup.run_warmup())
 
-    try:
-        await asyncio.to_thread(load_sample_sources)
-        print("[APP STARTUP] Database sample data loading finished.")
-    except Exception as e:
-        print(f"[APP STARTUP ERROR] Failed to run load_sample_sources: {e}")
-    
-    print("="*50)
-    
     yield  # Control is handed over to FastAPI to run the app
     
     # SHUTDOWN LOGIC
-    print("[APP SHUTDOWN] Backend server shutting down...")
+    logger.info("Backend server shutting down...")
+    warmup_task.cancel()
+    outbox_stop.set()
+    await outbox_task
+    status_stop.set()
+    await status_task
+    uploads_stop.set()
+    await uploads_task
+    await database.async_engine.dispose()
+    database.engine.dispose()
+    shutdown_executor()
+    password_hashing.shutdown_executor()
+    metrics.mark_process_dead()
+    shutdown_logging()
 
 
 # -------------------------------------------------------------
@@ -63,12 +102,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------------------------------------------------
+# Request metrics (labelled by route template, not raw path) + request id
+# + opt-in profiling (X-Profile: <PROFILING_TOKEN>, see profiling.py)
+# -------------------------------------------------------------
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    try:
+        # log records of this request (and its background tasks) carry the id
+        with correlation(request_id):
+            if profiling.request_wants_profile(request.headers):
+                # profiles the event loop thread: async endpoints fully (plus whatever
+                # else the loop ran meanwhile), sync ones (threadpool) only up to the
+                # hand-off -- use ?profile=true on jobs
+                async with profiling.profiled_request(request.url.path) as profile:
+                    response = await call_next(request)
+                if profile["artifact"]:
+                    response.headers["X-Profile-Artifact"] = profile["artifact"]
+            else:
+                response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        metrics.HTTP_LATENCY.labels(request.method, route_path).observe(time.perf_counter() - start)
+        metrics.HTTP_REQUESTS.labels(request.method, route_path, str(status_code)).inc()
+
+
 # -------------------------------------------------------------
 # Including Routers
 # -------------------------------------------------------------
 app.include_router(auth.router)
 app.include_router(upload_router)
 app.include_router(analysis_router)
+app.include_router(assignments_router)
+app.include_router(profiles_router)
 
 # -------------------------------------------------------------
 # Root Endpoint
@@ -78,4 +151,46 @@ def root():
     """
     Simple health-check endpoint to verify server is running.
     """
-    return {"message": "Backend running —> Academic Assignment Helper"}
\ No newline at end of file
+    return {"message": "Backend running —> Academic Assignment Helper"}
+
+
+@app.get("/health/live")
+def liveness():
+    """
+    Liveness probe: the process is up and serving (no dependencies checked).
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """
+    Readiness probe: 503 until the startup warmup has opened DB connections.
+    """
+    body = warmup.status()
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/health/db")
+def db_health():
+    """
+    Connection pool usage and checkout wait times (sync + async engines).
+    """
+    return database.pool_status()
+
+
+@app.get("/health/hashing")
+def hashing_health():
+    """
+    Password hashing pool: in-flight calls, queue depth, rejections and latency.
+    """
+    return password_hashing.hashing_status()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint (HTTP, pipeline stage, upstream and pool metrics).
+    """
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,105 @@
+# backend/metrics.py
+
+# ------------------------------------------------------------
+# Prometheus metrics
+# - HTTP request counts + latency per route template
+# - per-stage timings of the analysis pipeline (chunking, embedding,
+#   knn_query, llm, db_write, ...) and chunks per document
+# - upstream (Hugging Face, Friendli, n8n) errors and retries
+# Served at GET /metrics (main.py).
+# With several uvicorn workers (APP_MODE=production) every worker writes its
+# samples under PROMETHEUS_MULTIPROC_DIR and /metrics aggregates all of them.
+# ------------------------------------------------------------
+
+import os
+import time
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import CollectorRegistry, multiprocess
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "analysis_stage_duration_seconds",
+    "Time spent per analysis pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+ANALYSES = Counter(
+    "analysis_runs_total", "Finished analysis runs", ["pipeline", "outcome"]
+)
+CHUNKS_PER_DOCUMENT = Histogram(
+    "analysis_chunks_per_document",
+    "Chunks produced per analyzed document",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+)
+CHUNK_FAILURES = Counter(
+    "analysis_chunk_failures_total", "Chunks skipped because embedding or search failed"
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Texts sent per embedding request",
+    ["caller"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total", "Failed calls to external services", ["service"]
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total", "Retried calls to external services", ["service"]
+)
+OUTBOX_DELIVERIES = Counter(
+    "outbox_deliveries_total", "n8n webhook delivery attempts", ["event_type", "outcome"]
+)
+PASSWORD_HASHING_IN_FLIGHT = Gauge(
+    "password_hashing_in_flight", "bcrypt calls running or queued on the hashing pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASHING_SECONDS = Histogram(
+    "password_hashing_duration_seconds", "bcrypt latency including queue wait", ["outcome"]
+)
+PASSWORD_HASHING_REJECTED = Counter(
+    "password_hashing_rejected_total", "bcrypt calls rejected because the queue was full"
+)
+
+
+def stage_timer(stage: str):
+    """Context manager timing one pipeline stage."""
+    return PIPELINE_STAGE_SECONDS.labels(stage).time()
+
+
+def timed_iter(iterable, stage: str):
+    """Yields from `iterable`, recording the time spent producing each item as `stage`."""
+    histogram = PIPELINE_STAGE_SECONDS.labels(stage)
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        histogram.observe(time.perf_counter() - start)
+        yield item
+
+
+def render_latest():
+    """Returns (body, content_type) for the /metrics endpoint."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drops this worker's live gauges from the aggregate (called on shutdown)."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
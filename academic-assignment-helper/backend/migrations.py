@@ -0,0 +1,264 @@
+# backend/migrations.py
+
+# ------------------------------------------------------------
+# Ordered schema migrations for existing deployments
+# Base.metadata.create_all() only creates missing tables; column, index
+# and constraint changes on existing tables are applied from here.
+# Every step is idempotent and recorded in schema_migrations; a step's SQL
+# may be a callable when it depends on configuration.
+#
+# CMD: python migrations.py   (run by entrypoint.sh after create_all)
+# ------------------------------------------------------------
+
+import os
+
+from sqlalchemy import text
+import database
+
+MIGRATION_LOCK_ID = 720_041_001  # pg advisory lock, so parallel workers migrate once
+
+MIGRATIONS = [
+    (
+        "0001_assignment_content_hash",
+        """
+        ALTER TABLE assignments ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        ALTER TABLE assignments ADD COLUMN IF NOT EXISTS stored_filename VARCHAR;
+        CREATE INDEX IF NOT EXISTS ix_assignments_content_hash ON assignments (content_hash);
+        """,
+    ),
+    (
+        "0002_academic_sources_identity_unique",
+        # identity = title + authors + year: distinct papers may share a title
+        # ("Introduction"). Exact duplicates are moved to a quarantine table with
+        # the id they were merged into, not silently deleted.
+        """
+        CREATE TABLE IF NOT EXISTS academic_sources_duplicates (
+            id INTEGER PRIMARY KEY,
+            kept_id INTEGER NOT NULL,
+            title VARCHAR,
+            authors VARCHAR,
+            publication_year INTEGER,
+            abstract TEXT,
+            full_text TEXT,
+            source_type VARCHAR,
+            quarantined_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        WITH ranked AS (
+            SELECT id, min(id) OVER (PARTITION BY title, COALESCE(authors, ''), COALESCE(publication_year, 0)) AS kept_id
+            FROM academic_sources
+        ),
+        moved AS (
+            DELETE FROM academic_sources a
+            USING ranked r
+            WHERE a.id = r.id AND r.id <> r.kept_id
+            RETURNING a.id, r.kept_id, a.title, a.authors, a.publication_year, a.abstract, a.full_text, a.source_type
+        )
+        INSERT INTO academic_sources_duplicates
+            (id, kept_id, title, authors, publication_year, abstract, full_text, source_type)
+        SELECT * FROM moved
+        ON CONFLICT (id) DO NOTHING;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_academic_sources_identity
+            ON academic_sources (title, COALESCE(authors, ''), COALESCE(publication_year, 0));
+        """,
+    ),
+    (
+        "0003_analysis_results_jsonb",
+        """
+        -- JSON values were stored double-encoded (json.dumps into JSON/Text columns)
+        CREATE FUNCTION pg_temp.to_jsonb_lenient(value text) RETURNS jsonb AS $fn$
+        BEGIN
+            IF value IS NULL THEN
+                RETURN NULL;
+            END IF;
+            RETURN value::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN to_jsonb(value);
+        END;
+        $fn$ LANGUAGE plpgsql IMMUTABLE;
+
+        DO $do$
+        DECLARE
+            col text;
+            col_type text;
+        BEGIN
+            FOREACH col IN ARRAY ARRAY['suggested_sources', 'flagged_sections',
+                                       'research_suggestions', 'citation_recommendations'] LOOP
+                SELECT data_type INTO col_type
+                FROM information_schema.columns
+                WHERE table_name = 'analysis_results' AND column_name = col;
+
+                IF col_type = 'json' THEN
+                    EXECUTE format(
+                        'ALTER TABLE analysis_results ALTER COLUMN %1$I TYPE jsonb USING
+                         CASE WHEN json_typeof(%1$I) = ''string'' THEN pg_temp.to_jsonb_lenient(%1$I #>> ''{}'')
+                              WHEN json_typeof(%1$I) = ''null'' THEN NULL
+                              ELSE %1$I::jsonb END', col);
+                ELSIF col_type = 'text' THEN
+                    EXECUTE format(
+                        'ALTER TABLE analysis_results ALTER COLUMN %1$I TYPE jsonb USING pg_temp.to_jsonb_lenient(%1$I)', col);
+                END IF;
+            END LOOP;
+        END
+        $do$;
+
+        CREATE INDEX IF NOT EXISTS ix_analysis_results_flagged_sections
+            ON analysis_results USING gin (flagged_sections jsonb_path_ops);
+        """,
+    ),
+    (
+        "0004_assignment_text_table",
+        """
+        -- full text moves out of the hot assignments row (see text_store.py)
+        CREATE TABLE IF NOT EXISTS assignment_texts (
+            assignment_id INTEGER PRIMARY KEY REFERENCES assignments (id) ON DELETE CASCADE,
+            codec VARCHAR(16) NOT NULL,
+            data BYTEA NOT NULL,
+            raw_size INTEGER
+        );
+        -- already compressed by the app: skip TOAST compression, keep out-of-line storage
+        ALTER TABLE assignment_texts ALTER COLUMN data SET STORAGE EXTERNAL;
+
+        DO $do$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'assignments' AND column_name = 'original_text') THEN
+                -- existing text is copied uncompressed; it is recompressed when next rewritten
+                INSERT INTO assignment_texts (assignment_id, codec, data, raw_size)
+                SELECT id, 'raw', convert_to(original_text, 'UTF8'), octet_length(original_text)
+                FROM assignments
+                WHERE original_text IS NOT NULL
+                ON CONFLICT (assignment_id) DO NOTHING;
+
+                ALTER TABLE assignments DROP COLUMN original_text;
+            END IF;
+        END
+        $do$;
+        """,
+    ),
+    (
+        "0005_result_upsert_indexes",
+        """
+        -- keep the latest result per assignment before enforcing uniqueness
+        DELETE FROM analysis_results a
+        USING analysis_results b
+        WHERE a.assignment_id = b.assignment_id
+          AND (COALESCE(a.analyzed_at, '-infinity'), a.id) < (COALESCE(b.analyzed_at, '-infinity'), b.id);
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_analysis_results_assignment_id
+            ON analysis_results (assignment_id);
+        CREATE INDEX IF NOT EXISTS ix_assignments_student_id ON assignments (student_id);
+        """,
+    ),
+    (
+        "0006_assignments_keyset_index",
+        """
+        CREATE INDEX IF NOT EXISTS ix_assignments_student_uploaded
+            ON assignments (student_id, uploaded_at DESC, id DESC);
+        """,
+    ),
+    (
+        "0007_embedding_models",
+        lambda: _embedding_models_sql(os.getenv("HUGGINGFACE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")),
+    ),
+    (
+        "0008_source_passages",
+        """
+        -- passage-level vectors over full_text (see source_passages.py); only spans are
+        -- stored, the ANN index is created per model by source_passages.create_passage_index
+        CREATE TABLE IF NOT EXISTS source_passages (
+            model_id INTEGER NOT NULL REFERENCES embedding_models (id) ON DELETE CASCADE,
+            source_id INTEGER NOT NULL REFERENCES academic_sources (id) ON DELETE CASCADE,
+            passage_no INTEGER NOT NULL,  -- 0 = title + abstract
+            start_char INTEGER,
+            end_char INTEGER,
+            embedding vector NOT NULL,
+            PRIMARY KEY (model_id, source_id, passage_no)
+        );
+        CREATE INDEX IF NOT EXISTS ix_source_passages_source_id ON source_passages (source_id);
+        """,
+    ),
+]
+
+
+def _embedding_models_sql(legacy_model: str) -> str:
+    # vectors move to one row per (model, source) so a second model can be backfilled
+    # next to the live one (see embedding_models.py); academic_sources.embedding is
+    # kept for rollback but no longer read or written
+    legacy_model = legacy_model.replace("'", "''")
+    return f"""
+        CREATE TABLE IF NOT EXISTS embedding_models (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR NOT NULL UNIQUE,
+            dim INTEGER NOT NULL,
+            status VARCHAR(16) NOT NULL DEFAULT 'backfilling',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            activated_at TIMESTAMPTZ
+        );
+        -- at most one model serves searches
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_embedding_models_active
+            ON embedding_models (status) WHERE status = 'active';
+
+        CREATE TABLE IF NOT EXISTS source_embeddings (
+            model_id INTEGER NOT NULL REFERENCES embedding_models (id) ON DELETE CASCADE,
+            source_id INTEGER NOT NULL REFERENCES academic_sources (id) ON DELETE CASCADE,
+            embedding vector NOT NULL,  -- any dimension; indexed per model as embedding::vector(dim)
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (model_id, source_id)
+        );
+        CREATE INDEX IF NOT EXISTS ix_source_embeddings_source_id ON source_embeddings (source_id);
+
+        DO $do$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'academic_sources' AND column_name = 'embedding') THEN
+                -- the existing vectors become the active model
+                INSERT INTO embedding_models (name, dim, status, activated_at)
+                SELECT '{legacy_model}', max(vector_dims(embedding)), 'active', now()
+                FROM academic_sources
+                WHERE embedding IS NOT NULL
+                HAVING count(*) > 0
+                ON CONFLICT (name) DO NOTHING;
+
+                INSERT INTO source_embeddings (model_id, source_id, embedding)
+                SELECT m.id, s.id, s.embedding
+                FROM academic_sources s
+                JOIN embedding_models m ON m.name = '{legacy_model}'
+                WHERE s.embedding IS NOT NULL
+                ON CONFLICT (model_id, source_id) DO NOTHING;
+            END IF;
+        END
+        $do$;
+        """
+
+
+def run_migrations(engine=None):
+    engine = engine or database.engine
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+
+    for version, sql in MIGRATIONS:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            applied = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if applied:
+                continue
+
+            # DDL / backfills may legitimately run longer than DB_STATEMENT_TIMEOUT_MS
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.exec_driver_sql(sql() if callable(sql) else sql)
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+            print(f"[MIGRATIONS] Applied {version}")
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print("[MIGRATIONS] Schema is up to date.")
@@ -1,8 +1,10 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, JSON, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, JSON, TIMESTAMP, Index, LargeBinary, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 #from .database import Base
 import database  # absolute import
+from text_store import compress_text, decompress_text
 
 class Student(database.Base):
     __tablename__ = "students"
@@ -21,9 +23,10 @@ class Assignment(database.Base):
     __tablename__ = "assignments"
 
     id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"))
+    student_id = Column(Integer, ForeignKey("students.id"), index=True)
     filename = Column(String)
-    original_text = Column(Text)
+    stored_filename = Column(String)  # content-addressed name under data/uploads
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded file
     topic = Column(String)
     academic_level = Column(String)
     word_count = Column(Integer)
@@ -32,22 +35,68 @@ class Assignment(database.Base):
     student = relationship("Student", back_populates="assignments")
     analysis_result = relationship("AnalysisResult", back_populates="assignment", uselist=False)
 
+    __table_args__ = (
+        # keyset pagination of a student's assignments, newest first (routes_assignments.py)
+        Index("ix_assignments_student_uploaded", "student_id", uploaded_at.desc(), id.desc()),
+    )
+
+    # Full extracted text is kept out of the hot row and only loaded on access
+    text_blob = relationship("AssignmentText", uselist=False, lazy="select", cascade="all, delete-orphan")
+
+    @property
+    def original_text(self):
+        if self.text_blob is None:
+            return None
+        return decompress_text(self.text_blob.codec, self.text_blob.data)
+
+    @original_text.setter
+    def original_text(self, value):
+        if value is None:
+            self.text_blob = None
+            return
+        codec, data, raw_size = compress_text(value)
+        if self.text_blob is None:
+            self.text_blob = AssignmentText(codec=codec, data=data, raw_size=raw_size)
+        else:
+            self.text_blob.codec, self.text_blob.data, self.text_blob.raw_size = codec, data, raw_size
+
+
+class AssignmentText(database.Base):
+    __tablename__ = "assignment_texts"
+
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String(16), nullable=False)  # zstd | zlib | raw (see text_store.py)
+    data = Column(LargeBinary, nullable=False)
+    raw_size = Column(Integer)  # uncompressed UTF-8 bytes
+
 
 class AnalysisResult(database.Base):
     __tablename__ = "analysis_results"
 
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"))
-    suggested_sources = Column(JSON)
+    suggested_sources = Column(JSONB(none_as_null=True))  # list of source titles
     plagiarism_score = Column(Float)
-    flagged_sections = Column(JSON)
-    research_suggestions = Column(Text)
-    citation_recommendations = Column(Text)
+    flagged_sections = Column(JSONB(none_as_null=True))  # list of {chunk_id, similarity, source_id, ...}
+    research_suggestions = Column(JSONB(none_as_null=True))  # AI key insights
+    citation_recommendations = Column(JSONB(none_as_null=True))  # AI citations to add
     confidence_score = Column(Float)
     analyzed_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     assignment = relationship("Assignment", back_populates="analysis_result")
 
+    __table_args__ = (
+        # one result per assignment; conflict target of the result upsert
+        Index("ux_analysis_results_assignment_id", "assignment_id", unique=True),
+        # containment queries inside flagged sections, e.g. @> '[{"source_id": 12}]'
+        Index(
+            "ix_analysis_results_flagged_sections",
+            "flagged_sections",
+            postgresql_using="gin",
+            postgresql_ops={"flagged_sections": "jsonb_path_ops"},
+        ),
+    )
+
 
 class AcademicSource(database.Base):
     __tablename__ = "academic_sources"
@@ -59,4 +108,32 @@ class AcademicSource(database.Base):
     abstract = Column(Text)
     full_text = Column(Text)
     source_type = Column(String)  # e.g., 'paper', 'textbook', 'course_material'
-    embedding = Column(Text)  # turned to vector by installing pgvector on docker from compose file
+    embedding = Column(Text)  # legacy vector(384) column, kept for rollback; vectors live in source_embeddings (embedding_models.py)
+
+    __table_args__ = (
+        # Import dedup key (source_importer: INSERT ... ON CONFLICT (<identity>) DO NOTHING);
+        # title alone is not an identity, distinct papers share titles
+        Index(
+            "ux_academic_sources_identity",
+            title, func.coalesce(authors, ""), func.coalesce(publication_year, 0),
+            unique=True,
+        ),
+    )
+
+
+class OutboxEvent(database.Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)  # e.g. 'assignment_uploaded', 'analysis_done'
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | delivered | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    delivered_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        Index("ix_outbox_events_due", "status", "next_attempt_at"),
+    )
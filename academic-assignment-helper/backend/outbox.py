@@ -0,0 +1,166 @@
+# backend/outbox.py
+
+# ------------------------------------------------------------
+# Transactional outbox for n8n webhooks
+# State changes (new upload, finished analysis) write an OutboxEvent in the
+# same DB transaction; the dispatcher below delivers them asynchronously:
+#   - claims pending events in batches (FOR UPDATE SKIP LOCKED, safe with N workers)
+#   - delivers with bounded concurrency
+#   - retries with exponential backoff, gives up after OUTBOX_MAX_ATTEMPTS
+# Claimed events get a lease (next_attempt_at in the future), so a crashed
+# dispatcher never loses an event; delivery is at-least-once.
+# ------------------------------------------------------------
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import requests
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+import models
+from database import SessionLocal
+from metrics import OUTBOX_DELIVERIES, UPSTREAM_ERRORS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EVENT_ASSIGNMENT_UPLOADED = "assignment_uploaded"  # -> n8n Flow 1 (text extraction)
+EVENT_ANALYSIS_DONE = "analysis_done"              # -> n8n Flow 2 (notify-analysis-done)
+
+EVENT_URLS = {
+    EVENT_ASSIGNMENT_UPLOADED: os.getenv("N8N_WEBHOOK_URL"),
+    EVENT_ANALYSIS_DONE: os.getenv("N8N_NOTIFY_URL"),
+}
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "900"))
+OUTBOX_DELIVERY_TIMEOUT = float(os.getenv("OUTBOX_DELIVERY_TIMEOUT", "10"))
+
+
+# ------------------------------------------------------------
+# Producer side (called inside the caller's transaction)
+# ------------------------------------------------------------
+def enqueue_event(db: Session, event_type: str, payload: dict) -> models.OutboxEvent:
+    """Adds an event to the outbox. The caller's commit makes it visible."""
+    event = models.OutboxEvent(event_type=event_type, payload=payload)
+    db.add(event)
+    return event
+
+
+# ------------------------------------------------------------
+# Dispatcher side
+# ------------------------------------------------------------
+def claim_batch(limit: int = OUTBOX_BATCH_SIZE) -> list:
+    """Leases up to `limit` due events and returns them as plain dicts."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            UPDATE outbox_events
+            SET attempts = attempts + 1,
+                next_attempt_at = now() + make_interval(secs => :lease)
+            WHERE id IN (
+                SELECT id FROM outbox_events
+                WHERE status = 'pending' AND next_attempt_at <= now()
+                ORDER BY id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, event_type, payload, attempts
+        """), {"lease": OUTBOX_LEASE_SECONDS, "limit": limit}).mappings().all()
+        db.commit()
+        return [dict(r) for r in rows]
+    finally:
+        db.close()
+
+
+def deliver(event: dict):
+    """POSTs one event to its n8n webhook. Returns None on success, else the error text."""
+    url = EVENT_URLS.get(event["event_type"])
+    if not url:
+        return f"No webhook URL configured for {event['event_type']}"
+    try:
+        res = requests.post(url, json=event["payload"], timeout=OUTBOX_DELIVERY_TIMEOUT)
+        res.raise_for_status()
+        return None
+    except Exception as e:
+        return str(e)[:1000]
+
+
+def record_results(results: list):
+    """Stores the outcome of one delivered batch in a single transaction."""
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        for event, error in results:
+            row = db.get(models.OutboxEvent, event["id"])
+            if row is None:
+                continue
+            if error is None:
+                row.status = "delivered"
+                row.delivered_at = now
+                row.last_error = None
+            elif event["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                row.status = "failed"
+                row.last_error = error
+                logger.error("Giving up on event %s (%s): %s", event["id"], event["event_type"], error)
+            else:
+                backoff = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** event["attempts"])
+                row.next_attempt_at = now + timedelta(seconds=backoff)
+                row.last_error = error
+        db.commit()
+    finally:
+        db.close()
+
+
+async def dispatch_once() -> int:
+    """Claims one batch, delivers it concurrently and records the results."""
+    events = await asyncio.to_thread(claim_batch)
+    if not events:
+        return 0
+
+    semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+    async def _deliver(event):
+        async with semaphore:
+            return event, await asyncio.to_thread(deliver, event)
+
+    results = await asyncio.gather(*(_deliver(e) for e in events))
+    await asyncio.to_thread(record_results, results)
+
+    for event, error in results:
+        OUTBOX_DELIVERIES.labels(event["event_type"], "delivered" if error is None else "failed").inc()
+        if error is not None:
+            UPSTREAM_ERRORS.labels("n8n").inc()
+
+    delivered = sum(1 for _, error in results if error is None)
+    logger.info("Delivered %d/%d events", delivered, len(events))
+    return len(events)
+
+
+async def run_dispatcher(stop: asyncio.Event):
+    """Background loop started from main.lifespan."""
+    logger.info("Dispatcher started")
+    while not stop.is_set():
+        try:
+            claimed = await dispatch_once()
+        except Exception as e:
+            logger.exception("Dispatcher error: %s", e)
+            claimed = 0
+
+        # A full batch means there is probably more waiting
+        if claimed >= OUTBOX_BATCH_SIZE:
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("Dispatcher stopped")
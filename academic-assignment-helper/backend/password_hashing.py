@@ -0,0 +1,138 @@
+# backend/password_hashing.py
+
+# ------------------------------------------------------------
+# Dedicated executor for bcrypt
+# Hashing is CPU-bound; running it in Starlette's shared threadpool lets a
+# login burst starve uploads and polls. Here it gets its own bounded pool
+# (threads by default, or processes with HASH_EXECUTOR=process) and an
+# admission limit: once HASH_WORKERS + HASH_QUEUE_LIMIT calls are in flight,
+# new ones are rejected straight away (auth turns that into a 429).
+# ------------------------------------------------------------
+
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from metrics import PASSWORD_HASHING_IN_FLIGHT, PASSWORD_HASHING_SECONDS, PASSWORD_HASHING_REJECTED
+
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread").lower()  # thread | process
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "2"))
+LATENCY_WINDOW = 512  # recent samples kept for percentiles
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    if isinstance(password, bytes):
+        password = password.decode("utf-8", errors="ignore")
+    return pwd_context.hash(password[:72])
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    if isinstance(plain, bytes):
+        plain = plain.decode("utf-8", errors="ignore")
+    return pwd_context.verify(plain[:72], hashed)
+
+
+class HashingOverloadedError(Exception):
+    """Raised when the hashing queue is full."""
+
+
+# ------------------------------------------------------------
+# Executor + admission control
+# ------------------------------------------------------------
+_executor = None
+_lock = threading.Lock()
+_in_flight = 0
+_stats = {"completed": 0, "rejected": 0, "failed": 0, "latency_seconds_max": 0.0}
+_latencies = deque(maxlen=LATENCY_WINDOW)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_hashing(fn, *args):
+    """Runs hash_password / verify_password on the hashing pool, or raises HashingOverloadedError."""
+    global _in_flight
+    with _lock:
+        if _in_flight >= HASH_WORKERS + HASH_QUEUE_LIMIT:
+            _stats["rejected"] += 1
+            PASSWORD_HASHING_REJECTED.inc()
+            raise HashingOverloadedError()
+        _in_flight += 1
+    PASSWORD_HASHING_IN_FLIGHT.inc()
+
+    start = time.perf_counter()
+    outcome = "failed"
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+        outcome = "completed"
+        return result
+    finally:
+        elapsed = time.perf_counter() - start  # queue wait + hashing time
+        with _lock:
+            _in_flight -= 1
+            _stats[outcome] += 1
+            _stats["latency_seconds_max"] = max(_stats["latency_seconds_max"], elapsed)
+            _latencies.append(elapsed)
+        PASSWORD_HASHING_IN_FLIGHT.dec()
+        PASSWORD_HASHING_SECONDS.labels(outcome).observe(elapsed)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_hashing(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await run_hashing(verify_password, plain, hashed)
+
+
+def hashing_status() -> dict:
+    """Queue depth + latency of the hashing pool (served at /health/hashing)."""
+    with _lock:
+        samples = sorted(_latencies)
+        in_flight = _in_flight
+        stats = dict(_stats)
+
+    def _percentile(p):
+        if not samples:
+            return 0.0
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))], 6)
+
+    return {
+        "executor": HASH_EXECUTOR,
+        "workers": HASH_WORKERS,
+        "queue_limit": HASH_QUEUE_LIMIT,
+        "in_flight": in_flight,
+        "queue_depth": max(0, in_flight - HASH_WORKERS),
+        **stats,
+        "latency_seconds_max": round(stats["latency_seconds_max"], 6),
+        "latency_seconds_p50": _percentile(0.50),
+        "latency_seconds_p95": _percentile(0.95),
+        "latency_seconds_p99": _percentile(0.99),
+    }
@@ -9,27 +9,25 @@
 # Computes an overall plagiarism score
 # ------------------------------------------------------------
 
-import os
 import re
-import time
+import logging
+from functools import partial
 import numpy as np
-from sqlalchemy import text
 from sqlalchemy.orm import Session
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-# ------------------------------------------------------------
-# Loading . . .
-# ------------------------------------------------------------
-
-
-HF_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
-EMBED_MODEL = os.getenv("HUGGINGFACE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-
-client = InferenceClient(api_key=HF_API_KEY)
+import vector_utils
+import embedding_client
+import embedding_models
+import embedding_snapshot
+import source_passages
+from metrics import (
+    stage_timer,
+    timed_iter,
+    CHUNKS_PER_DOCUMENT,
+    CHUNK_FAILURES,
+    EMBEDDING_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
 
 
 # ------------------------------------------------------------
@@ -40,22 +38,30 @@ def chunk_text(text: str, max_tokens: int = 250):
     Split text into ~250-token chunks based on sentence boundaries.
     Keeps coherence by splitting on sentence endings.
     """
-    sentences = re.split(r'(?<=[.!?]) +', text)
-    chunks, current_chunk = [], []
+    return list(iter_chunks([text], max_tokens))
+
+
+def iter_chunks(pages, max_tokens: int = 250):
+    """
+    Streaming version of chunk_text over an iterable of page texts.
+    Chunks are yielded as soon as they are complete, so detection can run
+    while later pages are still being extracted.
+    """
+    current_chunk = []
     token_count = 0
 
-    for sentence in sentences:
-        tokens = sentence.split()
-        if token_count + len(tokens) > max_tokens and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            current_chunk, token_count = [], 0
-        current_chunk.extend(tokens)
-        token_count += len(tokens)
+    for page in pages:
+        sentences = re.split(r'(?<=[.!?]) +', page)
+        for sentence in sentences:
+            tokens = sentence.split()
+            if token_count + len(tokens) > max_tokens and current_chunk:
+                yield " ".join(current_chunk)
+                current_chunk, token_count = [], 0
+            current_chunk.extend(tokens)
+            token_count += len(tokens)
 
     if current_chunk:
-        chunks.append(" ".join(current_chunk))
-
-    return chunks
+        yield " ".join(current_chunk)
 
  
 # ------------------------------------------------------------
@@ -63,67 +69,111 @@ def chunk_text(text: str, max_tokens: int = 250):
 # ------------------------------------------------------------
 
 
-def get_embedding(text: str, retries=3):
+def get_embedding(text: str, retries=3, model: str = None):
     """
     Generate embedding for a given text chunk using Hugging Face Inference API.
-    Returns a 384-dimensional vector as a Python list.
+    Returns a Python list (384 floats for all-MiniLM-L6-v2); `model` defaults to
+    HUGGINGFACE_EMBEDDING_MODEL, detect_plagiarism passes the active model.
     """
-    for attempt in range(retries):
-        try:
-            result = client.feature_extraction(text[:1000], model=EMBED_MODEL)
+    EMBEDDING_BATCH_SIZE.labels("plagiarism").observe(1)
+    return embedding_client.embed_text(text, retries, stage="embedding", model=model)
 
-            if isinstance(result, list) and isinstance(result[0], list):
-                return result[0]
-            elif isinstance(result, np.ndarray):
-                return result.tolist()
-            return result
+# ------------------------------------------------------------
+# Top-k search against the active model's source embeddings (pgvector)
+# ------------------------------------------------------------
+def pgvector_searcher(db: Session, model=None):
+    """
+    Returns search(embedding, top_k) -> rows with .id, .title, .similarity.
+    Other engines (vector_index.InMemoryIndex.search) follow the same signature.
+    `model` (embedding_models.EmbeddingModel) defaults to the active one.
+    """
+    model = model or embedding_models.active_model(db)
+    if model is None:
+        # nothing embedded yet
+        return lambda embedding, top_k: []
+
+    # ivfflat.probes / hnsw.ef_search hold for the rest of this transaction
+    vector_utils.apply_search_settings(db)
+    knn_sql = embedding_models.knn_sql(model)
+
+    def search(embedding, top_k: int):
+        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+        return db.execute(knn_sql, {"embedding": embedding_str, "top_k": top_k}).fetchall()
+    return search
 
-        except Exception as e:
-            print(f"[PLAGIARISM_UTILS] Retry {attempt+1}/{retries} due to {e}")
-            time.sleep(2)
 
-    raise RuntimeError("Failed to embed chunk after retries")
+def default_searcher(db: Session, model=None):
+    """
+    PLAGIARISM_SEARCH_ENGINE=snapshot searches the shared mmapped snapshot
+    (exact cosine, no DB round trip per chunk); falls back to pgvector until
+    a snapshot of `model` (default: the active one) has been exported.
+    PLAGIARISM_SEARCH_SCOPE=passages searches full_text passages instead.
+    """
+    model = model or embedding_models.active_model(db)
+    if source_passages.PASSAGES_ENABLED:
+        return source_passages.passage_searcher(db, model)
+    if embedding_snapshot.SNAPSHOT_ENABLED and model is not None:
+        index = embedding_snapshot.current_index(model=model.name)
+        if index is not None and len(index):
+            return index.search
+    return pgvector_searcher(db, model)
+
 
 # ------------------------------------------------------------
 # The next flow is  Detecting Plagiarism
 # ------------------------------------------------------------
 
-def detect_plagiarism(db: Session, assignment_text: str, top_k: int = 3, similarity_threshold: float = 0.6):
+def detect_plagiarism(db: Session, assignment_text, top_k: int = 3, similarity_threshold: float = 0.6,
+                      progress=None, embedder=None, searcher=None):
     """
     Compare assignment chunks against academic_sources using cosine similarity.
     Flags chunks that have ≥ similarity_threshold with any stored source.
+    `assignment_text` is either the full text or an iterable of page texts
+    (e.g. extract_utils.iter_document_pages) that is chunked as it streams in.
+    `progress(chunks_done, chunks_total)` is called after every chunk;
+    chunks_total is None while the text is still streaming in.
+    `embedder(text)` and `searcher(embedding, top_k)` default to the Hugging Face
+    API and default_searcher(db); benchmarks pass in-process ones (db may then be None).
+    The active embedding model is resolved once, so a cutover mid-run cannot mix
+    query vectors of one model with source vectors of another.
     """
-    chunks = chunk_text(assignment_text)
-    flagged_sections = []
+    model = embedding_models.active_model(db) if embedder is None or searcher is None else None
+    embedder = embedder or partial(get_embedding, model=model.name if model else None)
+    searcher = searcher or default_searcher(db, model)
+
+    if isinstance(assignment_text, str):
+        with stage_timer("chunking"):
+            chunks = chunk_text(assignment_text)
+        expected_chunks = len(chunks)
+        logger.debug("Processing %d chunks", len(chunks))
+    else:
+        # streamed: chunking time includes waiting on page extraction
+        chunks = timed_iter(iter_chunks(assignment_text), "chunking")
+        expected_chunks = None
+        logger.debug("Processing streamed chunks")
 
-    print(f"[PLAGIARISM_UTILS] Processing {len(chunks)} chunks...")
+    flagged_sections = []
+    total_chunks = 0
+    failed_chunks = 0
 
     for i, chunk in enumerate(chunks):
+        total_chunks += 1
         try:
-            embedding = get_embedding(chunk)
-            embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-
-            # SQL for vector similarity using pgvector
-            sql = text("""
-                SELECT 
-                    id, 
-                    title, 
-                    abstract, 
-                    1 - (embedding <=> CAST(:embedding1 AS vector)) AS similarity
-                FROM academic_sources
-                ORDER BY embedding <=> CAST(:embedding2 AS vector)
-                LIMIT :top_k;
-            """)
-
-            rows = db.execute(
-                sql,
-                {"embedding1": embedding_str, "embedding2": embedding_str, "top_k": top_k}
-            ).fetchall()
-
-            # Inspect top-k matches for this chunk
-            print(f"\n[CHUNK {i+1}] Preview: {chunk[:100]}...")
-            for r in rows:
-                print(f"   # {r.title} → similarity {round(r.similarity, 3)}")
+            embedding = embedder(chunk)
+
+            with stage_timer("knn_query"):
+                rows = searcher(embedding, top_k)
+
+            # Inspect top-k matches for this chunk (sampled: 1 in LOG_SAMPLE_EVERY)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Chunk %d matches", i + 1,
+                    extra={
+                        "sample": True,
+                        "chunk_preview": chunk[:100],
+                        "matches": [(r.title, round(r.similarity, 3)) for r in rows],
+                    },
+                )
 
             # Flagging logic
             for r in rows:
@@ -135,15 +185,31 @@ def detect_plagiarism(db: Session, assignment_text: str, top_k: int = 3, similar
                         "source_title": r.title,
                         "excerpt": chunk[:200] + "..."
                     })
+                    if getattr(r, "passage_no", None) is not None:
+                        # passage search: where in the source the match is
+                        flagged_sections[-1]["source_passage"] = r.passage_no
+                        flagged_sections[-1]["source_excerpt"] = r.excerpt
 
         except Exception as e:
-            print(f"[PLAGIARISM_UTILS] Failed at chunk {i+1}: {e}")
+            CHUNK_FAILURES.inc()
+            failed_chunks += 1
+            if failed_chunks == 1:
+                logger.warning("Chunk %d failed: %s", i + 1, e)
+            else:
+                logger.debug("Chunk %d failed: %s", i + 1, e, extra={"sample": True})
+
+        if progress is not None:
+            progress(total_chunks, expected_chunks)
 
+    CHUNKS_PER_DOCUMENT.observe(total_chunks)
     plagiarism_score = compute_plagiarism_score(flagged_sections)
 
-    print(f"\n --- PLAGIARISM DETECTION SUMMARY ---")
-    print(f"Chunks flagged: {len(flagged_sections)} / {len(chunks)}")
-    print(f"Overall Score: {plagiarism_score}%")
+    logger.info(
+        "Plagiarism detection finished: %d flagged / %d chunks, score %s%%",
+        len(flagged_sections), total_chunks, plagiarism_score,
+        extra={"chunks": total_chunks, "flagged": len(flagged_sections),
+               "failed_chunks": failed_chunks, "plagiarism_score": plagiarism_score},
+    )
 
     return {
         "plagiarism_score": plagiarism_score,
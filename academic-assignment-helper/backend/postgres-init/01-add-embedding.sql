@@ -1,5 +1,7 @@
 -- postgres-init/01-add-embedding.sql
 ALTER TABLE academic_sources
 ADD COLUMN IF NOT EXISTS embedding vector(384);
--- The dimension (768) should match the dimension of the embeddings, 
---768 works with common Hugging Face embedding models like sentence-transformers/all-MiniLM-L6-v2 
\ No newline at end of file
+-- The dimension (384) must match the embedding model: 384 for
+-- sentence-transformers/all-MiniLM-L6-v2 (768 would be e.g. all-mpnet-base-v2).
+-- Legacy column: since migration 0007 vectors live in source_embeddings, one
+-- row per (model, source) with any dimension (see embedding_models.py).
@@ -0,0 +1,180 @@
+# backend/profiling.py
+
+# ------------------------------------------------------------
+# Opt-in cProfile hooks
+# - per request: send "X-Profile: <PROFILING_TOKEN>"; the response carries
+#   X-Profile-Artifact with the name of the stored profile
+# - per job: run_ai_analysis_rag / run_local_extraction_rag accept profile=True
+#   (POST /analysis/run/{id}?profile=true, or "profile": true in the n8n ack)
+# Artifacts are saved under data/profiles as <name>.prof (pstats, open with
+# snakeviz / pstats) plus a <name>.txt summary, downloadable via /profiles.
+# Disabled unless PROFILING_TOKEN is set; when disabled the only cost is a
+# header lookup per request and a boolean check per job.
+# ------------------------------------------------------------
+
+import os
+import io
+import re
+import hmac
+import time
+import uuid
+import pstats
+import asyncio
+import cProfile
+import logging
+import functools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_ENABLED = bool(PROFILING_TOKEN)
+PROFILE_HEADER = "x-profile"
+PROFILE_DIR = "data/profiles"
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "200"))
+REQUEST_PROFILE_NOTE = (
+    "note: profiled on the event loop thread, so this also contains the coroutines of\n"
+    "every other request that ran during the window (sync endpoints only up to the\n"
+    "threadpool hand-off)"
+)
+
+ARTIFACT_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+logger = logging.getLogger(__name__)
+
+# cProfile hooks are per interpreter; one profile at a time keeps them consistent
+_profile_lock = threading.Lock()
+
+
+def is_authorized(token) -> bool:
+    return PROFILING_ENABLED and bool(token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def request_wants_profile(headers) -> bool:
+    if not PROFILING_ENABLED:
+        return False
+    return is_authorized(headers.get(PROFILE_HEADER))
+
+
+@contextmanager
+def profiled(kind: str, key):
+    """
+    Profiles the enclosed block and stores the artifact; yields a dict whose
+    "artifact" entry holds the artifact name afterwards (None if another
+    profile was already running).
+    """
+    outcome = {"artifact": None}
+    if not _profile_lock.acquire(blocking=False):
+        logger.warning("Profiler busy; not profiling %s %s", kind, key)
+        yield outcome
+        return
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield outcome
+        finally:
+            profiler.disable()
+        outcome["artifact"] = save_profile(profiler, kind, key, time.perf_counter() - started)
+    finally:
+        _profile_lock.release()
+
+
+@asynccontextmanager
+async def profiled_request(key):
+    """
+    Async variant of profiled() for the request middleware: the artifact is
+    written from a worker thread, so dump_stats / pstats / pruning never block
+    the event loop. The artifact header notes that concurrent requests are included.
+    """
+    outcome = {"artifact": None}
+    if not _profile_lock.acquire(blocking=False):
+        logger.warning("Profiler busy; not profiling request %s", key)
+        yield outcome
+        return
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield outcome
+        finally:
+            profiler.disable()
+        outcome["artifact"] = await asyncio.to_thread(
+            save_profile, profiler, "request", key, time.perf_counter() - started, REQUEST_PROFILE_NOTE
+        )
+    finally:
+        _profile_lock.release()
+
+
+def profile_job(kind: str):
+    """Decorator: adds a profile=False keyword that profiles fn(<key>, ...) when set."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(key, *args, profile: bool = False, **kwargs):
+            if not profile:
+                return fn(key, *args, **kwargs)
+            with profiled(kind, key):
+                return fn(key, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------------------------------------------------
+# Artifacts
+# ------------------------------------------------------------
+def save_profile(profiler: cProfile.Profile, kind: str, key, elapsed: float, note: str = None) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_key = re.sub(r"[^A-Za-z0-9_-]+", "_", str(key)).strip("_") or "root"
+    name = f"{kind}-{safe_key}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+
+    summary = io.StringIO()
+    summary.write(f"{kind} {key}: {elapsed:.3f}s wall\n")
+    if note:
+        summary.write(f"{note}\n")
+    summary.write("\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    with open(os.path.join(PROFILE_DIR, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+
+    prune_profiles()
+    logger.info("Stored profile %s (%.3fs)", name, elapsed)
+    return name
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for filename in os.listdir(PROFILE_DIR):
+        if filename.endswith(".prof"):
+            path = os.path.join(PROFILE_DIR, filename)
+            entries.append({
+                "name": filename[: -len(".prof")],
+                "size": os.path.getsize(path),
+                "created_at": os.path.getmtime(path),
+            })
+    return sorted(entries, key=lambda e: e["created_at"], reverse=True)
+
+
+def profile_path(name: str, fmt: str = "prof"):
+    """Path of a stored artifact, or None if the name is invalid or unknown."""
+    if fmt not in ("prof", "txt") or not ARTIFACT_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{name}.{fmt}")
+    return path if os.path.exists(path) else None
+
+
+def prune_profiles():
+    """Keeps the newest PROFILE_MAX_ARTIFACTS profiles."""
+    for entry in list_profiles()[PROFILE_MAX_ARTIFACTS:]:
+        for fmt in ("prof", "txt"):
+            path = os.path.join(PROFILE_DIR, f"{entry['name']}.{fmt}")
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,20 +1,36 @@
 # backend/routes_analysis.py
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, BackgroundTasks, Query, UploadFile, File
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-import re, json, time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import re, time, logging
 import database, models
-from auth import get_current_user
+from auth import get_current_user, authenticate_token, require_corpus_admin, Principal
 from ai_utils import analyze_assignment_text  # Friendli.ai or Hugging Face integration
 from database import SessionLocal, get_db
 from vector_utils import embed_academic_sources
 import vector_utils
 from plagiarism_utils import detect_plagiarism
+from extract_utils import iter_document_pages
+import source_importer
+import codecs
 
-import requests, os
-N8N_NOTIFY_URL = os.getenv("N8N_NOTIFY_URL")
+import os
+from outbox import enqueue_event, EVENT_ANALYSIS_DONE
+from cache_utils import analysis_cache, invalidate_analysis, ANALYSIS_CACHE_TTL, ANALYSIS_PENDING_CACHE_TTL
+import status_hub
+from metrics import stage_timer, ANALYSES, PIPELINE_STAGE_SECONDS
+from logging_utils import correlated
+import profiling
 
-router = APIRouter(prefix="/analysis", tags=["Analysis Results"])
+logger = logging.getLogger(__name__)
+from status_hub import STAGE_EXTRACTING, STAGE_ANALYZING, STAGE_DONE, STAGE_FAILED, FINAL_STAGES
+
+# orjson: results are stored as native JSONB and serialized once, without json.loads/dumps round trips
+router = APIRouter(prefix="/analysis", tags=["Analysis Results"], default_response_class=ORJSONResponse)
 
 
 
@@ -30,52 +46,189 @@ def sanitize_text(text: str) -> str:
 # GET /analysis/{assignment_id}
 # ------------------------------------------------------------
 @router.get("/{assignment_id}")
-def get_analysis(
+async def get_analysis(
     assignment_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.Student = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    """Return latest analysis result or status."""
-    assignment = (
-        db.query(models.Assignment)
-        .filter_by(id=assignment_id, student_id=current_user.id)
-        .first()
-    )
-    if not assignment:
+    """
+    Return latest analysis result or status.
+    Clients poll this endpoint: send the last ETag back as If-None-Match to get a 304.
+    """
+    view = analysis_cache.get(assignment_id)
+    if view is None or view["student_id"] != current_user.id:
+        view = await load_analysis_view(db, assignment_id, current_user.id)
+
+    if request.headers.get("if-none-match") == view["etag"]:
+        return Response(status_code=304, headers=analysis_cache_headers(view))
+    return ORJSONResponse(view["body"], headers=analysis_cache_headers(view))
+
+
+async def load_analysis_view(db: AsyncSession, assignment_id: int, student_id: int) -> dict:
+    """Loads assignment + result in one query and caches the response body."""
+    row = (await db.execute(
+        select(
+            models.Assignment.filename,
+            models.AnalysisResult.id.label("result_id"),
+            models.AnalysisResult.plagiarism_score,
+            models.AnalysisResult.flagged_sections,
+            models.AnalysisResult.suggested_sources,
+            models.AnalysisResult.research_suggestions,
+            models.AnalysisResult.citation_recommendations,
+            models.AnalysisResult.analyzed_at,
+        )
+        .outerjoin(models.AnalysisResult, models.AnalysisResult.assignment_id == models.Assignment.id)
+        .where(models.Assignment.id == assignment_id, models.Assignment.student_id == student_id)
+        .limit(1)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
-    result = (
-        db.query(models.AnalysisResult)
-        .filter_by(assignment_id=assignment_id)
-        .first()
-    )
+    if row.result_id is None:
+        view = {
+            "student_id": student_id,
+            "etag": f'W/"analysis-{assignment_id}-processing"',
+            "body": {"status": "processing", "message": "Analysis not completed yet."},
+        }
+        analysis_cache.set(assignment_id, view, ANALYSIS_PENDING_CACHE_TTL)
+        return view
+
+    # analyzed_at is bumped on every (re)analysis, so it versions the response
+    version = int(row.analyzed_at.timestamp() * 1_000_000) if row.analyzed_at else 0
+    view = {
+        "student_id": student_id,
+        "etag": f'W/"analysis-{assignment_id}-{row.result_id}-{version}"',
+        # JSONB columns come back as native lists/dicts — no decoding needed
+        "body": {
+            "status": "done",
+            "assignment": row.filename,
+            "plagiarism_score": row.plagiarism_score,
+            "flagged_sections": row.flagged_sections,
+            "suggested_sources": row.suggested_sources,
+            "research_suggestions": row.research_suggestions,
+            "citation_recommendations": row.citation_recommendations,
+        },
+    }
+    analysis_cache.set(assignment_id, view, ANALYSIS_CACHE_TTL)
+    return view
+
 
-    if not result:
-        return {"status": "processing", "message": "Analysis not completed yet."}
+def analysis_cache_headers(view: dict) -> dict:
+    # private: per-student data; no-cache: always revalidate with If-None-Match
+    return {"ETag": view["etag"], "Cache-Control": "private, no-cache"}
 
-    # Safe JSON decoding helper
-    def try_json_load(value):
-        if not value:
-            return None
-        if isinstance(value, (dict, list)):
-            return value
+
+# ------------------------------------------------------------
+# Push-based status: long-poll + WebSocket
+# ------------------------------------------------------------
+STATUS_LONGPOLL_MAX_SECONDS = float(os.getenv("STATUS_LONGPOLL_MAX_SECONDS", "60"))
+STATUS_WS_HEARTBEAT_SECONDS = float(os.getenv("STATUS_WS_HEARTBEAT_SECONDS", "30"))
+
+
+async def current_status(db: AsyncSession, assignment_id: int, student_id: int) -> dict:
+    """Latest stage event for an owned assignment, falling back to the DB state."""
+    row = (await db.execute(
+        select(models.Assignment.id, models.AnalysisResult.id.label("result_id"))
+        .outerjoin(models.AnalysisResult, models.AnalysisResult.assignment_id == models.Assignment.id)
+        .where(models.Assignment.id == assignment_id, models.Assignment.student_id == student_id)
+        .limit(1)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    event = status_hub.latest(assignment_id)
+    if event:
+        return event
+    # nothing published on this worker (e.g. finished long ago): derive from the DB
+    return {
+        "assignment_id": assignment_id,
+        "stage": STAGE_DONE if row.result_id is not None else "processing",
+        "seq": 0,
+    }
+
+
+@router.get("/{assignment_id}/status")
+async def wait_for_status(
+    assignment_id: int,
+    since: int = Query(0, description="seq of the last event the client has seen"),
+    timeout: float = Query(25.0, ge=0, le=STATUS_LONGPOLL_MAX_SECONDS),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Long-poll: returns as soon as a stage newer than `since` is published
+    (extracting, embedding with chunk progress, analyzing, done, failed),
+    or the current state after `timeout` seconds.
+    """
+    snapshot = await current_status(db, assignment_id, current_user.id)
+    await db.close()  # don't hold a pooled connection while waiting
+
+    if snapshot["seq"] > since or snapshot["stage"] in FINAL_STAGES:
+        return snapshot
+
+    event = await status_hub.wait_for_event(assignment_id, since=since, timeout=timeout)
+    return event or {**snapshot, "timed_out": True}
+
+
+@router.websocket("/{assignment_id}/ws")
+async def status_websocket(websocket: WebSocket, assignment_id: int, token: str = Query(...)):
+    """
+    Streams stage events until the analysis is done or failed.
+    Browsers can't set headers on WebSockets, so the bearer token goes in ?token=.
+    """
+    async with database.AsyncSessionLocal() as db:
         try:
-            return json.loads(value)
-        except Exception:
-            return value  # fallback
+            user = await authenticate_token(token, db)
+            snapshot = await current_status(db, assignment_id, user.id)
+        except HTTPException as e:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+            return
 
-    suggested_sources = try_json_load(result.suggested_sources)
-    citation_recommendations = try_json_load(result.citation_recommendations)
-    flagged_sections = try_json_load(result.flagged_sections)
+    await websocket.accept()
+    try:
+        event = snapshot
+        await websocket.send_json(event)
+        while event["stage"] not in FINAL_STAGES:
+            newer = await status_hub.wait_for_event(
+                assignment_id, since=event["seq"], timeout=STATUS_WS_HEARTBEAT_SECONDS
+            )
+            if newer is None:
+                await websocket.send_json({"assignment_id": assignment_id, "heartbeat": True})
+                continue
+            event = newer
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+# ------------------------------------------------------------
+# GET /analysis/flagged-by-source/{source_id}
+# ------------------------------------------------------------
+@router.get("/flagged-by-source/{source_id}")
+async def get_flagged_by_source(
+    source_id: int,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """List the current student's assignments with sections flagged against a source."""
+    rows = (await db.execute(
+        select(models.Assignment.id, models.Assignment.filename, models.AnalysisResult.plagiarism_score)
+        .join(models.AnalysisResult, models.AnalysisResult.assignment_id == models.Assignment.id)
+        .where(
+            models.Assignment.student_id == current_user.id,
+            # served by the GIN (jsonb_path_ops) index on flagged_sections
+            models.AnalysisResult.flagged_sections.contains([{"source_id": source_id}]),
+        )
+    )).all()
 
     return {
-        "status": "done",
-        "assignment": assignment.filename,
-        "plagiarism_score": result.plagiarism_score,
-        "flagged_sections": flagged_sections,
-        "suggested_sources": suggested_sources,
-        "research_suggestions": result.research_suggestions,
-        "citation_recommendations": citation_recommendations,
+        "source_id": source_id,
+        "assignments": [
+            {"assignment_id": r.id, "filename": r.filename, "plagiarism_score": r.plagiarism_score}
+            for r in rows
+        ],
     }
 
 
@@ -101,6 +254,9 @@ async def receive_text_ack(
         raise HTTPException(status_code=400, detail="Invalid payload from n8n")
 
     cleaned_text = sanitize_text(extracted_text)
+    # n8n can ask for a job profile; the webhook is unauthenticated, so the flag
+    # only counts together with the X-Profile token (as on /analysis/run)
+    profile = bool(data.get("profile")) and profiling.is_authorized(request.headers.get(profiling.PROFILE_HEADER))
 
     assignment = db.query(models.Assignment).filter(models.Assignment.id == assignment_id and models.Assignment.student_id == student_id).first()
     if not assignment:
@@ -111,7 +267,7 @@ async def receive_text_ack(
     db.refresh(assignment)
 
     # Non-blocking background RAG analysis
-    background_tasks.add_task(run_ai_analysis_rag, assignment_id, cleaned_text)
+    background_tasks.add_task(run_ai_analysis_rag, assignment_id, cleaned_text, profile=profile)
 
     return {"message": "Text received; analysis started.", "assignment_id": assignment_id}
 
@@ -119,97 +275,238 @@ async def receive_text_ack(
 # ------------------------------------------------------------
 # Background RAG + Plagiarism Analysis
 # ------------------------------------------------------------
+@correlated("assignment")
+@profiling.profile_job("analysis")
 def run_ai_analysis_rag(assignment_id: int, text: str):
     db = SessionLocal()
+    outcome = "failed"
+    started = time.perf_counter()
     try:
-        print(f"[AI] Starting RAG + plagiarism analysis for assignment_id={assignment_id}")
+        logger.info("Starting RAG + plagiarism analysis for assignment_id=%s", assignment_id)
 
         # First detecting plagiarism
-        plagiarism_result = detect_plagiarism(db, text, top_k=3, similarity_threshold=0.6)
-        plagiarism_score = plagiarism_result["plagiarism_score"]
-        flagged_sections = plagiarism_result["flagged_sections"]
-
-        # Keza collecting top source titles for RAG
-        top_sources = [fs["source_title"] for fs in flagged_sections[:3]] if flagged_sections else []
-
-        # Ketlo building RAG prompt 
-        rag_prompt = f"""
-        You are an AI academic assistant. Analyze the following student assignment.
+        with stage_timer("detect_plagiarism"):
+            plagiarism_result = detect_plagiarism(
+                db, text, top_k=3, similarity_threshold=0.6,
+                progress=status_hub.progress_publisher(assignment_id),
+            )
+        if store_rag_analysis(db, assignment_id, text, plagiarism_result):
+            outcome = "done"
 
-        Assignment:
-        {text[:2000]}
+    except Exception as e:
+        outcome = "error"
+        logger.exception("Exception during RAG analysis: %s", e)
+        status_hub.publish(assignment_id, STAGE_FAILED, error=str(e)[:500])
+    finally:
+        PIPELINE_STAGE_SECONDS.labels("total").observe(time.perf_counter() - started)
+        ANALYSES.labels("n8n", outcome).inc()
+        db.close()
 
-        Top Related Academic Sources:
-        {top_sources}
 
-        Plagiarism Score: {plagiarism_score}%
+# ------------------------------------------------------------
+# Background extraction + RAG + Plagiarism Analysis (no n8n hop)
+# ------------------------------------------------------------
+@correlated("assignment")
+@profiling.profile_job("extraction")
+def run_local_extraction_rag(assignment_id: int, file_path: str):
+    """
+    Extracts the uploaded file in-process (extract_utils process pool) and feeds
+    pages straight into plagiarism detection while extraction is still running.
+    """
+    db = SessionLocal()
+    outcome = "failed"
+    started = time.perf_counter()
+    try:
+        logger.info("Starting local extraction + RAG analysis for assignment_id=%s", assignment_id)
+        status_hub.publish(assignment_id, STAGE_EXTRACTING)
 
-        Provide a structured JSON with:
-        {{
-            "summary": "...",
-            "key_insights": ["..."],
-            "improvement_suggestions": ["..."],
-            "citations_to_add": ["Title 1", "Title 2"]
-        }}
-        """
+        pages = []
 
-        # Letiko runing AI summarization (Friendli wey Hugging Face)
-        ai_output = analyze_assignment_text(rag_prompt)
-        if not ai_output or "error" in ai_output:
-            print(f"[AI] Error in RAG summarization: {ai_output}")
-            return
+        def stream_pages():
+            for page in iter_document_pages(file_path):
+                page = sanitize_text(page)
+                pages.append(page)
+                yield page
 
-        # Bestemecheresha -> result
-        def safe_json(value):
-            try:
-                return json.dumps(value) if value is not None else None
-            except Exception:
-                return json.dumps(str(value))
-
-        existing_result = db.query(models.AnalysisResult).filter_by(assignment_id=assignment_id).first()
-        if existing_result:
-            print(f"[AI] Updating existing record for assignment_id={assignment_id}")
-            existing_result.plagiarism_score = plagiarism_score
-            existing_result.flagged_sections = safe_json(flagged_sections)
-            existing_result.suggested_sources = safe_json(top_sources)
-            existing_result.research_suggestions = safe_json(ai_output.get("key_insights"))
-            existing_result.citation_recommendations = safe_json(ai_output.get("citations_to_add"))
-            existing_result.confidence_score = 0.9
-        else:
-            print(f"[AI] Creating new record for assignment_id={assignment_id}")
-            new_result = models.AnalysisResult(
-                assignment_id=assignment_id,
-                plagiarism_score=plagiarism_score,
-                flagged_sections=safe_json(flagged_sections),
-                suggested_sources=safe_json(top_sources),
-                research_suggestions=safe_json(ai_output.get("key_insights")),
-                citation_recommendations=safe_json(ai_output.get("citations_to_add")),
-                confidence_score=0.9,
+        with stage_timer("detect_plagiarism"):
+            plagiarism_result = detect_plagiarism(
+                db, stream_pages(), top_k=3, similarity_threshold=0.6,
+                progress=status_hub.progress_publisher(assignment_id),
             )
-            db.add(new_result)
+        text = "\n".join(pages)
+        if not text:
+            logger.warning("No text extracted for assignment_id=%s", assignment_id)
+            status_hub.publish(assignment_id, STAGE_FAILED, error="No text could be extracted")
+            return
 
-        db.commit()
-        print(f"[AI] Stored full RAG + plagiarism analysis for assignment_id={assignment_id}")
+        assignment = db.query(models.Assignment).filter_by(id=assignment_id).first()
+        if not assignment:
+            logger.warning("Assignment %s disappeared during extraction", assignment_id)
+            return
+        with stage_timer("db_write"):
+            assignment.original_text = text
+            db.commit()
 
-        # Notify n8n that the analysis is completed
-        notify_n8n_analysis_done(db, assignment_id)
+        if store_rag_analysis(db, assignment_id, text, plagiarism_result):
+            outcome = "done"
 
     except Exception as e:
-        print(f"[AI] Exception during RAG analysis: {e}")
+        outcome = "error"
+        logger.exception("Exception during local extraction analysis: %s", e)
+        status_hub.publish(assignment_id, STAGE_FAILED, error=str(e)[:500])
     finally:
+        PIPELINE_STAGE_SECONDS.labels("total").observe(time.perf_counter() - started)
+        ANALYSES.labels("local", outcome).inc()
         db.close()
 
 
+def store_rag_analysis(db: Session, assignment_id: int, text: str, plagiarism_result: dict) -> bool:
+    """
+    Runs the RAG summarization on a finished plagiarism result and stores both.
+    Returns False if the summarization failed (nothing is stored).
+    """
+    plagiarism_score = plagiarism_result["plagiarism_score"]
+    flagged_sections = plagiarism_result["flagged_sections"]
+
+    # Keza collecting top source titles for RAG
+    top_sources = [fs["source_title"] for fs in flagged_sections[:3]] if flagged_sections else []
+
+    # Ketlo building RAG prompt 
+    rag_prompt = f"""
+    You are an AI academic assistant. Analyze the following student assignment.
+
+    Assignment:
+    {text[:2000]}
+
+    Top Related Academic Sources:
+    {top_sources}
+
+    Plagiarism Score: {plagiarism_score}%
+
+    Provide a structured JSON with:
+    {{
+        "summary": "...",
+        "key_insights": ["..."],
+        "improvement_suggestions": ["..."],
+        "citations_to_add": ["Title 1", "Title 2"]
+    }}
+    """
+
+    # Letiko runing AI summarization (Friendli wey Hugging Face)
+    status_hub.publish(assignment_id, STAGE_ANALYZING, plagiarism_score=plagiarism_score)
+    with stage_timer("llm"):
+        ai_output = analyze_assignment_text(rag_prompt)
+    if not ai_output or "error" in ai_output:
+        logger.error("Error in RAG summarization: %s", ai_output)
+        status_hub.publish(assignment_id, STAGE_FAILED, error="RAG summarization failed")
+        return False
+
+    # Bestemecheresha -> result (native JSONB values, no json.dumps)
+    research_suggestions = ai_output.get("key_insights")
+    citation_recommendations = ai_output.get("citations_to_add")
+
+    # Single atomic upsert on ux_analysis_results_assignment_id: concurrent
+    # analyses of the same assignment can no longer create duplicate rows
+    values = dict(
+        plagiarism_score=plagiarism_score,
+        flagged_sections=flagged_sections,
+        suggested_sources=top_sources,
+        research_suggestions=research_suggestions,
+        citation_recommendations=citation_recommendations,
+        confidence_score=0.9,
+    )
+    upsert = pg_insert(models.AnalysisResult).values(assignment_id=assignment_id, **values)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[models.AnalysisResult.assignment_id],
+        set_={**values, "analyzed_at": func.now()},  # new version -> new ETag
+    )
+    with stage_timer("db_write"):
+        db.execute(upsert)
+        logger.debug("Upserted analysis result for assignment_id=%s", assignment_id)
+
+        # Notify n8n that the analysis is completed (outbox row in the same transaction)
+        db.flush()
+        notify_n8n_analysis_done(db, assignment_id)
+
+        db.commit()
+    invalidate_analysis(assignment_id)
+    status_hub.publish(assignment_id, STAGE_DONE, plagiarism_score=plagiarism_score)
+    logger.info("Stored full RAG + plagiarism analysis for assignment_id=%s", assignment_id)
+    return True
+
+
+# ------------------------------------------------------------
+# Content-hash deduplication
+# ------------------------------------------------------------
+def find_analyzed_by_hash(db: Session, content_hashes) -> dict:
+    """Maps content_hash -> an already analyzed Assignment with that content."""
+    content_hashes = [h for h in set(content_hashes) if h]
+    if not content_hashes:
+        return {}
+
+    rows = (
+        db.query(models.Assignment)
+        .join(models.AnalysisResult, models.AnalysisResult.assignment_id == models.Assignment.id)
+        .filter(models.Assignment.content_hash.in_(content_hashes))
+        .all()
+    )
+    return {row.content_hash: row for row in rows}
+
+
+def copy_analysis(db: Session, source: models.Assignment, assignment: models.Assignment):
+    """Copies text + analysis result of `source` onto `assignment` (caller commits)."""
+    result = source.analysis_result
+    if source.text_blob is not None:
+        # copy the compressed bytes as they are
+        assignment.text_blob = models.AssignmentText(
+            codec=source.text_blob.codec, data=source.text_blob.data, raw_size=source.text_blob.raw_size
+        )
+    assignment.topic = source.topic
+    assignment.academic_level = source.academic_level
+    assignment.word_count = source.word_count
+    db.add(models.AnalysisResult(
+        assignment_id=assignment.id,
+        suggested_sources=result.suggested_sources,
+        plagiarism_score=result.plagiarism_score,
+        flagged_sections=result.flagged_sections,
+        research_suggestions=result.research_suggestions,
+        citation_recommendations=result.citation_recommendations,
+        confidence_score=result.confidence_score,
+    ))
+    logger.info("Reused analysis of assignment_id=%s for assignment_id=%s", source.id, assignment.id)
+
+
+def reuse_existing_analysis(db: Session, assignment: models.Assignment) -> bool:
+    """
+    If another assignment with the same content_hash was already analyzed,
+    copy its text + result onto `assignment`, queue the n8n 'analysis done'
+    notification and return True. The caller commits.
+    """
+    source = find_analyzed_by_hash(db, [assignment.content_hash]).get(assignment.content_hash)
+    if not source or source.id == assignment.id:
+        return False
+
+    copy_analysis(db, source, assignment)
+    db.flush()
+    notify_n8n_analysis_done(db, assignment.id)
+    return True
+
+
 # ------------------------------------------------------------
 # Manual test triggering
 # ------------------------------------------------------------
 @router.post("/run/{assignment_id}")
 def run_analysis_manual(
     assignment_id: int,
+    request: Request,
+    profile: bool = Query(False, description="cProfile the run (requires the X-Profile token)"),
     db: Session = Depends(database.get_db),
-    current_user: models.Student = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Allow manual RAG analysis trigger."""
+    if profile and not profiling.is_authorized(request.headers.get(profiling.PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail="Profiling not enabled or invalid X-Profile token")
+
     assignment = (
         db.query(models.Assignment)
         .filter_by(id=assignment_id, student_id=current_user.id)
@@ -222,25 +519,90 @@ def run_analysis_manual(
     if not text:
         raise HTTPException(status_code=400, detail="No text found for this assignment")
 
-    run_ai_analysis_rag(assignment_id, text)
-    return {"message": f"Manual RAG analysis triggered for assignment {assignment_id}"}
+    if not profile:
+        run_ai_analysis_rag(assignment_id, text)
+        return {"message": f"Manual RAG analysis triggered for assignment {assignment_id}"}
+
+    # profiled here rather than via profile_job so the artifact name can be returned
+    with profiling.profiled("analysis", assignment_id) as result:
+        run_ai_analysis_rag(assignment_id, text)
+    return {
+        "message": f"Manual RAG analysis triggered for assignment {assignment_id}",
+        "profile_artifact": result["artifact"],
+    }
 
 
 # ------------------------------------------------------------
 # Helper endpoints
 # ------------------------------------------------------------
-@router.post("/embed-sources")
-def embed_sources_endpoint(db: Session = Depends(database.get_db)):
-    """Manually regenerate embeddings for academic sources."""
-    embed_academic_sources(db)
-    return {"message": "Embedding process completed."}
+def _embed_sources_job():
+    db = SessionLocal()
+    try:
+        embed_academic_sources(db)
+    except Exception as e:
+        logger.exception("Source embedding failed: %s", e)
+    finally:
+        db.close()
+
 
+@router.post("/embed-sources", status_code=202,
+             dependencies=[Depends(get_current_user), Depends(require_corpus_admin)])
+def embed_sources_endpoint(background_tasks: BackgroundTasks):
+    """
+    Embed academic sources (and passages) missing a vector, in the background.
+    Requires X-Admin-Token; the CLI equivalent is python embedding_models.py backfill <model>.
+    """
+    background_tasks.add_task(_embed_sources_job)
+    return {"message": "Embedding started in the background."}
+
+
+@router.post("/import-sources", dependencies=[Depends(require_corpus_admin)])
+def import_sources_endpoint(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="JSON array, NDJSON or CSV of academic sources"),
+    format: str = Query(None, description="json | ndjson | csv (defaults to the file extension)"),
+    embed: bool = Query(False, description="Embed the newly inserted sources in the background"),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Bulk-import academic sources (streamed, COPY + ON CONFLICT dedup). Every student is
+    checked against this corpus, so it requires X-Admin-Token (else: python source_importer.py).
+    """
+    fmt = format or source_importer.detect_format(file.filename or "")
+    if fmt not in ("json", "ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be json, ndjson or csv")
+
+    text_stream = codecs.getreader("utf-8")(file.file)
+    try:
+        stats = source_importer.import_sources(text_stream, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {fmt} input: {e}")
+
+    new_ids = stats.pop("new_ids")
+    if embed and new_ids:
+        background_tasks.add_task(source_importer.embed_new_sources, new_ids)
+    return {"message": "Import completed.", **stats, "embedding_queued": bool(embed and new_ids)}
+
+
+def _index_sources_job():
+    db = SessionLocal()
+    try:
+        if not vector_utils.index_academic_sources(db):
+            logger.error("Background vector index build failed")
+    finally:
+        db.close()
 
-@router.post("/index-sources")
-def create_vector_index(db: Session = Depends(get_db)):
-    """Create pgvector index for academic sources."""
-    vector_utils.index_academic_sources(db)
-    return {"message": "Vector index created or already exists."}
+
+@router.post("/index-sources", status_code=202,
+             dependencies=[Depends(get_current_user), Depends(require_corpus_admin)])
+def create_vector_index(background_tasks: BackgroundTasks):
+    """
+    Create the pgvector index(es) for academic sources if missing, in the background.
+    Requires X-Admin-Token. Rebuilding (dropping the live index) is CLI-only:
+    python embedding_models.py index [--rebuild]
+    """
+    background_tasks.add_task(_index_sources_job)
+    return {"message": "Vector index build started in the background."}
 
 
 @router.get("/search-similar")
@@ -256,48 +618,55 @@ def search_similar(query: str = Query(..., description="Text to find similar sou
 def run_notify_n8n_analysis_done_manual(
     assignment_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.Student = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Manual trigger to notify n8n that analysis is done. By calling notify_n8n_analysis_done """
-    notify_n8n_analysis_done(db, assignment_id)
-    return {"message": f"n8n notified for assignment {assignment_id}"}
-
-
-
-def notify_n8n_analysis_done(db: Session, assignment_id: int):
-    
-    """Notify n8n that the analysis is completed and ready."""
-    
-    N8N_NOTIFY_URL = os.getenv("N8N_NOTIFY_URL")
-
     try:
-        # Fetch student + analysis data
-        assignment = db.query(models.Assignment).filter_by(id=assignment_id).first()
-        student = db.query(models.Student).filter_by(id=assignment.student_id).first()
-        result = db.query(models.AnalysisResult).filter_by(assignment_id=assignment_id).first()
+        queued = notify_n8n_analysis_done(db, assignment_id)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Failed to queue n8n notification: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to queue the n8n notification")
+    if not queued:
+        raise HTTPException(status_code=404, detail="No finished analysis for this assignment")
+    db.commit()
+    return {"message": f"n8n notification queued for assignment {assignment_id}"}
 
-        if not assignment or not student or not result:
-            print(f"[AI] Skipping n8n notify — missing data for assignment_id={assignment_id}")
-            return
 
-        payload = {
-            "assignment_id": assignment_id,
-            "filename": assignment.filename,
-            "student_id": student.id,
-            "student_id_self": student.student_id,
-            "student_email": student.email,
-            "full_name": student.full_name,
-            "plagiarism_score": result.plagiarism_score,
-            "flagged_sections": json.loads(result.flagged_sections or "[]"),
-            "suggested_sources": json.loads(result.suggested_sources or "[]"),
-            "research_suggestions": json.loads(result.research_suggestions or "[]"),
-            "citation_recommendations": json.loads(result.citation_recommendations or "[]"),
-            "status": "done"
-        }
 
-        res = requests.post(N8N_NOTIFY_URL, json=payload, timeout=10)
-        res.raise_for_status()
-        print(f"[AI] Notified n8n for assignment_id={assignment_id}")
+def notify_n8n_analysis_done(db: Session, assignment_id: int) -> bool:
+    """
+    Queue the 'analysis done' n8n notification in the outbox.
+    Nothing is sent here: the row is committed together with the caller's
+    transaction and delivered (with retries) by outbox.run_dispatcher.
+    Returns False if there is nothing to notify about. A failure to queue
+    raises, so the caller's transaction (e.g. the stored result) rolls back
+    instead of committing without its outbox row.
+    """
+    # Fetch student + analysis data
+    assignment = db.query(models.Assignment).filter_by(id=assignment_id).first()
+    student = db.query(models.Student).filter_by(id=assignment.student_id).first() if assignment else None
+    result = db.query(models.AnalysisResult).filter_by(assignment_id=assignment_id).first()
+
+    if not assignment or not student or not result:
+        logger.warning("Skipping n8n notify — missing data for assignment_id=%s", assignment_id)
+        return False
+
+    payload = {
+        "assignment_id": assignment_id,
+        "filename": assignment.stored_filename or assignment.filename,
+        "original_filename": assignment.filename,
+        "student_id": student.id,
+        "student_id_self": student.student_id,
+        "student_email": student.email,
+        "full_name": student.full_name,
+        "plagiarism_score": result.plagiarism_score,
+        "flagged_sections": result.flagged_sections or [],
+        "suggested_sources": result.suggested_sources or [],
+        "research_suggestions": result.research_suggestions or [],
+        "citation_recommendations": result.citation_recommendations or [],
+        "status": "done"
+    }
 
-    except Exception as e:
-        print(f"[AI] Failed to notify n8n: {e}")
\ No newline at end of file
+    enqueue_event(db, EVENT_ANALYSIS_DONE, payload)
+    return True
\ No newline at end of file
@@ -0,0 +1,84 @@
+# routes_assignments.py
+
+# ------------------------------------------------------------
+# Assignment listing
+# Keyset pagination on (uploaded_at, id) newest first, served by
+# ix_assignments_student_uploaded; results come from the same outer-joined
+# query (no per-row lazy loads), so every page costs one index range scan.
+# ------------------------------------------------------------
+
+import base64
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+import database, models, schemas
+from auth import get_current_user, Principal
+
+router = APIRouter(prefix="/assignments", tags=["Assignments"])
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(uploaded_at: datetime, assignment_id: int) -> str:
+    raw = f"{uploaded_at.isoformat()}|{assignment_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        uploaded_at, assignment_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(uploaded_at), int(assignment_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ------------------------------------------------------------
+# GET /assignments/
+# ------------------------------------------------------------
+@router.get("/", response_model=schemas.AssignmentPage)
+async def list_assignments(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Lists the current student's assignments (newest first) with their analysis status."""
+    query = (
+        select(
+            models.Assignment.id,
+            models.Assignment.filename,
+            models.Assignment.uploaded_at,
+            models.AnalysisResult.id.label("result_id"),
+            models.AnalysisResult.plagiarism_score,
+            models.AnalysisResult.analyzed_at,
+        )
+        .outerjoin(models.AnalysisResult, models.AnalysisResult.assignment_id == models.Assignment.id)
+        .where(models.Assignment.student_id == current_user.id)
+        .order_by(models.Assignment.uploaded_at.desc(), models.Assignment.id.desc())
+        .limit(limit + 1)  # one extra row tells us whether there is a next page
+    )
+    if cursor:
+        uploaded_at, assignment_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(models.Assignment.uploaded_at, models.Assignment.id) < tuple_(uploaded_at, assignment_id)
+        )
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        {
+            "id": r.id,
+            "filename": r.filename,
+            "uploaded_at": r.uploaded_at,
+            "status": "done" if r.result_id is not None else "processing",
+            "plagiarism_score": r.plagiarism_score,
+            "analyzed_at": r.analyzed_at,
+        }
+        for r in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].uploaded_at, rows[-1].id) if has_more else None
+    return {"items": items, "next_cursor": next_cursor}
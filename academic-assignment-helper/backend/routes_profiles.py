@@ -0,0 +1,41 @@
+# backend/routes_profiles.py
+
+# ------------------------------------------------------------
+# Download of stored profiles (see profiling.py)
+# Guarded by the same X-Profile token that turns profiling on.
+# ------------------------------------------------------------
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import FileResponse
+
+import profiling
+
+
+def require_profiling_token(request: Request):
+    if not profiling.is_authorized(request.headers.get(profiling.PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail="Profiling not enabled or invalid X-Profile token")
+
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"], dependencies=[Depends(require_profiling_token)])
+
+
+# ------------------------------------------------------------
+# GET /profiles/  → newest first
+# ------------------------------------------------------------
+@router.get("/")
+def list_profiles():
+    return profiling.list_profiles()
+
+
+# ------------------------------------------------------------
+# GET /profiles/{name}?format=prof|txt
+# ------------------------------------------------------------
+@router.get("/{name}")
+def download_profile(name: str, format: str = Query("prof", pattern="^(prof|txt)$")):
+    """pstats dump (snakeviz / python -m pstats) or the plain-text top-N summary."""
+    path = profiling.profile_path(name, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "txt":
+        return FileResponse(path, media_type="text/plain")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
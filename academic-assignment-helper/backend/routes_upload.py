@@ -1,10 +1,39 @@
 # routes_upload.py
- 
-import os, shutil, requests
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+
+import os, zipfile
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, BackgroundTasks, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import database, models
-from auth import get_current_user
+import database, models, schemas
+from auth import get_current_user, Principal
+from routes_analysis import (
+    run_local_extraction_rag,
+    reuse_existing_analysis,
+    find_analyzed_by_hash,
+    copy_analysis,
+    notify_n8n_analysis_done,
+)
+from outbox import enqueue_event, EVENT_ASSIGNMENT_UPLOADED
+from storage_utils import (
+    COPY_CHUNK_SIZE,
+    MAX_UPLOAD_BYTES,
+    MAX_RESUMABLE_UPLOAD_BYTES,
+    UploadTooLargeError,
+    UploadSessionBusyError,
+    UploadSessionLimitError,
+    UploadOffsetMismatchError,
+    save_content_addressed,
+    save_stream_content_addressed,
+    stored_path,
+    create_upload_session,
+    get_upload_session,
+    append_upload_chunk,
+    complete_upload_session,
+    delete_upload_session,
+)
 from dotenv import load_dotenv
 #from . import database, models
 #from .auth import get_current_user
@@ -12,59 +41,425 @@ from dotenv import load_dotenv
 load_dotenv()
 
 router = APIRouter(prefix="/upload", tags=["Assignment Upload"])
-N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
 
-UPLOAD_DIR = "data/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# "n8n"  -> n8n Flow 1 extracts the text and posts it back to /analysis/ack
+# "local" -> text is extracted in-process (extract_utils) and analysed directly
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "n8n").lower()
 
 ALLOWED_EXTENSIONS = {".pdf", ".docx"}
 
+# Bulk (whole-class) ingest limits
+MAX_BULK_FILES = int(os.getenv("MAX_BULK_FILES", "500"))
+MAX_BULK_ARCHIVE_BYTES = int(os.getenv("MAX_BULK_ARCHIVE_BYTES", str(1024 * 1024 * 1024)))  # 1 GiB
+BULK_EXTRACTION_CONCURRENCY = int(os.getenv("BULK_EXTRACTION_CONCURRENCY", "4"))
 
-@router.post("/", status_code=201)
-def upload_assignment(
-    file: UploadFile = File(...),
-    db: Session = Depends(database.get_db),
-    current_user: models.Student = Depends(get_current_user),
-):
-    # Check file extension
-    _, ext = os.path.splitext(file.filename)
+
+# ------------------------------------------------------------
+# Shared helpers
+# ------------------------------------------------------------
+def check_extension(filename: str) -> str:
+    _, ext = os.path.splitext(filename or "")
     if ext.lower() not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail="Only PDF and DOCX files are allowed."
         )
+    return ext.lower()
+
+
+def queue_analysis(db: Session, background_tasks: BackgroundTasks,
+                   assignment: models.Assignment, current_user: Principal):
+    """
+    Starts the downstream pipeline for a new (flushed) assignment; the caller commits.
+    n8n mode writes an outbox event in the caller's transaction, so the upload
+    and its trigger are committed (or rolled back) together.
+    """
+    # Local extraction skips the n8n Flow 1 round trip entirely
+    if EXTRACTION_MODE == "local":
+        background_tasks.add_task(run_local_extraction_rag, assignment.id, stored_path(assignment.stored_filename))
+        return
 
+    # ለጥቆ ሌትስ Trigger n8n workflow (webhook) through the outbox
+    enqueue_event(db, EVENT_ASSIGNMENT_UPLOADED, {
+        "assignment_id": assignment.id,
+        "student_email": current_user.email,
+        "student_id": current_user.id,
+        "filename": assignment.stored_filename,
+        "original_filename": assignment.filename,
+    })
 
-    # መጀመሪያ ሌትስ Save the file locally
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
-    # ከዛ ሌትስ Record metadata in DB  
+def run_local_extractions_batch(items: list):
+    """Runs local extraction for a batch of uploads with bounded concurrency."""
+    with ThreadPoolExecutor(max_workers=BULK_EXTRACTION_CONCURRENCY) as pool:
+        for assignment_id, file_path in items:
+            pool.submit(run_local_extraction_rag, assignment_id, file_path)
+
+
+def register_upload(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    current_user: Principal,
+    filename: str,
+    content_hash: str,
+    stored_filename: str,
+):
+    """Records a stored upload (with dedup) and schedules its analysis."""
+    file_path = stored_path(stored_filename)
+
+    # Same student uploading identical content again → same assignment
+    existing = (
+        db.query(models.Assignment)
+        .filter_by(student_id=current_user.id, content_hash=content_hash)
+        .first()
+    )
+    if existing:
+        return {
+            "message": "Identical assignment already uploaded.",
+            "assignment_id": existing.id,
+            "file_path": os.path.abspath(file_path),
+            "duplicate": True,
+        }
+
+    # ከዛ ሌትስ Record metadata in DB
     new_assignment = models.Assignment(
         student_id=current_user.id,
-        filename=file.filename,
+        filename=filename,
+        stored_filename=stored_filename,
+        content_hash=content_hash,
         original_text=None,
     )
     db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
+    db.flush()
 
-    # ለጥቆ ሌትስ Trigger n8n workflow (webhook) 
-    try:
-        payload = {
+    # Identical content was already analyzed → reuse it instead of re-running the pipeline
+    if reuse_existing_analysis(db, new_assignment):
+        db.commit()
+        return {
+            "message": "Identical content was already analyzed; existing analysis reused.",
             "assignment_id": new_assignment.id,
-            "student_email": current_user.email,
-            "student_id": current_user.id,
-             "filename": file.filename,
+            "file_path": os.path.abspath(file_path),
+            "duplicate": True,
         }
-        res = requests.post(N8N_WEBHOOK_URL, json=payload, timeout=10)
-        res.raise_for_status()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to trigger n8n: {e}")
+
+    queue_analysis(db, background_tasks, new_assignment, current_user)
+    db.commit()
 
     return {
         "message": "Assignment uploaded successfully and processing started.",
         "assignment_id": new_assignment.id,
         "file_path": os.path.abspath(file_path),
     }
+
+
+# ------------------------------------------------------------
+# POST /upload  (multipart form upload)
+# ------------------------------------------------------------
+@router.post("/", status_code=201)
+def upload_assignment(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # Check file extension
+    ext = check_extension(file.filename)
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte limit.")
+
+    # መጀመሪያ ሌትስ Save the file locally (content-addressed, hashed while writing)
+    content_hash, stored_filename, _ = save_content_addressed(file.file, ext)
+
+    return register_upload(db, background_tasks, current_user, file.filename, content_hash, stored_filename)
+
+
+# ------------------------------------------------------------
+# POST /upload/stream?filename=...  (raw body, streamed to disk)
+# ------------------------------------------------------------
+@router.post("/stream", status_code=201)
+async def upload_assignment_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(..., description="Original file name (.pdf or .docx)"),
+    db: Session = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Streams the raw request body (application/octet-stream) to disk in fixed-size
+    chunks without buffering it in memory; the size cap is enforced while streaming.
+    """
+    ext = check_extension(filename)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte limit.")
+
+    try:
+        content_hash, stored_filename, size = await save_stream_content_addressed(request.stream(), ext)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty upload.")
+
+    return await run_in_threadpool(
+        register_upload, db, background_tasks, current_user, filename, content_hash, stored_filename
+    )
+
+
+# ------------------------------------------------------------
+# Resumable chunked uploads (large theses)
+#   POST   /upload/sessions                      -> create, returns upload_id
+#   PUT    /upload/sessions/{upload_id}?offset=N -> append raw bytes at offset N
+#   GET    /upload/sessions/{upload_id}          -> current offset (resume point)
+#   POST   /upload/sessions/{upload_id}/complete -> finalize + start analysis
+#   DELETE /upload/sessions/{upload_id}          -> abort
+# Sessions expire after UPLOAD_SESSION_TTL_SECONDS without a chunk and are
+# capped at MAX_OPEN_UPLOAD_SESSIONS per student.
+# ------------------------------------------------------------
+def get_owned_session(upload_id: str, current_user: Principal) -> dict:
+    session = get_upload_session(upload_id)
+    if not session or session["student_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/sessions", status_code=201)
+def create_resumable_upload(
+    body: schemas.UploadSessionCreate,
+    current_user: Principal = Depends(get_current_user),
+):
+    check_extension(body.filename)
+    if body.total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive.")
+    if body.total_size > MAX_RESUMABLE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_RESUMABLE_UPLOAD_BYTES} byte limit.")
+
+    try:
+        session = create_upload_session(current_user.id, body.filename, body.total_size)
+    except UploadSessionLimitError as e:
+        raise HTTPException(status_code=429, detail=f"{e}; complete or abort one first.")
+    return {
+        "upload_id": session["upload_id"],
+        "offset": 0,
+        "total_size": session["total_size"],
+        "chunk_size": COPY_CHUNK_SIZE,
+    }
+
+
+@router.get("/sessions/{upload_id}")
+def get_resumable_upload(upload_id: str, current_user: Principal = Depends(get_current_user)):
+    session = get_owned_session(upload_id, current_user)
+    return {"upload_id": upload_id, "offset": session["offset"], "total_size": session["total_size"]}
+
+
+@router.put("/sessions/{upload_id}")
+async def upload_resumable_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset this chunk starts at"),
+    current_user: Principal = Depends(get_current_user),
+):
+    session = get_owned_session(upload_id, current_user)
+
+    # the offset is re-checked under the session lock, so a retried PUT can't interleave
+    try:
+        new_offset = await append_upload_chunk(session, request.stream(), offset)
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Offset mismatch; resume from the returned offset.", "offset": e.offset},
+        )
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="Another chunk is being written to this upload; retry shortly.")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="Chunk goes past the declared total_size.")
+
+    return {"upload_id": upload_id, "offset": new_offset, "total_size": session["total_size"]}
+
+
+@router.post("/sessions/{upload_id}/complete", status_code=201)
+def complete_resumable_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    session = get_owned_session(upload_id, current_user)
+    if session["offset"] != session["total_size"]:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload is incomplete.", "offset": session["offset"]},
+        )
+
+    ext = check_extension(session["filename"])
+    try:
+        content_hash, stored_filename, _ = complete_upload_session(session, ext)
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="A chunk is still being written to this upload; retry shortly.")
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(status_code=409, detail={"message": "Upload is incomplete.", "offset": e.offset})
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    return register_upload(db, background_tasks, current_user, session["filename"], content_hash, stored_filename)
+
+
+@router.delete("/sessions/{upload_id}", status_code=204)
+def abort_resumable_upload(upload_id: str, current_user: Principal = Depends(get_current_user)):
+    get_owned_session(upload_id, current_user)
+    delete_upload_session(upload_id)
+
+
+# ------------------------------------------------------------
+# POST /upload/bulk  (one ZIP archive or a multipart batch of files)
+# ------------------------------------------------------------
+def iter_bulk_entries(archive: Optional[UploadFile], files: Optional[List[UploadFile]]):
+    """
+    Yields (filename, opener) pairs; opener() returns a context manager over the
+    entry's stream. ZIP entries are opened one at a time by the caller (inside its
+    per-entry error handling) and streamed, so the archive is never extracted to
+    memory as a whole.
+    """
+    for upload in files or []:
+        yield upload.filename, (lambda f=upload.file: nullcontext(f))
+
+    if archive is None:
+        return
+
+    try:
+        zf = zipfile.ZipFile(archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="archive is not a valid ZIP file.")
+
+    with zf:
+        for info in zf.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            if info.is_dir() or not base or base.startswith(".") or name.startswith("__MACOSX/"):
+                continue
+            yield base, (lambda info=info: zf.open(info))
+
+
+@router.post("/bulk", status_code=201)
+def upload_assignments_bulk(
+    background_tasks: BackgroundTasks,
+    archive: Optional[UploadFile] = File(None, description="ZIP with .pdf/.docx submissions"),
+    files: Optional[List[UploadFile]] = File(None, description="Multipart batch of .pdf/.docx files"),
+    db: Session = Depends(database.get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Ingests a whole class's submissions in one request: every entry is stored
+    content-addressed, all Assignment rows are inserted in one transaction and
+    the analyses are enqueued together. Returns a per-file status report.
+    The tree has no instructor role yet, so every row is owned by the uploader.
+    """
+    if archive is None and not files:
+        raise HTTPException(status_code=400, detail="Provide a ZIP archive or a batch of files.")
+    if archive is not None and archive.size is not None and archive.size > MAX_BULK_ARCHIVE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Archive exceeds the {MAX_BULK_ARCHIVE_BYTES} byte limit.")
+
+    report = []
+    stored = []  # (report_entry, content_hash, stored_filename)
+
+    # 1. Stream every entry to content-addressed storage
+    for filename, open_entry in iter_bulk_entries(archive, files):
+        entry = {"filename": filename}
+        report.append(entry)
+
+        if len(stored) >= MAX_BULK_FILES:
+            entry.update(status="rejected", detail=f"More than {MAX_BULK_FILES} files in one batch.")
+            continue
+
+        _, ext = os.path.splitext(filename or "")
+        if ext.lower() not in ALLOWED_EXTENSIONS:
+            entry.update(status="rejected", detail="Only PDF and DOCX files are allowed.")
+            continue
+
+        try:
+            with open_entry() as src:
+                content_hash, stored_filename, _ = save_content_addressed(src, ext, max_bytes=MAX_UPLOAD_BYTES)
+        except UploadTooLargeError as e:
+            entry.update(status="rejected", detail=str(e))
+            continue
+        # RuntimeError: encrypted entry; NotImplementedError: unsupported compression method
+        except (zipfile.BadZipFile, OSError, RuntimeError, NotImplementedError) as e:
+            entry.update(status="rejected", detail=f"Unreadable entry: {e}")
+            continue
+
+        stored.append((entry, content_hash, stored_filename))
+
+    # 2. Dedup against this student's assignments and against already analyzed content
+    hashes = [h for _, h, _ in stored]
+    existing_ids = dict(
+        db.query(models.Assignment.content_hash, models.Assignment.id)
+        .filter(
+            models.Assignment.student_id == current_user.id,
+            models.Assignment.content_hash.in_(hashes),
+        )
+        .all()
+    ) if hashes else {}
+    analyzed = find_analyzed_by_hash(db, hashes)
+
+    new_rows = []  # (report_entry, Assignment)
+    batch_rows = {}  # content_hash -> Assignment created by this batch
+    batch_duplicates = []  # (report_entry, Assignment)
+    for entry, content_hash, stored_filename in stored:
+        if content_hash in existing_ids:
+            entry.update(status="duplicate", assignment_id=existing_ids[content_hash])
+            continue
+        # Identical files inside the same batch map onto the first one
+        if content_hash in batch_rows:
+            batch_duplicates.append((entry, batch_rows[content_hash]))
+            continue
+        assignment = models.Assignment(
+            student_id=current_user.id,
+            filename=entry["filename"],
+            stored_filename=stored_filename,
+            content_hash=content_hash,
+            original_text=None,
+        )
+        batch_rows[content_hash] = assignment
+        new_rows.append((entry, assignment))
+
+    # 3. One batch insert + one commit
+    db.add_all([assignment for _, assignment in new_rows])
+    db.flush()
+
+    # 4. Enqueue all analyses together (outbox rows share the same commit)
+    local_batch = []
+    for entry, assignment in new_rows:
+        entry["assignment_id"] = assignment.id
+        source = analyzed.get(assignment.content_hash)
+        if source:
+            copy_analysis(db, source, assignment)
+            entry["status"] = "reused"
+        elif EXTRACTION_MODE == "local":
+            entry["status"] = "queued"
+            local_batch.append((assignment.id, stored_path(assignment.stored_filename)))
+        else:
+            entry["status"] = "queued"
+            queue_analysis(db, background_tasks, assignment, current_user)
+
+    db.flush()
+    for entry, assignment in new_rows:
+        if entry["status"] == "reused":
+            notify_n8n_analysis_done(db, assignment.id)
+    for entry, assignment in batch_duplicates:
+        entry.update(status="duplicate", assignment_id=assignment.id)
+    db.commit()
+
+    if local_batch:
+        background_tasks.add_task(run_local_extractions_batch, local_batch)
+
+    counts = {}
+    for entry in report:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+
+    return {
+        "message": f"Bulk upload processed: {len(report)} files.",
+        "summary": counts,
+        "files": report,
+    }
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
 
 class StudentCreate(BaseModel):
     email: EmailStr
@@ -25,3 +26,22 @@ class StudentOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    total_size: int
+
+
+class AssignmentSummary(BaseModel):
+    id: int
+    filename: Optional[str]
+    uploaded_at: Optional[datetime]
+    status: str  # processing | done
+    plagiarism_score: Optional[float] = None
+    analyzed_at: Optional[datetime] = None
+
+
+class AssignmentPage(BaseModel):
+    items: List[AssignmentSummary]
+    next_cursor: Optional[str] = None
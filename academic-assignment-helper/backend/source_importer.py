@@ -0,0 +1,245 @@
+# backend/source_importer.py
+
+# ------------------------------------------------------------
+# High-throughput importer for the academic_sources corpus
+# - streams JSON arrays, NDJSON or CSV (never loads the whole file)
+# - loads batches with COPY into a temp staging table
+# - dedups through ux_academic_sources_identity (title + authors + year)
+#   + INSERT ... ON CONFLICT DO NOTHING
+# - optionally hands the new rows straight to the embedding backfill
+#
+# CMD: python source_importer.py data/sample_academic_sources.json [--embed]
+#      python source_importer.py library.ndjson --batch-size 10000
+# ------------------------------------------------------------
+
+import io
+import os
+import csv
+import sys
+import json
+import logging
+import argparse
+
+from database import engine, SessionLocal
+from vector_utils import embed_academic_sources
+from logging_utils import setup_logging, shutdown_logging
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+READ_SIZE = 64 * 1024
+# must match the ux_academic_sources_identity expressions (models.py / migrations.py)
+SOURCE_IDENTITY = "title, COALESCE(authors, ''), COALESCE(publication_year, 0)"
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("title", "authors", "publication_year", "abstract", "full_text", "source_type")
+FORMATS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+# ------------------------------------------------------------
+# Streaming readers
+# ------------------------------------------------------------
+def iter_json_array(f):
+    """Yields the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+
+    while True:
+        # skip whitespace and separators
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+            pos += 1
+
+        if pos >= len(buf) or not started:
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError("Unexpected end of JSON array")
+                chunk = f.read(READ_SIZE)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array of sources")
+            pos += 1
+            started = True
+            continue
+
+        if buf[pos] == "]":
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(READ_SIZE)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+
+        yield obj
+        pos = end
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv(f):
+    yield from csv.DictReader(f)
+
+
+def iter_records(f, fmt: str):
+    readers = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}
+    if fmt not in readers:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    return readers[fmt](f)
+
+
+def detect_format(path: str) -> str:
+    _, ext = os.path.splitext(path)
+    return FORMATS.get(ext.lower(), "json")
+
+
+def normalize(record: dict):
+    """Maps a raw record onto the academic_sources columns (None if unusable)."""
+    title = (record.get("title") or "").strip()
+    if not title:
+        return None
+
+    year = record.get("publication_year")
+    try:
+        year = int(year) if year not in (None, "") else None
+    except (TypeError, ValueError):
+        year = None
+
+    row = {col: record.get(col) or None for col in COLUMNS}
+    row["title"] = title
+    row["publication_year"] = year
+    return row
+
+
+# ------------------------------------------------------------
+# COPY + upsert
+# ------------------------------------------------------------
+def _copy_batch(cur, rows: list) -> list:
+    """COPYs one batch into staging and moves new sources into academic_sources."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in COLUMNS])
+    buffer.seek(0)
+
+    cur.execute("SET LOCAL statement_timeout = 0")
+    cur.execute("TRUNCATE academic_sources_staging")
+    cur.copy_expert(
+        f"COPY academic_sources_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    cur.execute(f"""
+        INSERT INTO academic_sources ({', '.join(COLUMNS)})
+        SELECT DISTINCT ON ({SOURCE_IDENTITY}) {', '.join(COLUMNS)}
+        FROM academic_sources_staging
+        ORDER BY {SOURCE_IDENTITY}
+        ON CONFLICT ({SOURCE_IDENTITY}) DO NOTHING
+        RETURNING id
+    """)
+    return [r[0] for r in cur.fetchall()]
+
+
+def import_sources(f, fmt: str, batch_size: int = IMPORT_BATCH_SIZE, embed: bool = False) -> dict:
+    """
+    Imports sources from an open text stream. Each batch is committed on its own,
+    so a failure part-way keeps everything imported before it.
+    Returns counts plus the ids of newly inserted sources.
+    """
+    stats = {"read": 0, "skipped": 0, "inserted": 0, "batches": 0}
+    new_ids = []
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS academic_sources_staging (
+                title TEXT, authors TEXT, publication_year INTEGER,
+                abstract TEXT, full_text TEXT, source_type TEXT
+            )
+        """)
+
+        batch = []
+        for record in iter_records(f, fmt):
+            stats["read"] += 1
+            row = normalize(record) if isinstance(record, dict) else None
+            if row is None:
+                stats["skipped"] += 1
+                continue
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                new_ids.extend(_copy_batch(cur, batch))
+                raw.commit()
+                stats["batches"] += 1
+                batch = []
+
+        if batch:
+            new_ids.extend(_copy_batch(cur, batch))
+            raw.commit()
+            stats["batches"] += 1
+
+        cur.execute("DROP TABLE IF EXISTS academic_sources_staging")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    stats["inserted"] = len(new_ids)
+    logger.info("Read %d records, inserted %d new sources in %d batches (%d skipped)",
+                stats["read"], stats["inserted"], stats["batches"], stats["skipped"])
+
+    if embed and new_ids:
+        embed_new_sources(new_ids)
+
+    return {**stats, "new_ids": new_ids}
+
+
+def embed_new_sources(source_ids: list):
+    """Runs the embedding backfill for just-imported sources."""
+    db = SessionLocal()
+    try:
+        embed_academic_sources(db, source_ids=source_ids)
+    finally:
+        db.close()
+
+
+def import_file(path: str, fmt: str = None, batch_size: int = IMPORT_BATCH_SIZE, embed: bool = False) -> dict:
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return import_sources(f, fmt, batch_size=batch_size, embed=embed)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import academic sources (JSON / NDJSON / CSV).")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--format", choices=["json", "ndjson", "csv"], help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--embed", action="store_true", help="Embed newly inserted sources afterwards")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    try:
+        if not os.path.exists(args.path):
+            logger.error("File not found: %s", args.path)
+            return 1
+
+        import_file(args.path, args.format, batch_size=args.batch_size, embed=args.embed)
+        return 0
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+# backend/source_passages.py
+
+# ------------------------------------------------------------
+# Passage-level index over academic_sources.full_text
+# Source embeddings only cover "title. abstract" (cut to 1000 chars), so text
+# copied from a paper's body never matched. With PLAGIARISM_SEARCH_SCOPE=passages
+# every source is split into passages, embedded per model and searched instead:
+#
+# source_passages (model_id, source_id, passage_no, start_char, end_char, embedding)
+#   passage 0        "title. abstract" (no span)
+#   passage 1..n     full_text[start_char:end_char], ~PASSAGE_MAX_TOKENS tokens
+#                    on sentence boundaries (same splitting as assignment chunks)
+# Only spans are stored, not the passage text: at tens of millions of rows the
+# table stays vectors + a few ints, and excerpts are cut from full_text on demand.
+#
+# Search: one partial HNSW index per model (PASSAGE_INDEX_TYPE, incremental, no
+# retraining as the corpus grows; built CONCURRENTLY with PASSAGE_INDEX_BUILD_MEMORY
+# and parallel workers), PASSAGE_CANDIDATES nearest passages per chunk, then the
+# best passage per source, top_k sources. The mmapped snapshot engine stays
+# source-level; passages are always searched in pgvector.
+#
+# CMD: python source_passages.py embed [--rate 5] | index [--rebuild] | status
+# ------------------------------------------------------------
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import database
+import embedding_client
+import embedding_models
+import vector_utils
+from metrics import EMBEDDING_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+PASSAGES_ENABLED = os.getenv("PLAGIARISM_SEARCH_SCOPE", "sources").lower() == "passages"
+# passages are also capped at EMBED_MAX_CHARS, see passage_spans()
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "150"))
+PASSAGE_SOURCE_BATCH_SIZE = int(os.getenv("PASSAGE_SOURCE_BATCH_SIZE", "20"))
+PASSAGE_EMBED_CONCURRENCY = int(os.getenv("PASSAGE_EMBED_CONCURRENCY", "4"))
+PASSAGE_CANDIDATES = int(os.getenv("PASSAGE_CANDIDATES", "40"))  # nearest passages per chunk before grouping
+PASSAGE_INDEX_TYPE = os.getenv("PASSAGE_INDEX_TYPE", "hnsw").lower()
+PASSAGE_INDEX_BUILD_MEMORY = os.getenv("PASSAGE_INDEX_BUILD_MEMORY", "1GB")
+PASSAGE_INDEX_BUILD_WORKERS = int(os.getenv("PASSAGE_INDEX_BUILD_WORKERS", "2"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?]) +")
+_TOKEN = re.compile(r"\S+")
+
+
+def passage_index_name(model) -> str:
+    return f"source_passages_m{int(model.id)}_idx"
+
+
+# ------------------------------------------------------------
+# Splitting
+# ------------------------------------------------------------
+def _sentence_spans(text: str):
+    start = 0
+    for boundary in _SENTENCE_END.finditer(text):
+        yield start, boundary.start()
+        start = boundary.end()
+    if start < len(text):
+        yield start, len(text)
+
+
+def passage_spans(text: str, max_tokens: int = PASSAGE_MAX_TOKENS, max_chars: int = None):
+    """
+    (start, end) character spans of ~max_tokens-token passages, packed on
+    sentence boundaries like plagiarism_utils.iter_chunks and never longer than
+    max_chars (default EMBED_MAX_CHARS, so no passage is truncated when embedded).
+    A sentence over either limit (tables, reference lists) is cut into token windows.
+    """
+    max_chars = max_chars or embedding_client.EMBED_MAX_CHARS
+    spans = []
+    current_start = current_end = None
+    token_count = 0
+    for s_start, s_end in _sentence_spans(text):
+        tokens = [m.span() for m in _TOKEN.finditer(text, s_start, s_end)]
+        if not tokens:
+            continue
+        if current_start is not None and (token_count + len(tokens) > max_tokens
+                                          or tokens[-1][1] - current_start > max_chars):
+            spans.append((current_start, current_end))
+            current_start, token_count = None, 0
+        while len(tokens) > max_tokens or tokens[-1][1] - tokens[0][0] > max_chars:
+            cut = 1
+            while cut < min(len(tokens), max_tokens) and tokens[cut][1] - tokens[0][0] <= max_chars:
+                cut += 1
+            spans.append((tokens[0][0], tokens[cut - 1][1]))
+            tokens = tokens[cut:]
+            if not tokens:
+                break
+        if not tokens:
+            continue
+        if current_start is None:
+            current_start = tokens[0][0]
+        current_end = tokens[-1][1]
+        token_count += len(tokens)
+    if current_start is not None:
+        spans.append((current_start, current_end))
+    return spans
+
+
+def source_passages(source) -> list:
+    """[(passage_no, start_char, end_char, text)] for a row with title, abstract, full_text."""
+    passages = [(0, None, None, f"{source.title}. {source.abstract or ''}")]
+    full_text = source.full_text or ""
+    for number, (start, end) in enumerate(passage_spans(full_text), start=1):
+        passages.append((number, start, end, full_text[start:end]))
+    return passages
+
+
+# ------------------------------------------------------------
+# Embedding
+# ------------------------------------------------------------
+def embed_passages(db: Session, model=None, source_ids=None, rate: float = 0,
+                   batch_size: int = PASSAGE_SOURCE_BATCH_SIZE,
+                   concurrency: int = PASSAGE_EMBED_CONCURRENCY) -> dict:
+    """
+    Splits and embeds every source without passages for `model` (default: active),
+    optionally only `source_ids`. Passages of a batch of sources are embedded
+    `concurrency` at a time and inserted together; a source is written only when
+    all of its passages embedded, so a rerun picks up the rest. `rate` caps
+    embedding calls per second (0 = no cap).
+    """
+    model = model or embedding_models.ensure_active_model(db)
+    ids_filter = "AND s.id = ANY(:ids)" if source_ids is not None else ""
+    select_missing = text(f"""
+        SELECT s.id, s.title, s.abstract, s.full_text
+        FROM academic_sources s
+        WHERE s.id > :after {ids_filter}
+          AND NOT EXISTS (SELECT 1 FROM source_passages p
+                          WHERE p.model_id = :model_id AND p.source_id = s.id AND p.passage_no = 0)
+        ORDER BY s.id
+        LIMIT :limit
+    """)
+    insert = text("""
+        INSERT INTO source_passages (model_id, source_id, passage_no, start_char, end_char, embedding)
+        VALUES (:model_id, :source_id, :passage_no, :start_char, :end_char, CAST(:embedding AS vector))
+        ON CONFLICT (model_id, source_id, passage_no) DO UPDATE SET
+            start_char = EXCLUDED.start_char, end_char = EXCLUDED.end_char, embedding = EXCLUDED.embedding
+    """)
+
+    def embed(passage_text):
+        EMBEDDING_BATCH_SIZE.labels("passages").observe(1)
+        try:
+            return embedding_client.embed_text(passage_text, stage="passage_embedding", model=model.name)
+        except Exception as e:
+            logger.debug("Passage embedding failed: %s", e, extra={"sample": True})
+            return None
+
+    stats = {"sources": 0, "passages": 0, "failed_sources": 0}
+    after = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            params = {"after": after, "model_id": model.id, "limit": batch_size}
+            if source_ids is not None:
+                params["ids"] = list(source_ids)
+            sources = db.execute(select_missing, params).fetchall()
+            db.commit()  # don't hold a snapshot open while calling the API
+            if not sources:
+                break
+
+            started = time.monotonic()
+            split = [(src.id, source_passages(src)) for src in sources]
+            vectors = iter(pool.map(embed, [p[3] for _, passages in split for p in passages]))
+
+            values = []
+            for source_id, passages in split:
+                embedded = [(p, next(vectors)) for p in passages]
+                if any(vector is None for _, vector in embedded):
+                    stats["failed_sources"] += 1
+                    logger.warning("Passage embedding failed for source %s (%s)", source_id, model.name)
+                    continue
+                values.extend(
+                    {"model_id": model.id, "source_id": source_id, "passage_no": number,
+                     "start_char": start, "end_char": end,
+                     "embedding": "[" + ",".join(map(str, vector)) + "]"}
+                    for (number, start, end, _), vector in embedded
+                )
+                stats["sources"] += 1
+
+            if values:
+                db.execute(insert, values)
+                db.commit()
+            stats["passages"] += len(values)
+            after = sources[-1].id
+            logger.debug("Embedded passages up to source %s", after, extra={"sample": True, "model": model.name})
+
+            if rate:
+                calls = sum(len(passages) for _, passages in split)
+                time.sleep(max(0.0, calls / rate - (time.monotonic() - started)))
+
+    logger.info("Embedded %d passages of %d sources with %s (%d sources failed)",
+                stats["passages"], stats["sources"], model.name, stats["failed_sources"])
+    return stats
+
+
+def coverage(db, model) -> dict:
+    row = db.execute(text("""
+        SELECT (SELECT count(*) FROM academic_sources) AS sources,
+               (SELECT count(*) FROM source_passages WHERE model_id = :model_id AND passage_no = 0) AS embedded,
+               (SELECT count(*) FROM source_passages WHERE model_id = :model_id) AS passages
+    """), {"model_id": model.id}).one()
+    ratio = row.embedded / row.sources if row.sources else 1.0
+    return {"model": model.name, "sources": row.sources, "embedded_sources": row.embedded,
+            "passages": row.passages, "coverage": round(ratio, 6)}
+
+
+def create_passage_index(model, rebuild: bool = False):
+    """
+    Partial per-model ANN index on source_passages, built without blocking inserts
+    (an invalid leftover of a failed build is dropped and rebuilt, see create_model_index).
+    """
+    embedding_models.create_model_index(
+        model, table="source_passages", name=passage_index_name(model), index_type=PASSAGE_INDEX_TYPE,
+        build_settings=(
+            f"SET maintenance_work_mem = '{PASSAGE_INDEX_BUILD_MEMORY}'",
+            f"SET max_parallel_maintenance_workers = {int(PASSAGE_INDEX_BUILD_WORKERS)}",
+        ),
+        rebuild=rebuild,
+    )
+
+
+# ------------------------------------------------------------
+# Search
+# ------------------------------------------------------------
+def passage_knn_sql(model):
+    """
+    Best passage per source among the :candidates nearest passages, top :top_k
+    sources (params: embedding, candidates, top_k).
+    """
+    dim = int(model.dim)
+    distance = f"{model.vector_expr} <=> CAST(:embedding AS vector({dim}))"
+    return text(f"""
+        SELECT s.id, s.title, b.passage_no, 1 - b.distance AS similarity,
+               CASE WHEN b.start_char IS NULL THEN left(s.abstract, 200)
+                    ELSE substr(s.full_text, b.start_char + 1, least(b.end_char - b.start_char, 200))
+               END AS excerpt
+        FROM (
+            SELECT DISTINCT ON (c.source_id) c.source_id, c.passage_no, c.start_char, c.end_char, c.distance
+            FROM (
+                SELECT source_id, passage_no, start_char, end_char, {distance} AS distance
+                FROM source_passages
+                WHERE model_id = {int(model.id)}
+                ORDER BY {distance}
+                LIMIT :candidates
+            ) c
+            ORDER BY c.source_id, c.distance
+        ) b
+        JOIN academic_sources s ON s.id = b.source_id
+        ORDER BY b.distance
+        LIMIT :top_k
+    """)
+
+
+def passage_searcher(db: Session, model=None, candidates: int = PASSAGE_CANDIDATES):
+    """
+    search(embedding, top_k) over passages (same contract as
+    plagiarism_utils.pgvector_searcher); rows also carry .passage_no and .excerpt.
+    """
+    model = model or embedding_models.active_model(db)
+    if model is None:
+        return lambda embedding, top_k: []
+
+    vector_utils.apply_search_settings(db)
+    if PASSAGE_INDEX_TYPE == "hnsw":
+        # an HNSW scan returns at most ef_search rows
+        ef_search = max(int(vector_utils.HNSW_EF_SEARCH or 40), candidates)
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+    knn_sql = passage_knn_sql(model)
+
+    def search(embedding, top_k: int):
+        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+        return db.execute(
+            knn_sql, {"embedding": embedding_str, "candidates": max(candidates, top_k), "top_k": top_k}
+        ).fetchall()
+    return search
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    import json
+    from logging_utils import setup_logging, shutdown_logging
+
+    parser = argparse.ArgumentParser(description="Passage-level source index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    embed_cmd = commands.add_parser("embed", help="Split and embed sources without passages")
+    embed_cmd.add_argument("--model", help="embedding model (default: the active one)")
+    embed_cmd.add_argument("--rate", type=float, default=0, help="embedding calls per second")
+    embed_cmd.add_argument("--concurrency", type=int, default=PASSAGE_EMBED_CONCURRENCY)
+    index_cmd = commands.add_parser("index", help="Build the active model's passage index")
+    index_cmd.add_argument("--rebuild", action="store_true")
+    commands.add_parser("status")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    db = database.SessionLocal()
+    try:
+        if args.command == "embed":
+            model = embedding_models.get_model(db, args.model) if args.model else None
+            if args.model and model is None:
+                logger.error("Unknown embedding model %s", args.model)
+                return 1
+            print(json.dumps(embed_passages(db, model, rate=args.rate, concurrency=args.concurrency), indent=2))
+            return 0
+
+        model = embedding_models.active_model(db)
+        if model is None:
+            logger.error("No active embedding model yet")
+            return 1
+        if args.command == "index":
+            create_passage_index(model, rebuild=args.rebuild)
+        else:
+            print(json.dumps(coverage(db, model), indent=2))
+        return 0
+    finally:
+        db.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
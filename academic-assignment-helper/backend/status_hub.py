@@ -0,0 +1,196 @@
+# backend/status_hub.py
+
+# ------------------------------------------------------------
+# Push-based analysis status
+# Background jobs publish stage events (extracting, embedding with chunk
+# progress, analyzing, done, failed); long-poll and WebSocket endpoints
+# in routes_analysis wait on them instead of clients polling the DB.
+#
+# STATUS_BACKEND=memory   -> in-process pub/sub (single worker)
+# STATUS_BACKEND=postgres -> events go through Postgres NOTIFY and every
+#                            worker LISTENs, so any worker can answer
+# ------------------------------------------------------------
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+import database
+from cache_utils import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+STATUS_BACKEND = os.getenv("STATUS_BACKEND", "memory").lower()
+STATUS_CHANNEL = "analysis_status"
+STATUS_RETENTION_SECONDS = float(os.getenv("STATUS_RETENTION_SECONDS", "3600"))
+STATUS_MAX_ENTRIES = int(os.getenv("STATUS_MAX_ENTRIES", "10000"))
+STATUS_LISTEN_RETRY_SECONDS = 5
+
+STAGE_EXTRACTING = "extracting"
+STAGE_EMBEDDING = "embedding"
+STAGE_ANALYZING = "analyzing"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+FINAL_STAGES = (STAGE_DONE, STAGE_FAILED)
+
+# assignment_id -> latest event
+_latest = TTLCache(STATUS_MAX_ENTRIES)
+# assignment_id -> set of asyncio.Future waiting for the next event
+_waiters = {}
+_loop = None
+_lock = threading.Lock()
+
+
+# ------------------------------------------------------------
+# Publishing (safe from background threads)
+# ------------------------------------------------------------
+def publish(assignment_id: int, stage: str, **fields):
+    """Publishes a stage event for an assignment. Never raises."""
+    event = {
+        "assignment_id": assignment_id,
+        "stage": stage,
+        "seq": time.time_ns(),  # clients resume with ?since=<seq>
+        **fields,
+    }
+    try:
+        if STATUS_BACKEND == "postgres":
+            # delivered back to this worker too, through its listener
+            with database.engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": STATUS_CHANNEL, "payload": json.dumps(event)})
+        else:
+            _dispatch(event)
+    except Exception as e:
+        logger.warning("Failed to publish %s for assignment_id=%s: %s", stage, assignment_id, e)
+
+
+def progress_publisher(assignment_id: int, every: int = 1):
+    """Returns a detect_plagiarism progress callback publishing 'embedding' events."""
+    def _progress(done: int, total):
+        if done % every == 0 or done == total:
+            publish(assignment_id, STAGE_EMBEDDING, chunks_done=done, chunks_total=total)
+    return _progress
+
+
+def _dispatch(event: dict):
+    _latest.set(event["assignment_id"], event, STATUS_RETENTION_SECONDS)
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        _wake(event)
+    else:
+        loop.call_soon_threadsafe(_wake, event)
+
+
+def _wake(event: dict):
+    with _lock:
+        futures = _waiters.pop(event["assignment_id"], set())
+    for fut in futures:
+        if not fut.done():
+            fut.set_result(event)
+
+
+# ------------------------------------------------------------
+# Subscribing
+# ------------------------------------------------------------
+def latest(assignment_id: int):
+    """Last event seen by this worker (None if unknown or expired)."""
+    return _latest.get(assignment_id)
+
+
+async def wait_for_event(assignment_id: int, since: int = 0, timeout: float = 25.0):
+    """
+    Returns the latest event newer than `since`, waiting up to `timeout`
+    seconds for one to arrive. Returns None on timeout.
+    """
+    current = latest(assignment_id)
+    if current and current["seq"] > since:
+        return current
+
+    fut = asyncio.get_running_loop().create_future()
+    with _lock:
+        _waiters.setdefault(assignment_id, set()).add(fut)
+
+    # an event may have landed between the check above and registering
+    current = latest(assignment_id)
+    if current and current["seq"] > since:
+        _discard(assignment_id, fut)
+        return current
+
+    try:
+        return await asyncio.wait_for(fut, timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        _discard(assignment_id, fut)
+
+
+def _discard(assignment_id: int, fut):
+    with _lock:
+        waiters = _waiters.get(assignment_id)
+        if waiters is not None:
+            waiters.discard(fut)
+            if not waiters:
+                del _waiters[assignment_id]
+
+
+# ------------------------------------------------------------
+# Lifecycle (called from main.lifespan)
+# ------------------------------------------------------------
+async def run_status_hub(stop: asyncio.Event):
+    """Binds the hub to the app loop; with the postgres backend also LISTENs."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    logger.info("Status hub started (backend=%s)", STATUS_BACKEND)
+
+    if STATUS_BACKEND != "postgres":
+        await stop.wait()
+        return
+
+    import asyncpg
+
+    dsn = database.ASYNC_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+    def _on_notify(connection, pid, channel, payload):
+        try:
+            _dispatch(json.loads(payload))
+        except Exception as e:
+            logger.warning("Bad notification payload: %s", e)
+
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(STATUS_CHANNEL, _on_notify)
+            logger.info("Listening on '%s'", STATUS_CHANNEL)
+            # wake up periodically to notice a dropped connection
+            while not stop.is_set() and not conn.is_closed():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=STATUS_LISTEN_RETRY_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            if not stop.is_set():
+                logger.warning("Listener connection lost; reconnecting")
+        except Exception as e:
+            logger.warning("Listener error: %s; retrying in %ss", e, STATUS_LISTEN_RETRY_SECONDS)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=STATUS_LISTEN_RETRY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            if conn is not None:
+                await conn.close()
+    logger.info("Status hub stopped")
@@ -0,0 +1,328 @@
+# backend/storage_utils.py
+
+# ------------------------------------------------------------
+# Content-addressed storage for uploaded assignments
+# Files are hashed (SHA-256) while they are written and stored as
+# data/uploads/<sha256><ext>, so identical uploads share one file
+# and same-named uploads can no longer overwrite each other.
+# Also holds the on-disk state of resumable (chunked) upload sessions,
+# which expire after UPLOAD_SESSION_TTL_SECONDS without a chunk.
+# ------------------------------------------------------------
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import asyncio
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+
+UPLOAD_DIR = "data/uploads"
+SESSION_DIR = os.path.join(UPLOAD_DIR, ".sessions")
+COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))             # 50 MiB
+MAX_RESUMABLE_UPLOAD_BYTES = int(os.getenv("MAX_RESUMABLE_UPLOAD_BYTES", str(500 * 1024 * 1024)))  # 500 MiB
+MAX_OPEN_UPLOAD_SESSIONS = int(os.getenv("MAX_OPEN_UPLOAD_SESSIONS", "3"))          # per student
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_SESSION_SWEEP_SECONDS = float(os.getenv("UPLOAD_SESSION_SWEEP_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(SESSION_DIR, exist_ok=True)
+
+
+class UploadTooLargeError(Exception):
+    """Raised while streaming once an upload exceeds its size cap."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+class UploadSessionBusyError(Exception):
+    """Raised when another request is already writing to (or completing) a session."""
+
+
+class UploadSessionLimitError(Exception):
+    """Raised when a student already has MAX_OPEN_UPLOAD_SESSIONS open sessions."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"At most {limit} open upload sessions per student")
+        self.limit = limit
+
+
+class UploadOffsetMismatchError(Exception):
+    """Raised when a chunk does not start at the session's current offset."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Session is at offset {offset}")
+        self.offset = offset
+
+
+def stored_path(stored_filename: str) -> str:
+    """Path of a stored upload (n8n sees the same file under /app/data/uploads)."""
+    return os.path.join(UPLOAD_DIR, stored_filename)
+
+
+def _finalize(tmp_path: str, sha256, ext: str):
+    """Moves a fully written temp file to its content-addressed name."""
+    content_hash = sha256.hexdigest()
+    stored_filename = f"{content_hash}{ext.lower()}"
+    final_path = stored_path(stored_filename)
+
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+    return content_hash, stored_filename
+
+
+def save_content_addressed(src, ext: str, max_bytes: int = None):
+    """
+    Streams a file object to disk while computing its SHA-256.
+    Returns (content_hash, stored_filename, size_in_bytes).
+    If the same content is already stored, the new copy is discarded.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                sha256.update(chunk)
+                buffer.write(chunk)
+
+        return (*_finalize(tmp_path, sha256, ext), size)
+
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+async def save_stream_content_addressed(chunks, ext: str, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Async variant of save_content_addressed for an async iterator of byte chunks
+    (e.g. request.stream()). The size cap is enforced while streaming, so an
+    oversized body is rejected without being written to disk in full.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                sha256.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+
+        return (*_finalize(tmp_path, sha256, ext), size)
+
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ------------------------------------------------------------
+# Resumable upload sessions
+# <SESSION_DIR>/<upload_id>.json  -> metadata (owner, filename, total_size, created_at)
+# <SESSION_DIR>/<upload_id>.part  -> bytes received so far (its size = offset,
+#                                    its mtime = last chunk)
+# ------------------------------------------------------------
+def _session_paths(upload_id: str):
+    return (
+        os.path.join(SESSION_DIR, f"{upload_id}.json"),
+        os.path.join(SESSION_DIR, f"{upload_id}.part"),
+    )
+
+
+def _read_session(upload_id: str):
+    """Session metadata + offset, or None if unknown or expired."""
+    meta_path, part_path = _session_paths(upload_id)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        part = os.stat(part_path)
+    except (FileNotFoundError, ValueError):
+        return None
+    last_activity = max(meta.get("created_at", 0), part.st_mtime)
+    if time.time() - last_activity > UPLOAD_SESSION_TTL_SECONDS:
+        return None
+    return {**meta, "offset": part.st_size}
+
+
+def _session_ids():
+    return {name.rsplit(".", 1)[0] for name in os.listdir(SESSION_DIR)
+            if name.endswith((".json", ".part"))}
+
+
+@contextmanager
+def _sessions_lock():
+    # serialises session creation and the sweep across requests and workers
+    with open(os.path.join(SESSION_DIR, ".sessions.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def create_upload_session(student_id: int, filename: str, total_size: int) -> dict:
+    """
+    Creates a session, or raises UploadSessionLimitError if the student already
+    has MAX_OPEN_UPLOAD_SESSIONS unexpired ones (abandoned sessions reserve disk).
+    """
+    with _sessions_lock():
+        open_sessions = sum(
+            1 for upload_id in _session_ids()
+            if (session := _read_session(upload_id)) and session["student_id"] == student_id
+        )
+        if open_sessions >= MAX_OPEN_UPLOAD_SESSIONS:
+            raise UploadSessionLimitError(MAX_OPEN_UPLOAD_SESSIONS)
+
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = _session_paths(upload_id)
+        meta = {
+            "upload_id": upload_id,
+            "student_id": student_id,
+            "filename": filename,
+            "total_size": total_size,
+            "created_at": time.time(),
+        }
+        open(part_path, "wb").close()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    return {**meta, "offset": 0}
+
+
+def get_upload_session(upload_id: str):
+    """Returns session metadata + current offset, or None if unknown or expired."""
+    if not upload_id.isalnum():
+        return None
+    return _read_session(upload_id)
+
+
+def _lock_session(buffer):
+    # one writer per session; a concurrent retry of the same chunk gets a 409, not interleaved bytes
+    try:
+        fcntl.flock(buffer, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadSessionBusyError()
+
+
+async def append_upload_chunk(session: dict, chunks, offset: int) -> int:
+    """
+    Writes streamed bytes to a session's .part file starting at `offset`,
+    never past total_size. The offset check and the write happen under an
+    exclusive lock on the .part file. Returns the new offset.
+    """
+    _, part_path = _session_paths(session["upload_id"])
+    limit = session["total_size"]
+
+    with open(part_path, "r+b") as buffer:
+        _lock_session(buffer)
+        current = os.fstat(buffer.fileno()).st_size
+        if offset != current:
+            raise UploadOffsetMismatchError(current)
+
+        buffer.seek(offset)
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if offset + len(chunk) > limit:
+                    raise UploadTooLargeError(limit)
+                await asyncio.to_thread(buffer.write, chunk)
+                offset += len(chunk)
+        finally:
+            buffer.flush()
+            # A partially written request is truncated back to what was acknowledged
+            buffer.truncate(offset)
+
+    return offset
+
+
+def complete_upload_session(session: dict, ext: str):
+    """
+    Hashes the assembled .part file, moves it into content-addressed storage
+    and removes the session. Returns (content_hash, stored_filename, size).
+    """
+    meta_path, part_path = _session_paths(session["upload_id"])
+
+    sha256 = hashlib.sha256()
+    with open(part_path, "rb") as f:
+        # no chunk may be written while the file is hashed and moved
+        _lock_session(f)
+        size = os.fstat(f.fileno()).st_size
+        if size != session["total_size"]:
+            raise UploadOffsetMismatchError(size)
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha256.update(chunk)
+        result = _finalize(part_path, sha256, ext)
+    delete_upload_session(session["upload_id"])
+    return (*result, size)
+
+
+def delete_upload_session(upload_id: str):
+    for path in _session_paths(upload_id):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def sweep_upload_sessions() -> int:
+    """
+    Deletes expired sessions (and half-created or half-deleted .json/.part pairs).
+    A session with a chunk being written right now is skipped. Returns the count.
+    """
+    removed = 0
+    with _sessions_lock():
+        for upload_id in _session_ids():
+            if _read_session(upload_id) is not None:
+                continue
+            _, part_path = _session_paths(upload_id)
+            try:
+                with open(part_path, "r+b") as buffer:
+                    _lock_session(buffer)
+                    delete_upload_session(upload_id)
+            except UploadSessionBusyError:
+                continue
+            except FileNotFoundError:
+                delete_upload_session(upload_id)
+            removed += 1
+    if removed:
+        logger.info("Removed %d expired upload sessions", removed)
+    return removed
+
+
+async def run_upload_sweeper(stop: asyncio.Event):
+    """Background loop started from main.lifespan (once at startup, then every UPLOAD_SESSION_SWEEP_SECONDS)."""
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(sweep_upload_sessions)
+        except Exception as e:
+            logger.exception("Upload session sweep failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=UPLOAD_SESSION_SWEEP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
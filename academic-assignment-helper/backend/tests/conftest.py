@@ -0,0 +1,8 @@
+# backend/tests/conftest.py
+# Unit tests for pure helpers (no database or embedding API needed).
+# CMD: cd backend && python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+# backend/tests/test_corpus_snapshot.py
+# Round trip: rows -> shard files -> binary COPY streams -> decoded rows.
+
+import struct
+
+import numpy as np
+
+import corpus_snapshot
+
+DIM = 3
+
+ROWS = [
+    (1, "Deep Learning", "LeCun, Bengio", 2015, "Abstract one", "Full text één", "journal", "[0.5,-1.25,3]"),
+    (2, "No vector", None, None, None, None, None, None),
+    (7, "", "Smith", 1999, "", "x" * 1000, "book", "[1e-07,0,-2.5]"),
+]
+
+
+def _read_fields(data: bytes):
+    """Decodes a PostgreSQL binary COPY stream into tuples of raw field bytes (None = NULL)."""
+    assert data.startswith(corpus_snapshot.PGCOPY_HEADER)
+    pos = len(corpus_snapshot.PGCOPY_HEADER)
+    tuples = []
+    while True:
+        (count,) = struct.unpack_from(">h", data, pos)
+        pos += 2
+        if count == -1:
+            break
+        fields = []
+        for _ in range(count):
+            (length,) = struct.unpack_from(">i", data, pos)
+            pos += 4
+            if length == -1:
+                fields.append(None)
+                continue
+            fields.append(data[pos:pos + length])
+            pos += length
+        tuples.append(fields)
+    assert pos == len(data), "trailing bytes after the COPY trailer"
+    return tuples
+
+
+def _int4(field):
+    return struct.unpack(">i", field)[0]
+
+
+def _vector(field):
+    # pgvector vector_recv: int16 dim, int16 unused, dim x float4 (big endian)
+    dim, unused = struct.unpack_from(">HH", field)
+    assert unused == 0
+    assert len(field) == 4 + 4 * dim
+    return list(struct.unpack_from(f">{dim}f", field, 4))
+
+
+def test_binary_copy_round_trip(tmp_path):
+    shard = tmp_path / "shard-0000"
+    corpus_snapshot._write_shard(str(shard), ROWS, DIM)
+
+    sources, embeddings = corpus_snapshot._binary_copy_buffers(str(shard), DIM, model_id=42)
+    source_rows = _read_fields(sources.getvalue())
+    embedding_rows = _read_fields(embeddings.getvalue())
+
+    assert len(source_rows) == len(ROWS)
+    for fields, row in zip(source_rows, ROWS):
+        assert len(fields) == len(corpus_snapshot.SOURCE_COLUMNS)
+        decoded = dict(zip(corpus_snapshot.SOURCE_COLUMNS, fields))
+        expected = dict(zip(corpus_snapshot.COPY_COLUMNS, row))
+        assert _int4(decoded["id"]) == expected["id"]
+        year = decoded["publication_year"]
+        assert (None if year is None else _int4(year)) == expected["publication_year"]
+        for column in corpus_snapshot.TEXT_COLUMNS:
+            value = decoded[column]
+            assert (None if value is None else value.decode("utf-8")) == expected[column]
+
+    embedded = [row for row in ROWS if row[-1] is not None]
+    assert len(embedding_rows) == len(embedded)
+    for (model_id, source_id, vector), row in zip(embedding_rows, embedded):
+        assert _int4(model_id) == 42
+        assert _int4(source_id) == row[0]
+        expected = np.array(row[-1][1:-1].split(","), dtype=np.float32)
+        assert np.array_equal(np.array(_vector(vector), dtype=np.float32), expected)
@@ -0,0 +1,87 @@
+# backend/tests/test_source_passages.py
+# passage_spans(): sentence packing, long-sentence windows, the character cap,
+# and span offsets matching what passage_knn_sql cuts out of full_text.
+
+import re
+from types import SimpleNamespace
+
+import source_passages
+from source_passages import passage_spans
+
+TOKEN = re.compile(r"\S+")
+
+
+def _tokens(text):
+    return TOKEN.findall(text)
+
+
+def _check_invariants(text, spans, max_tokens, max_chars):
+    # spans are ordered, non-overlapping and start/end on a token
+    assert spans == sorted(spans)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        assert prev_end <= start
+    for start, end in spans:
+        passage = text[start:end]
+        assert passage == passage.strip() and passage
+        assert len(_tokens(passage)) <= max_tokens
+        assert end - start <= max_chars or len(_tokens(passage)) == 1
+    # every token ends up in exactly one passage, in order
+    assert [t for start, end in spans for t in _tokens(text[start:end])] == _tokens(text)
+
+
+def test_sentences_are_packed_up_to_max_tokens():
+    text = " ".join(f"Sentence number {i} has six tokens." for i in range(20))
+    spans = passage_spans(text, max_tokens=20, max_chars=10_000)
+    _check_invariants(text, spans, 20, 10_000)
+    # three 6-token sentences fit into 20 tokens, a fourth would not
+    assert [len(_tokens(text[s:e])) for s, e in spans][:-1] == [18] * (len(spans) - 1)
+    # passages break on sentence boundaries
+    assert all(text[s:e].endswith(".") for s, e in spans)
+
+
+def test_long_sentence_is_cut_into_token_windows():
+    text = "Intro sentence here. " + " ".join(f"w{i}" for i in range(500)) + ". Tail sentence."
+    spans = passage_spans(text, max_tokens=150, max_chars=100_000)
+    _check_invariants(text, spans, 150, 100_000)
+    assert max(len(_tokens(text[s:e])) for s, e in spans) == 150
+
+
+def test_passages_are_capped_at_max_chars():
+    text = " ".join("supercalifragilistic" for _ in range(200)) + "."
+    spans = passage_spans(text, max_tokens=150, max_chars=100)
+    _check_invariants(text, spans, 150, 100)
+    assert len(spans) > 1
+
+
+def test_default_cap_is_embed_max_chars():
+    text = " ".join("x" * 40 for _ in range(2000))
+    spans = passage_spans(text, max_tokens=10_000)
+    cap = source_passages.embedding_client.EMBED_MAX_CHARS
+    _check_invariants(text, spans, 10_000, cap)
+
+
+def test_token_longer_than_max_chars_gets_its_own_passage():
+    text = "short one. " + "y" * 300 + " after."
+    spans = passage_spans(text, max_tokens=150, max_chars=50)
+    _check_invariants(text, spans, 150, 50)
+    assert ("y" * 300) in [text[s:e] for s, e in spans]
+
+
+def test_empty_and_blank_text():
+    assert passage_spans("") == []
+    assert passage_spans("   \n  ") == []
+
+
+def test_spans_match_stored_excerpts():
+    full_text = ("Résumé des données. Ça marche très bien! " * 30) + "Ünïcödé tail without a stop"
+    source = SimpleNamespace(title="T", abstract="A", full_text=full_text)
+    passages = source_passages.source_passages(source)
+
+    assert passages[0] == (0, None, None, "T. A")
+    for number, start, end, passage in passages[1:]:
+        assert full_text[start:end] == passage
+        # passage_knn_sql: substr(full_text, start_char + 1, least(end_char - start_char, 200))
+        # (1-based, counted in characters like Python str indices)
+        excerpt = full_text[start:start + min(end - start, 200)]
+        assert excerpt == passage[:200]
+    assert [p[0] for p in passages] == list(range(len(passages)))
@@ -0,0 +1,51 @@
+# backend/text_store.py
+
+# ------------------------------------------------------------
+# Compression for extracted assignment text
+# The full text lives in assignment_texts (one row per assignment,
+# loaded lazily), compressed with zstd when the zstandard package is
+# available and with zlib otherwise. Each row records its codec, so
+# rows written with either codec (or uncompressed) stay readable.
+# ------------------------------------------------------------
+
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: fall back to zlib
+    zstandard = None
+
+CODEC_RAW = "raw"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+TEXT_ZSTD_LEVEL = int(os.getenv("TEXT_ZSTD_LEVEL", "6"))
+TEXT_ZLIB_LEVEL = int(os.getenv("TEXT_ZLIB_LEVEL", "6"))
+TEXT_COMPRESSION_MIN_BYTES = int(os.getenv("TEXT_COMPRESSION_MIN_BYTES", "512"))  # smaller texts stay raw
+
+
+def compress_text(text: str):
+    """Returns (codec, data, raw_size) for a piece of text."""
+    raw = text.encode("utf-8")
+    if len(raw) < TEXT_COMPRESSION_MIN_BYTES:
+        return CODEC_RAW, raw, len(raw)
+    if zstandard is not None:
+        # compressor objects are not thread-safe; they are cheap to create
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=TEXT_ZSTD_LEVEL).compress(raw), len(raw)
+    return CODEC_ZLIB, zlib.compress(raw, TEXT_ZLIB_LEVEL), len(raw)
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    data = bytes(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed assignment text")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == CODEC_ZLIB:
+        raw = zlib.decompress(data)
+    elif codec == CODEC_RAW:
+        raw = data
+    else:
+        raise ValueError(f"Unknown text codec: {codec}")
+    return raw.decode("utf-8")
@@ -0,0 +1,98 @@
+# backend/vector_index.py
+
+# ------------------------------------------------------------
+# In-process exact cosine search over source embeddings
+# Vectors are L2-normalised once into a float32 matrix, so a query is a
+# single matrix-vector product + argpartition (no per-query Postgres trip).
+# search() has the same signature as plagiarism_utils.pgvector_searcher,
+# so it can be passed to detect_plagiarism(searcher=...).
+# ------------------------------------------------------------
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SourceMatch = namedtuple("SourceMatch", ["id", "title", "similarity"])
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class InMemoryIndex:
+    """
+    Exact top-k cosine search. `ids` and `titles` are parallel to the rows of
+    `embeddings`; `titles` may be any indexable (e.g. a lazy sequence).
+    """
+
+    def __init__(self, ids, embeddings, titles=None, normalized: bool = False):
+        self.ids = np.asarray(ids)
+        self.matrix = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+        self.titles = titles
+        if len(self.ids) != len(self.matrix):
+            raise ValueError("ids and embeddings must have the same length")
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_db(cls, db: Session, batch_size: int = 10000):
+        """Loads every source embedded by the active model (streamed in batches)."""
+        ids, titles, vectors = [], [], []
+        result = db.execute(text("""
+            SELECT s.id, s.title, e.embedding
+            FROM source_embeddings e
+            JOIN embedding_models m ON m.id = e.model_id AND m.status = 'active'
+            JOIN academic_sources s ON s.id = e.source_id
+            ORDER BY e.source_id
+        """))
+        for batch in result.yield_per(batch_size).partitions():
+            for row in batch:
+                embedding = row.embedding
+                if isinstance(embedding, str):  # no pgvector adapter on this connection
+                    embedding = np.fromstring(embedding.strip("[]"), sep=",", dtype=np.float32)
+                ids.append(row.id)
+                titles.append(row.title)
+                vectors.append(np.asarray(embedding, dtype=np.float32))
+        logger.info("Loaded %d source embeddings into memory", len(ids))
+        if not vectors:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), [], normalized=True)
+        return cls(ids, np.vstack(vectors), titles)
+
+    def top_k(self, queries, top_k: int):
+        """
+        Batched search: returns (row_indices, similarities), both shaped
+        (n_queries, k) and sorted by descending similarity.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        k = min(top_k, len(self.matrix))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        scores = queries @ self.matrix.T
+        if k < scores.shape[1]:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def search(self, embedding, top_k: int):
+        rows, sims = self.top_k(embedding, top_k)
+        return [
+            SourceMatch(
+                id=int(self.ids[row]),
+                title=self.titles[row] if self.titles is not None else None,
+                similarity=float(sim),
+            )
+            for row, sim in zip(rows[0], sims[0])
+        ]
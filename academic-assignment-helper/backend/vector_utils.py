@@ -1,86 +1,116 @@
 # backend/vector_utils.py
 
 import os
-import time
+import logging
 import numpy as np
-from huggingface_hub import InferenceClient
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-import models
+import embedding_client
+import embedding_models
+import embedding_snapshot
+import source_passages
 
 load_dotenv()
 
-HF_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
-EMBED_MODEL = os.getenv("HUGGINGFACE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+logger = logging.getLogger(__name__)
 
-client = InferenceClient(api_key=HF_API_KEY)
+# ANN index per embedding model on source_embeddings (see embedding_models.py); pick values with benchmarks/vector_recall.py
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "ivfflat").lower()  # ivfflat | hnsw | none (exact)
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+# query-time knobs; unset keeps the server default (probes=1, ef_search=40)
+IVFFLAT_PROBES = os.getenv("IVFFLAT_PROBES")
+HNSW_EF_SEARCH = os.getenv("HNSW_EF_SEARCH")
 
 # --------------------------------------------------------
 # ማን! this part lay malet nw. . . Embedding Generate yadergal malet nw
 # -------------------------------------------------------- 
-def get_embedding(text: str, retries=3):
+def get_embedding(text: str, retries=3, model: str = None, stage: str = "source_embedding"):
     """
     I'm trying to generate text embedding using Hugging Face InferenceClient (eza aza yehone sitachew lay nef interface ale shufew).
     Keza malet nw 384D vector malet nw python list return yaregal malet nw. ማን! 768D kefelek all-mpnet-base-v2 shof shof adrgat.
     """
-    for attempt in range(retries):
-        try:
-            result = client.feature_extraction(text[:1000], model=EMBED_MODEL)
-            if isinstance(result, list) and isinstance(result[0], list):
-                return result[0]
-            elif isinstance(result, np.ndarray):
-                return result.tolist()
-            return result
-        except Exception as e:
-            print(f"[VECTOR_UTILS] Retry {attempt+1}/{retries} due to {e}")
-            time.sleep(2)
-    raise RuntimeError("Failed to generate embedding after retries")
+    return embedding_client.embed_text(text, retries, stage=stage, model=model)
 
 
 # --------------------------------------------------------
 # ማን! eziga bachru Academic Sources  Embed yadergal malet nw, ያው for the missing ones
 # --------------------------------------------------------
-def embed_academic_sources(db: Session):
+def embed_academic_sources(db: Session, source_ids=None):
     """
-    Generate embeddings for academic sources missing one.
+    Generate embeddings (active model) for academic sources missing one
+    (optionally restricted to `source_ids`, e.g. rows just imported).
     """
-    sources = db.query(models.AcademicSource).filter(models.AcademicSource.embedding == None).all()
-    print(f"[VECTOR_UTILS] Found {len(sources)} sources needing embeddings.")
+    model = embedding_models.ensure_active_model(db)
+    stats = embedding_models.embed_missing(db, model, source_ids=source_ids)
+    embedded = stats["embedded"]
+    logger.info("Embedded %d sources with %s (%d failed)", embedded, model.name, stats["failed"])
+    if source_passages.PASSAGES_ENABLED:
+        source_passages.embed_passages(db, model, source_ids=source_ids)
 
-    for src in sources:
+    # API workers pick up the new version within EMBEDDING_SNAPSHOT_CHECK_SECONDS
+    if embedded and embedding_snapshot.SNAPSHOT_ENABLED:
         try:
-            text = f"{src.title}. {src.abstract or ''}"
-            embedding = get_embedding(text)
-            if isinstance(embedding, np.ndarray):
-                embedding = embedding.tolist()
-            src.embedding = embedding
-            db.commit()
-            print(f"[VECTOR_UTILS] Embedded: {src.title}")
+            embedding_snapshot.export_snapshot(db)
         except Exception as e:
-            db.rollback()
-            print(f"[VECTOR_UTILS] Failed for {src.id}: {e}")
+            logger.error("Embedding snapshot export failed: %s", e)
 
 
 # --------------------------------------------------------
 #  Fam echi demo shof sinaregat  Vector Index creation neger nat, similarity searchuwan mela yadergal malet nw
 # --------------------------------------------------------
-def index_academic_sources(db: Session):
+def vector_index_ddl(table: str, name: str, index_type: str = VECTOR_INDEX_TYPE,
+                     lists: int = IVFFLAT_LISTS, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                     column: str = "embedding", where: str = None) -> str:
+    """
+    CREATE INDEX statement for the configured index type (None for exact search).
+    `column` may be an expression (e.g. embedding::vector(384)), `where` makes it partial.
+    """
+    key = column if column.isidentifier() else f"({column})"
+    if index_type == "ivfflat":
+        method = f"ivfflat ({key} vector_cosine_ops) WITH (lists = {int(lists)})"
+    elif index_type == "hnsw":
+        method = f"hnsw ({key} vector_cosine_ops) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    elif index_type == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {index_type}")
+    ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method}"
+    return f"{ddl} WHERE {where}" if where else ddl
+
+
+def apply_search_settings(db: Session, probes=IVFFLAT_PROBES, ef_search=HNSW_EF_SEARCH):
+    """SET LOCAL the ANN query knobs for the current transaction (no-op when unset)."""
+    if probes:
+        db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    if ef_search:
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+
+
+def index_academic_sources(db: Session, rebuild: bool = False) -> bool:
     """
-    Create pgvector index for similarity search if it doesn't exist.
+    Create the active model's pgvector index for similarity search if it doesn't exist
+    (VECTOR_INDEX_TYPE / IVFFLAT_LISTS / HNSW_M / HNSW_EF_CONSTRUCTION); False if the build failed.
+    `rebuild` drops the existing index first, e.g. after changing parameters
+    (python embedding_models.py index --rebuild; not exposed over HTTP).
     """
     try:
-        db.execute(text("""
-            CREATE INDEX IF NOT EXISTS academic_sources_embedding_idx
-            ON academic_sources
-            USING ivfflat (embedding vector_cosine_ops)
-            WITH (lists = 100);
-        """))
+        model = embedding_models.active_model(db)
         db.commit()
-        print("[VECTOR_UTILS] Vector index created or already exists.")
+        if model is None:
+            logger.info("No embedded sources yet; nothing to index")
+            return True
+        embedding_models.create_model_index(model, rebuild=rebuild)
+        if source_passages.PASSAGES_ENABLED:
+            source_passages.create_passage_index(model, rebuild=rebuild)
+        logger.info("Vector index (%s) created or already exists", VECTOR_INDEX_TYPE)
+        return True
     except Exception as e:
         db.rollback()
-        print(f"[VECTOR_UTILS] Failed to create index: {e}")
+        logger.error("Failed to create vector index: %s", e)
+        return False
 
 
 # --------------------------------------------------------
@@ -88,40 +118,33 @@ def index_academic_sources(db: Session):
 # --------------------------------------------------------
 def search_similar_sources(db: Session, query_text: str, top_k: int = 5):
     """
-    Perform semantic similarity search using pgvector.
+    Perform semantic similarity search using pgvector (active embedding model).
     """
     try:
-        query_embedding = get_embedding(query_text)
+        model = embedding_models.active_model(db)
+        if model is None:
+            return []
+        # timed apart from corpus embedding, so query latency doesn't skew "source_embedding"
+        query_embedding = get_embedding(query_text, model=model.name, stage="query_embedding")
         if isinstance(query_embedding, np.ndarray):
             query_embedding = query_embedding.tolist()
 
-        # Use psycopg2 connection directly for proper vector handling
-        connection = db.connection()
-        cur = connection.cursor()
-        
+        apply_search_settings(db)
+
         embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
-        
-        sql = """
-            SELECT id, title, abstract,
-                   1 - (embedding <=> %s::vector) AS similarity
-            FROM academic_sources
-            WHERE embedding IS NOT NULL
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s;
-        """
-        
-        cur.execute(sql, (embedding_str, embedding_str, top_k))
-        rows = cur.fetchall()
-        
+        rows = db.execute(
+            embedding_models.knn_sql(model), {"embedding": embedding_str, "top_k": top_k}
+        ).fetchall()
+
         return [
             {
-                "id": r[0],
-                "title": r[1],
-                "abstract": r[2],
-                "similarity": round(float(r[3]), 4),
+                "id": r.id,
+                "title": r.title,
+                "abstract": r.abstract,
+                "similarity": round(float(r.similarity), 4),
             }
             for r in rows
         ]
     except Exception as e:
-        print(f"[VECTOR_UTILS] Search failed: {e}")
-        return []
\ No newline at end of file
+        logger.error("Similarity search failed: %s", e)
+        return []
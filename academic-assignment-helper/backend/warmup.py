@@ -0,0 +1,145 @@
+# backend/warmup.py
+
+# ------------------------------------------------------------
+# Startup warmup + readiness
+# The lifespan starts run_warmup() in the background, so the process is
+# live (GET /health/live) immediately and ready (GET /health/ready) once:
+# - WARMUP_DB_CONNECTIONS connections (at most each pool's size) are open in both pools
+# - the shared embedding client exists (and, with WARMUP_EMBEDDING=true,
+#   one embedding round trip primed DNS/TLS/the HF model)
+# - the embedding snapshot is mapped (PLAGIARISM_SEARCH_ENGINE=snapshot) and
+#   any other registered step (see register_step) has run
+# The whole phase is bounded by WARMUP_TIMEOUT_SECONDS; a step that runs out
+# of time is reported as "timeout" and only blocks readiness if required;
+# required steps that did not succeed are retried every WARMUP_RETRY_SECONDS.
+# ------------------------------------------------------------
+
+import os
+import time
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+import database
+import embedding_client
+import embedding_snapshot
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", str(min(database.DB_POOL_SIZE, 4))))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+WARMUP_EMBEDDING = os.getenv("WARMUP_EMBEDDING", "true").lower() == "true"
+
+# name -> (callable, required); sync callables run in a thread
+_steps = {}
+_state = {"ready": False, "finished": False, "started_at": None, "finished_at": None, "steps": {}}
+
+
+def register_step(name: str, fn, required: bool = False):
+    """Adds a warmup step (sync or async callable without arguments)."""
+    _steps[name] = (fn, required)
+
+
+def status() -> dict:
+    return {**_state, "steps": dict(_state["steps"])}
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+# ------------------------------------------------------------
+# Built-in steps
+# ------------------------------------------------------------
+def _open_sync_connections():
+    # check out N at once so the pool really holds N open connections afterwards
+    connections = []
+    try:
+        for _ in range(min(WARMUP_DB_CONNECTIONS, database.DB_POOL_SIZE)):
+            conn = database.engine.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+async def _open_async_connections():
+    async def _one():
+        conn = await database.async_engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    count = min(WARMUP_DB_CONNECTIONS, database.DB_ASYNC_POOL_SIZE)
+    connections = await asyncio.gather(*(_one() for _ in range(count)), return_exceptions=True)
+    errors = [c for c in connections if isinstance(c, BaseException)]
+    for conn in connections:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    if errors:
+        raise errors[0]
+
+
+def _prime_embedding():
+    embedding_client.get_client()
+    if WARMUP_EMBEDDING and embedding_client.HF_API_KEY:
+        embedding_client.embed_text("warmup", retries=1)
+
+
+register_step("db_sync", _open_sync_connections, required=True)
+register_step("db_async", _open_async_connections, required=True)
+register_step("embedding", _prime_embedding)
+if embedding_snapshot.SNAPSHOT_ENABLED:
+    register_step("embedding_snapshot", embedding_snapshot.current_index)
+
+
+# ------------------------------------------------------------
+# Runner (called from main.lifespan)
+# ------------------------------------------------------------
+async def _run_step(name: str, fn, deadline: float):
+    started = time.perf_counter()
+    remaining = max(0.0, deadline - time.monotonic())
+    try:
+        if asyncio.iscoroutinefunction(fn):
+            await asyncio.wait_for(fn(), timeout=remaining)
+        else:
+            # a timed-out thread finishes in the background; nothing waits on it
+            await asyncio.wait_for(asyncio.to_thread(fn), timeout=remaining)
+        result = {"status": "ok"}
+    except asyncio.TimeoutError:
+        result = {"status": "timeout"}
+    except Exception as e:
+        result = {"status": "failed", "error": str(e)[:300]}
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    _state["steps"][name] = result
+    return result
+
+
+async def run_warmup():
+    """
+    Runs every registered step concurrently within WARMUP_TIMEOUT_SECONDS, then
+    retries failed required steps until they pass (cancelled on shutdown).
+    """
+    _state["started_at"] = time.time()
+    pending = dict(_steps)
+    while True:
+        deadline = time.monotonic() + WARMUP_TIMEOUT_SECONDS
+        results = await asyncio.gather(*(_run_step(name, fn, deadline) for name, (fn, _) in pending.items()))
+        failed = {
+            name: (fn, required)
+            for (name, (fn, required)), result in zip(pending.items(), results)
+            if required and result["status"] != "ok"
+        }
+        if not _state["finished"]:
+            _state["finished"] = True
+            _state["finished_at"] = time.time()
+            log = logger.info if not failed else logger.warning
+            log("Warmup finished in %.2fs (ready=%s)", _state["finished_at"] - _state["started_at"], not failed,
+                extra={"steps": _state["steps"]})
+        if not failed:
+            _state["ready"] = True
+            return
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        pending = failed